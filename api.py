@@ -1 +1,2 @@
 from api.metaplex_api import MetaplexAPI
+from api.async_metaplex_api import AsyncMetaplexAPI
@@ -0,0 +1,191 @@
+import asyncio
+import json
+import base58
+from solana.keypair import Keypair
+from solana.rpc.async_api import AsyncClient
+from api.metaplex_api import MAX_TOPUP_WORKERS
+from metaplex.async_transactions import deploy, topup, topup_many, mint, create_and_mint, send, burn
+from metaplex.transactions import update_token_metadata
+from utils.async_execution_engine import execute
+from utils.metrics import metrics
+from utils.cipher import CachingFernet
+from utils.signing import keypair_cache
+
+class AsyncMetaplexAPI():
+    """
+    Coroutine version of `MetaplexAPI`. Every network method returns the same JSON string as its blocking counterpart.
+    One AsyncClient is kept open per endpoint, so call `close()` (or use `async with`) when done.
+    """
+
+    def __init__(self, cfg):
+        self.private_key = list(base58.b58decode(cfg["PRIVATE_KEY"]))[:32]
+        self.public_key = cfg["PUBLIC_KEY"]
+        self.keypair = keypair_cache.get(self.private_key)
+        self.cipher = CachingFernet(cfg["DECRYPTION_KEY"])
+        self.clients = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, _exc_type, _exc, _tb):
+        await self.close()
+
+    def client(self, api_endpoint):
+        if not isinstance(api_endpoint, str):
+            # AsyncClient only talks HTTP to a URL, an `EndpointPool` is a blocking provider
+            raise TypeError(f"AsyncMetaplexAPI takes an endpoint URL, not {type(api_endpoint).__name__}")
+        if api_endpoint not in self.clients:
+            self.clients[api_endpoint] = AsyncClient(api_endpoint)
+        return self.clients[api_endpoint]
+
+    async def close(self):
+        clients, self.clients = self.clients, {}
+        for client in clients.values():
+            await client.close()
+
+    def wallet(self):
+        """ Generate a wallet and return the address and private key. """
+        keypair = Keypair()
+        pub_key = keypair.public_key
+        private_key = list(keypair.seed)
+        return json.dumps(
+            {
+                'address': str(pub_key),
+                'private_key': private_key
+            }
+        )
+
+    async def _execute(self, api_endpoint, tx, signers, max_retries, skip_confirmation, max_timeout, target, finalized, operation=None):
+        return await execute(
+            api_endpoint,
+            tx,
+            signers,
+            max_retries=max_retries,
+            skip_confirmation=skip_confirmation,
+            max_timeout=max_timeout,
+            target=target,
+            finalized=finalized,
+            client=self.client(api_endpoint),
+            operation=operation,
+        )
+
+    async def deploy(self, api_endpoint, name, symbol, fees, max_retries=3, skip_confirmation=False, max_timeout=60, target=20, finalized=True):
+        """
+        Deploy a contract to the blockchain (on network that support contracts). Takes the network ID and contract name, plus initialisers of name and symbol. Process may vary significantly between blockchains.
+        Returns status code of success or fail, the contract address, and the native transaction data.
+        """
+        try:
+            with metrics.stage("build", "deploy", api_endpoint):
+                tx, signers, contract = await deploy(api_endpoint, self.keypair, name, symbol, fees, client=self.client(api_endpoint))
+            resp = await self._execute(api_endpoint, tx, signers, max_retries, skip_confirmation, max_timeout, target, finalized, operation="deploy")
+            resp["contract"] = contract
+            resp["status"] = 200
+            return json.dumps(resp)
+        except:
+            return json.dumps({"status": 400})
+
+    async def topup(self, api_endpoint, to, amount=None, max_retries=3, skip_confirmation=False, max_timeout=60, target=20, finalized=True):
+        """
+        Send a small amount of native currency to the specified wallet to handle gas fees. Return a status flag of success or fail and the native transaction data.
+        """
+        try:
+            with metrics.stage("build", "topup", api_endpoint):
+                tx, signers = await topup(api_endpoint, self.keypair, to, amount=amount, client=self.client(api_endpoint))
+            resp = await self._execute(api_endpoint, tx, signers, max_retries, skip_confirmation, max_timeout, target, finalized, operation="topup")
+            resp["status"] = 200
+            return json.dumps(resp)
+        except:
+            return json.dumps({"status": 400})
+
+    async def topup_many(self, api_endpoint, recipients, amount=None, max_retries=3, skip_confirmation=False, max_timeout=60, target=20, finalized=True, max_workers=MAX_TOPUP_WORKERS):
+        """
+        Topup many wallets at once. Transfers are packed into as few transactions as fit, and at most `max_workers` transactions are in flight at a time.
+        Returns one result per recipient, a failed transaction only fails the recipients packed into it.
+        """
+        try:
+            with metrics.stage("build", "topup_many", api_endpoint):
+                batches = await topup_many(api_endpoint, self.keypair, recipients, amount=amount, client=self.client(api_endpoint))
+        except:
+            return json.dumps({"status": 400})
+        semaphore = asyncio.Semaphore(max_workers)
+
+        async def submit(tx, signers):
+            async with semaphore:
+                return await self._execute(api_endpoint, tx, signers, max_retries, skip_confirmation, max_timeout, target, finalized, operation="topup_many")
+
+        responses = await asyncio.gather(*(submit(tx, signers) for tx, signers, _ in batches), return_exceptions=True)
+        results = []
+        for (_, _, batch), resp in zip(batches, responses):
+            if isinstance(resp, BaseException):
+                result = {"status": 400}
+            else:
+                result = {"status": 200, "result": resp["result"]}
+            results.extend(dict(result, to=to) for to in batch)
+        return json.dumps({"status": 200, "results": results})
+
+    async def mint(self, api_endpoint, contract_key, dest_key, link, max_retries=3, skip_confirmation=False, max_timeout=60, target=20, finalized=True, supply=1):
+        """
+        Mints an NFT to an account, updates the metadata and creates a master edition
+        """
+        with metrics.stage("build", "mint", api_endpoint):
+            tx, signers = await mint(api_endpoint, self.keypair, contract_key, dest_key, link, supply=supply, client=self.client(api_endpoint))
+        resp = await self._execute(api_endpoint, tx, signers, max_retries, skip_confirmation, max_timeout, target, finalized, operation="mint")
+        resp["status"] = 200
+        return json.dumps(resp)
+
+    async def create_and_mint(self, api_endpoint, name, symbol, fees, dest_key, link, max_retries=3, skip_confirmation=False, max_timeout=60, target=20, finalized=True, supply=1):
+        """
+        Deploy a contract and mint its NFT to `dest_key` in one transaction, with the metadata created at `link` and a master edition.
+        Returns status code of success or fail, the contract address, and the native transaction data.
+        """
+        try:
+            with metrics.stage("build", "create_and_mint", api_endpoint):
+                tx, signers, contract = await create_and_mint(api_endpoint, self.keypair, name, symbol, fees, dest_key, link, supply=supply, client=self.client(api_endpoint))
+            resp = await self._execute(api_endpoint, tx, signers, max_retries, skip_confirmation, max_timeout, target, finalized, operation="create_and_mint")
+            resp["contract"] = contract
+            resp["status"] = 200
+            return json.dumps(resp)
+        except:
+            return json.dumps({"status": 400})
+
+    async def update_token_metadata(self, api_endpoint, mint_token_id, link, data, creators_addresses, creators_verified, creators_share, fee, max_retries=3, skip_confirmation=False, max_timeout=60, target=20, finalized=True, supply=1):
+        """
+        Updates the json metadata for a given mint token id.
+        """
+        with metrics.stage("build", "update_token_metadata", api_endpoint):
+            tx, signers = update_token_metadata(api_endpoint, self.keypair, mint_token_id, link, data, fee, creators_addresses, creators_verified, creators_share)
+        resp = await self._execute(api_endpoint, tx, signers, max_retries, skip_confirmation, max_timeout, target, finalized, operation="update_token_metadata")
+        resp["status"] = 200
+        return json.dumps(resp)
+
+    async def send(self, api_endpoint, contract_key, sender_key, dest_key, encrypted_private_key, max_retries=3, skip_confirmation=False, max_timeout=60, target=20, finalized=True):
+        """
+        Transfer a token on a given network and contract from the sender to the recipient.
+        May require a private key, if so this will be provided encrypted using Fernet: https://cryptography.io/en/latest/fernet/
+        Return a status flag of success or fail and the native transaction data.
+        """
+        try:
+            private_key = list(self.cipher.decrypt(encrypted_private_key))
+            with metrics.stage("build", "send", api_endpoint):
+                tx, signers = await send(api_endpoint, self.keypair, contract_key, sender_key, dest_key, private_key, client=self.client(api_endpoint))
+            resp = await self._execute(api_endpoint, tx, signers, max_retries, skip_confirmation, max_timeout, target, finalized, operation="send")
+            resp["status"] = 200
+            return json.dumps(resp)
+        except:
+            return json.dumps({"status": 400})
+
+    async def burn(self, api_endpoint, contract_key, owner_key, encrypted_private_key, max_retries=3, skip_confirmation=False, max_timeout=60, target=20, finalized=True):
+        """
+        Burn a token, permanently removing it from the blockchain.
+        May require a private key, if so this will be provided encrypted using Fernet: https://cryptography.io/en/latest/fernet/
+        Return a status flag of success or fail and the native transaction data.
+        """
+        try:
+            private_key = list(self.cipher.decrypt(encrypted_private_key))
+            with metrics.stage("build", "burn", api_endpoint):
+                tx, signers = await burn(api_endpoint, contract_key, owner_key, private_key, client=self.client(api_endpoint))
+            resp = await self._execute(api_endpoint, tx, signers, max_retries, skip_confirmation, max_timeout, target, finalized, operation="burn")
+            resp["status"] = 200
+            return json.dumps(resp)
+        except:
+            return json.dumps({"status": 400})
@@ -1,17 +1,35 @@
 import json
-from cryptography.fernet import Fernet
+import logging
+from concurrent.futures import ThreadPoolExecutor
 import base58
 from solana.keypair import Keypair 
-from metaplex.transactions import deploy, topup, mint, send, burn, update_token_metadata
+from metaplex.transactions import deploy, topup, topup_many, mint, create_and_mint, send, burn, update_token_metadata
 from utils.execution_engine import execute
+from utils.metrics import metrics
+from utils.cipher import CachingFernet
+from utils.signing import keypair_cache
+from utils.client_registry import ClientRegistry, DEFAULT_POOL_SIZE, DEFAULT_TIMEOUT
+from utils.cluster_cache import cluster_cache
+
+logger = logging.getLogger(__name__)
+
+MAX_TOPUP_WORKERS = 8
 
 class MetaplexAPI():
 
-    def __init__(self, cfg):
+    def __init__(self, cfg, pool_size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT, confirmation="poll", warmup_endpoints=()):
         self.private_key = list(base58.b58decode(cfg["PRIVATE_KEY"]))[:32]
         self.public_key = cfg["PUBLIC_KEY"]
-        self.keypair = Keypair(self.private_key)
-        self.cipher = Fernet(cfg["DECRYPTION_KEY"])
+        self.keypair = keypair_cache.get(self.private_key)
+        self.cipher = CachingFernet(cfg["DECRYPTION_KEY"])
+        # Keep-alive RPC clients and confirmation trackers ("poll" or "websocket"), one per endpoint
+        self.clients = ClientRegistry(pool_size=pool_size, timeout=timeout, confirmation=confirmation)
+        # Fetch rent-exemption minimums up front so the first deploy/topup does not pay for them
+        for api_endpoint in warmup_endpoints:
+            try:
+                cluster_cache.warm(api_endpoint, self.clients.get(api_endpoint))
+            except Exception as e:
+                logger.warning("Failed to warm up %s: %s", api_endpoint, e)
 
     def wallet(self):
         """ Generate a wallet and return the address and private key. """
@@ -31,8 +49,8 @@ class MetaplexAPI():
         Returns status code of success or fail, the contract address, and the native transaction data.
         """
         try:
-            tx, signers, contract = deploy(api_endpoint, self.keypair, name, symbol, fees)
-            print(contract)
+            with metrics.stage("build", "deploy", api_endpoint):
+                tx, signers, contract = deploy(api_endpoint, self.keypair, name, symbol, fees, client=self.clients.get(api_endpoint))
             resp = execute(
                 api_endpoint,
                 tx,
@@ -42,6 +60,10 @@ class MetaplexAPI():
                 max_timeout=max_timeout,
                 target=target,
                 finalized=finalized,
+                client=self.clients.get(api_endpoint),
+                tracker=self.clients.tracker(api_endpoint),
+                blockhashes=self.clients.blockhashes(api_endpoint),
+                operation="deploy",
             )
             resp["contract"] = contract
             resp["status"] = 200
@@ -54,7 +76,8 @@ class MetaplexAPI():
         Send a small amount of native currency to the specified wallet to handle gas fees. Return a status flag of success or fail and the native transaction data.
         """
         try:
-            tx, signers = topup(api_endpoint, self.keypair, to, amount=amount)
+            with metrics.stage("build", "topup", api_endpoint):
+                tx, signers = topup(api_endpoint, self.keypair, to, amount=amount, client=self.clients.get(api_endpoint))
             resp = execute(
                 api_endpoint,
                 tx,
@@ -64,17 +87,60 @@ class MetaplexAPI():
                 max_timeout=max_timeout,
                 target=target,
                 finalized=finalized,
+                client=self.clients.get(api_endpoint),
+                tracker=self.clients.tracker(api_endpoint),
+                blockhashes=self.clients.blockhashes(api_endpoint),
+                operation="topup",
             )
             resp["status"] = 200
             return json.dumps(resp)
         except:
             return json.dumps({"status": 400})
 
+    def topup_many(self, api_endpoint, recipients, amount=None, max_retries=3, skip_confirmation=False, max_timeout=60, target=20, finalized=True, max_workers=MAX_TOPUP_WORKERS):
+        """
+        Topup many wallets at once. Transfers are packed into as few transactions as fit, and the transactions are submitted concurrently.
+        Returns one result per recipient, a failed transaction only fails the recipients packed into it.
+        """
+        try:
+            with metrics.stage("build", "topup_many", api_endpoint):
+                batches = topup_many(api_endpoint, self.keypair, recipients, amount=amount, client=self.clients.get(api_endpoint))
+        except:
+            return json.dumps({"status": 400})
+
+        def _execute(tx, signers):
+            return execute(
+                api_endpoint,
+                tx,
+                signers,
+                max_retries=max_retries,
+                skip_confirmation=skip_confirmation,
+                max_timeout=max_timeout,
+                target=target,
+                finalized=finalized,
+                client=self.clients.get(api_endpoint),
+                tracker=self.clients.tracker(api_endpoint),
+                blockhashes=self.clients.blockhashes(api_endpoint),
+                operation="topup_many",
+            )
+
+        results = []
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(_execute, tx, signers) for tx, signers, _ in batches]
+            for (_, _, batch), future in zip(batches, futures):
+                try:
+                    result = {"status": 200, "result": future.result()["result"]}
+                except:
+                    result = {"status": 400}
+                results.extend(dict(result, to=to) for to in batch)
+        return json.dumps({"status": 200, "results": results})
+
     def mint(self, api_endpoint, contract_key, dest_key, link, max_retries=3, skip_confirmation=False, max_timeout=60, target=20, finalized=True, supply=1 ):
         """
         Mints an NFT to an account, updates the metadata and creates a master edition
         """
-        tx, signers = mint(api_endpoint, self.keypair, contract_key, dest_key, link, supply=supply)
+        with metrics.stage("build", "mint", api_endpoint):
+            tx, signers = mint(api_endpoint, self.keypair, contract_key, dest_key, link, supply=supply, client=self.clients.get(api_endpoint))
         resp = execute(
             api_endpoint,
             tx,
@@ -84,17 +150,50 @@ class MetaplexAPI():
             max_timeout=max_timeout,
             target=target,
             finalized=finalized,
+            client=self.clients.get(api_endpoint),
+            tracker=self.clients.tracker(api_endpoint),
+            blockhashes=self.clients.blockhashes(api_endpoint),
+            operation="mint",
         )
         resp["status"] = 200
         return json.dumps(resp)
         # except:
         #     return json.dumps({"status": 400})
         
+    def create_and_mint(self, api_endpoint, name, symbol, fees, dest_key, link, max_retries=3, skip_confirmation=False, max_timeout=60, target=20, finalized=True, supply=1):
+        """
+        Deploy a contract and mint its NFT to `dest_key` in one transaction, with the metadata created at `link` and a master edition.
+        Returns status code of success or fail, the contract address, and the native transaction data.
+        """
+        try:
+            with metrics.stage("build", "create_and_mint", api_endpoint):
+                tx, signers, contract = create_and_mint(api_endpoint, self.keypair, name, symbol, fees, dest_key, link, supply=supply, client=self.clients.get(api_endpoint))
+            resp = execute(
+                api_endpoint,
+                tx,
+                signers,
+                max_retries=max_retries,
+                skip_confirmation=skip_confirmation,
+                max_timeout=max_timeout,
+                target=target,
+                finalized=finalized,
+                client=self.clients.get(api_endpoint),
+                tracker=self.clients.tracker(api_endpoint),
+                blockhashes=self.clients.blockhashes(api_endpoint),
+                operation="create_and_mint",
+            )
+            resp["contract"] = contract
+            resp["status"] = 200
+            return json.dumps(resp)
+        except:
+            return json.dumps({"status": 400})
+
     def update_token_metadata(self, api_endpoint, mint_token_id, link,  data, creators_addresses, creators_verified, creators_share,fee, max_retries=3, skip_confirmation=False, max_timeout=60, target=20, finalized=True, supply=1 ):
             """
             Updates the json metadata for a given mint token id.
             """
-            tx, signers = update_token_metadata(api_endpoint, self.keypair, mint_token_id, link, data, fee, creators_addresses, creators_verified, creators_share)
+            with metrics.stage("build", "update_token_metadata", api_endpoint):
+                tx, signers = update_token_metadata(api_endpoint, self.keypair, mint_token_id, link, data, fee, creators_addresses, creators_verified, creators_share)
             resp = execute(
                 api_endpoint,
                 tx,
@@ -104,6 +203,10 @@ class MetaplexAPI():
                 max_timeout=max_timeout,
                 target=target,
                 finalized=finalized,
+                client=self.clients.get(api_endpoint),
+                tracker=self.clients.tracker(api_endpoint),
+                blockhashes=self.clients.blockhashes(api_endpoint),
+                operation="update_token_metadata",
             )
             resp["status"] = 200
             return json.dumps(resp)
@@ -117,7 +220,8 @@ class MetaplexAPI():
         """
         try:
             private_key = list(self.cipher.decrypt(encrypted_private_key))
-            tx, signers = send(api_endpoint, self.keypair, contract_key, sender_key, dest_key, private_key)
+            with metrics.stage("build", "send", api_endpoint):
+                tx, signers = send(api_endpoint, self.keypair, contract_key, sender_key, dest_key, private_key, client=self.clients.get(api_endpoint))
             resp = execute(
                 api_endpoint,
                 tx,
@@ -127,6 +231,10 @@ class MetaplexAPI():
                 max_timeout=max_timeout,
                 target=target,
                 finalized=finalized,
+                client=self.clients.get(api_endpoint),
+                tracker=self.clients.tracker(api_endpoint),
+                blockhashes=self.clients.blockhashes(api_endpoint),
+                operation="send",
             )
             resp["status"] = 200
             return json.dumps(resp)
@@ -141,7 +249,8 @@ class MetaplexAPI():
         """
         try:
             private_key = list(self.cipher.decrypt(encrypted_private_key))
-            tx, signers = burn(api_endpoint, contract_key, owner_key, private_key)
+            with metrics.stage("build", "burn", api_endpoint):
+                tx, signers = burn(api_endpoint, contract_key, owner_key, private_key, client=self.clients.get(api_endpoint))
             resp = execute(
                 api_endpoint,
                 tx,
@@ -151,6 +260,10 @@ class MetaplexAPI():
                 max_timeout=max_timeout,
                 target=target,
                 finalized=finalized,
+                client=self.clients.get(api_endpoint),
+                tracker=self.clients.tracker(api_endpoint),
+                blockhashes=self.clients.blockhashes(api_endpoint),
+                operation="burn",
             )
             resp["status"] = 200
             return json.dumps(resp)
@@ -0,0 +1,267 @@
+import argparse
+import base64
+import csv
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import base58
+from solana.keypair import Keypair
+from solana.publickey import PublicKey
+from solana.rpc.core import RPCException
+from spl.token._layouts import MINT_LAYOUT
+from api.metaplex_api import MetaplexAPI
+from metaplex.transactions import deploy, mint, create_and_mint
+from utils.endpoint_pool import EndpointPool
+from utils.execution_engine import execute
+from utils.metrics import metrics, serve_prometheus
+from utils.submission import TRANSIENT, backoff, classify_error
+
+MANIFEST_FIELDS = ("name", "symbol", "fee", "uri", "recipient")
+MAX_WORKERS = 8
+REPORT_INTERVAL = 10
+
+logger = logging.getLogger(__name__)
+
+
+def read_manifest(path):
+    """
+    Stream `(key, item)` pairs from a JSONL or CSV manifest with the columns name, symbol, fee, uri and recipient.
+    The key is the item's position in the manifest, so the manifest must not be reordered between runs.
+    """
+    with open(path, newline="") as f:
+        if path.endswith(".csv"):
+            rows = csv.DictReader(f)
+        else:
+            rows = (json.loads(line) for line in f if line.strip())
+        for i, row in enumerate(rows):
+            missing = [field for field in MANIFEST_FIELDS if row.get(field) in (None, "")]
+            if missing:
+                raise ValueError(f"Manifest item {i} is missing {', '.join(missing)}")
+            yield str(i), row
+
+
+class Checkpoint():
+    """
+    Append-only JSONL record of how far each manifest item got. Every line is one completed stage, and the
+    latest line for a key wins when the file is loaded again.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.items = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A line cut short by a crash, its stage will simply run again
+                        continue
+                    self.items.setdefault(record["key"], {}).update(record)
+        self._file = open(path, "a")
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        return self.items.get(key, {})
+
+    def record(self, key, stage, **fields):
+        record = dict(fields, key=key, stage=stage)
+        with self._lock:
+            self.items.setdefault(key, {}).update(record)
+            self._file.write(json.dumps(record) + "\n")
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def mint_supply(client, contract):
+    """ Supply of the mint `contract`, or None if the account does not exist. """
+    resp = client.get_account_info(PublicKey(contract))
+    if 'error' in resp:
+        raise RPCException(resp['error'])
+    info = resp["result"]["value"]
+    if info is None:
+        return None
+    return MINT_LAYOUT.parse(base64.b64decode(info["data"][0])).supply
+
+
+def _seed(signers, contract):
+    """ Seed of the mint keypair among `signers`, to deploy the same contract again after a crash. """
+    for signer in signers:
+        if str(signer.public_key) == contract:
+            return base58.b58encode(signer.seed).decode("ascii")
+    return None
+
+
+class CollectionPipeline():
+    """
+    Runs deploy -> mint for every manifest item on a bounded pool of workers, recording each stage in a
+    `Checkpoint`. Items that already minted are skipped, and items that only deployed are minted into the
+    contract they already have. With `one_shot=True`, new items are deployed and minted in a single transaction
+    by `create_and_mint`.
+
+    RPC reads of the build stage are retried after transient errors, like sends are. Each transaction is recorded
+    ("deploying", "minting") before it is sent, and an item only counts as done once its transaction confirmed. An
+    item interrupted in flight, by a crash or a confirmation timeout, is checked on-chain when it runs again. A
+    deploy is repeated with the same mint keypair, so it cannot create a second contract if the first attempt
+    landed after all.
+    """
+
+    def __init__(self, api, api_endpoint, checkpoint, max_workers=MAX_WORKERS, max_retries=3, max_timeout=60, report_interval=REPORT_INTERVAL, one_shot=False):
+        self.api = api
+        self.api_endpoint = api_endpoint
+        self.checkpoint = checkpoint
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.max_timeout = max_timeout
+        self.report_interval = report_interval
+        self.one_shot = one_shot
+        self.counters = {"deployed": 0, "minted": 0, "skipped": 0, "failed": 0}
+        self._lock = threading.Lock()
+
+    def _count(self, counter):
+        with self._lock:
+            self.counters[counter] += 1
+
+    def _execute(self, tx, signers, operation):
+        resp = execute(
+            self.api_endpoint,
+            tx,
+            signers,
+            max_retries=self.max_retries,
+            # `mint` reads the metadata created by `deploy`, so every stage waits for confirmation
+            skip_confirmation=False,
+            max_timeout=self.max_timeout,
+            client=self.api.clients.get(self.api_endpoint),
+            tracker=self.api.clients.tracker(self.api_endpoint),
+            blockhashes=self.api.clients.blockhashes(self.api_endpoint),
+            operation=operation,
+            # An unconfirmed item must not be recorded as done
+            raise_on_timeout=True,
+        )
+        return resp["result"]
+
+    def _read(self, func, *args, **kwargs):
+        """ Call `func`, retrying transient RPC errors of its reads with the backoff `execute` uses for sends. """
+        for attempt in range(self.max_retries):
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                if classify_error(e) != TRANSIENT or attempt + 1 == self.max_retries:
+                    raise
+                logger.warning("Failed attempt %d of %s: %s", attempt, func.__name__, e)
+                time.sleep(backoff(attempt))
+
+    def _resume(self, key, state, client):
+        """ Settle an item interrupted in flight from the chain. Returns its stage. """
+        stage, contract = state["stage"], state["contract"]
+        supply = self._read(mint_supply, client, contract)
+        if supply:
+            self.checkpoint.record(key, "minted", contract=contract)
+            return "minted"
+        if supply is not None and stage == "deploying":
+            self.checkpoint.record(key, "deployed", contract=contract)
+            return "deployed"
+        return stage
+
+    def process(self, key, item):
+        client = self.api.clients.get(self.api_endpoint)
+        state = self.checkpoint.get(key)
+        stage = state.get("stage")
+        if stage in ("deploying", "minting"):
+            stage = self._resume(key, state, client)
+        if stage == "minted":
+            self._count("skipped")
+            return
+        contract = state.get("contract")
+        if stage is None or stage == "deploying":
+            seed = state.get("mint_seed")
+            mint_account = Keypair.from_seed(base58.b58decode(seed)) if seed is not None else None
+            one_shot = state.get("one_shot", self.one_shot)
+            operation = "create_and_mint" if one_shot else "deploy"
+            with metrics.stage("build", operation, self.api_endpoint):
+                if one_shot:
+                    tx, signers, contract = self._read(create_and_mint, self.api_endpoint, self.api.keypair, item["name"], item["symbol"], int(item["fee"]), item["recipient"], item["uri"], client=client, mint_account=mint_account)
+                else:
+                    tx, signers, contract = self._read(deploy, self.api_endpoint, self.api.keypair, item["name"], item["symbol"], int(item["fee"]), client=client, mint_account=mint_account)
+            self.checkpoint.record(key, "deploying", contract=contract, mint_seed=_seed(signers, contract), one_shot=one_shot)
+            signature = self._execute(tx, signers, operation)
+            if one_shot:
+                self.checkpoint.record(key, "minted", contract=contract, mint_signature=signature)
+                self._count("minted")
+                return
+            self.checkpoint.record(key, "deployed", contract=contract, deploy_signature=signature)
+            self._count("deployed")
+        with metrics.stage("build", "mint", self.api_endpoint):
+            tx, signers = self._read(mint, self.api_endpoint, self.api.keypair, contract, item["recipient"], item["uri"], client=client)
+        self.checkpoint.record(key, "minting", contract=contract)
+        signature = self._execute(tx, signers, "mint")
+        self.checkpoint.record(key, "minted", contract=contract, mint_signature=signature)
+        self._count("minted")
+
+    def _process(self, key, item):
+        try:
+            self.process(key, item)
+        except Exception as e:
+            logger.warning("Failed item %s: %s", key, e)
+            self._count("failed")
+
+    def report(self, started):
+        elapsed = time.monotonic() - started
+        with self._lock:
+            counters = dict(self.counters)
+        rate = counters["minted"] / elapsed if elapsed > 0 else 0
+        print(f"{elapsed:.0f}s: {counters['minted']} minted ({rate:.2f}/s), {counters['deployed']} deployed, {counters['skipped']} skipped, {counters['failed']} failed")
+
+    def run(self, items):
+        """ Process `(key, item)` pairs, keeping at most twice `max_workers` of them in memory. Returns the counters. """
+        started = time.monotonic()
+        last_report = started
+        pending = set()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for key, item in items:
+                if len(pending) >= 2 * self.max_workers:
+                    _, pending = wait(pending, return_when=FIRST_COMPLETED)
+                pending.add(executor.submit(self._process, key, item))
+                if time.monotonic() - last_report >= self.report_interval:
+                    self.report(started)
+                    last_report = time.monotonic()
+            while pending:
+                _, pending = wait(pending, timeout=self.report_interval)
+                self.report(started)
+        return dict(self.counters)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Deploy and mint every item of a JSONL or CSV manifest.")
+    ap.add_argument("manifest")
+    ap.add_argument("--config", required=True, help="JSON file with PRIVATE_KEY, PUBLIC_KEY and DECRYPTION_KEY")
+    ap.add_argument("--network", default="https://api.devnet.solana.com/", help="RPC endpoint, or a comma separated list of endpoints of one cluster")
+    ap.add_argument("--checkpoint", default=None, help="Defaults to <manifest>.checkpoint")
+    ap.add_argument("--workers", type=int, default=MAX_WORKERS)
+    ap.add_argument("--one-shot", action="store_true", help="Deploy and mint each item in a single transaction")
+    ap.add_argument("--metrics-port", type=int, default=None, help="Serve Prometheus metrics on http://localhost:<port>/metrics")
+    args = ap.parse_args()
+    if args.metrics_port is not None:
+        serve_prometheus(args.metrics_port)
+    with open(args.config) as f:
+        cfg = json.load(f)
+    api = MetaplexAPI(cfg, pool_size=args.workers)
+    checkpoint = Checkpoint(args.checkpoint or args.manifest + ".checkpoint")
+    network = args.network
+    if "," in network:
+        network = EndpointPool(network.split(","), pool_size=args.workers)
+    try:
+        pipeline = CollectionPipeline(api, network, checkpoint, max_workers=args.workers, one_shot=args.one_shot)
+        pipeline.run(read_manifest(args.manifest))
+    finally:
+        checkpoint.close()
+        api.clients.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+End-to-end load driver for `MetaplexAPI`. Runs the deploy -> topup -> mint -> topup -> send -> burn story of
+`test/test_api.py` as many concurrent flows and reports throughput and latency percentiles per operation.
+
+    python -m benchmarks.load --flows 64 --concurrency 16 --latency 0.01 0.05 --rate-limit-rate 0.02
+
+Without `--network` it runs against an in-process `FakeValidator`.
+"""
+import argparse
+import json
+import random
+import string
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from api.metaplex_api import MetaplexAPI
+from testing.fake_validator import FakeValidator
+from testing.helpers import api_config
+
+LINK = "https://arweave.net/1eH7bZS-6HZH4YOc8T_tGp2Rq25dlhclXJkoa6U55mM/"
+PERCENTILES = (50, 90, 99)
+
+
+def percentile(values, p):
+    values = sorted(values)
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+class LoadDriver():
+    """ Runs flows against one endpoint and records (operation, seconds, ok) for every API call. """
+
+    def __init__(self, api, api_endpoint, skip_confirmation=False):
+        self.api = api
+        self.api_endpoint = api_endpoint
+        self.skip_confirmation = skip_confirmation
+        self.samples = []
+        self._lock = threading.Lock()
+
+    def _call(self, operation, method, *args):
+        started = time.monotonic()
+        try:
+            resp = json.loads(method(self.api_endpoint, *args, skip_confirmation=self.skip_confirmation))
+        except Exception:
+            # `mint` raises instead of returning a 400
+            resp = {"status": 400}
+        with self._lock:
+            self.samples.append((operation, time.monotonic() - started, resp["status"] == 200))
+        if resp["status"] != 200:
+            raise Exception(f"{operation} failed")
+        return resp
+
+    def flow(self, _=None):
+        letters = string.ascii_uppercase
+        name = ''.join(random.choice(letters) for _ in range(32))
+        symbol = ''.join(random.choice(letters) for _ in range(10))
+        try:
+            contract = self._call("deploy", self.api.deploy, name, symbol, 0)["contract"]
+            wallet = json.loads(self.api.wallet())
+            encrypted_pk1 = self.api.cipher.encrypt(bytes(wallet["private_key"]))
+            self._call("topup", self.api.topup, wallet["address"])
+            self._call("mint", self.api.mint, contract, wallet["address"], LINK)
+            wallet2 = json.loads(self.api.wallet())
+            encrypted_pk2 = self.api.cipher.encrypt(bytes(wallet2["private_key"]))
+            self._call("topup", self.api.topup, wallet2["address"])
+            self._call("send", self.api.send, contract, wallet["address"], wallet2["address"], encrypted_pk1)
+            self._call("burn", self.api.burn, contract, wallet2["address"], encrypted_pk2)
+            return True
+        except Exception:
+            return False
+
+    def run(self, flows, concurrency):
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            completed = sum(executor.map(self.flow, range(flows)))
+        return self.report(time.monotonic() - started, flows, completed)
+
+    def report(self, elapsed, flows, completed):
+        with self._lock:
+            samples = list(self.samples)
+        operations = {}
+        for operation, seconds, ok in samples:
+            stats = operations.setdefault(operation, {"ok": 0, "failed": 0, "latencies": []})
+            stats["ok" if ok else "failed"] += 1
+            stats["latencies"].append(seconds)
+        result = {
+            "elapsed": elapsed,
+            "flows": flows,
+            "completed_flows": completed,
+            "ops": len(samples),
+            "ops_per_second": len(samples) / elapsed if elapsed else 0,
+            "operations": {},
+        }
+        for operation, stats in operations.items():
+            result["operations"][operation] = {
+                "ok": stats["ok"],
+                "failed": stats["failed"],
+                **{f"p{p}_ms": percentile(stats["latencies"], p) * 1000 for p in PERCENTILES},
+            }
+        return result
+
+
+def _print(result):
+    print(f"{result['completed_flows']}/{result['flows']} flows, {result['ops']} ops in {result['elapsed']:.1f}s ({result['ops_per_second']:.1f} ops/s)")
+    for operation, stats in result["operations"].items():
+        percentiles = "  ".join(f"p{p} {stats[f'p{p}_ms']:8.1f} ms" for p in PERCENTILES)
+        print(f"{operation:8s} {stats['ok']:6d} ok {stats['failed']:4d} failed  {percentiles}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Run concurrent deploy/mint/send/burn flows against MetaplexAPI.")
+    ap.add_argument("--network", default=None, help="RPC endpoint, defaults to an in-process fake validator")
+    ap.add_argument("--config", default=None, help="JSON file with PRIVATE_KEY, PUBLIC_KEY and DECRYPTION_KEY of a funded wallet, required with --network")
+    ap.add_argument("--flows", type=int, default=32)
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--skip-confirmation", action="store_true")
+    ap.add_argument("--latency", type=float, nargs="+", default=[0], help="Fake validator latency in seconds, or a min and max")
+    ap.add_argument("--error-rate", type=float, default=0)
+    ap.add_argument("--rate-limit-rate", type=float, default=0)
+    ap.add_argument("--confirmation-delay", type=float, default=0.4)
+    ap.add_argument("--finalization-delay", type=float, default=0.8)
+    ap.add_argument("--output", default=None, help="Write the report to this JSON file")
+    args = ap.parse_args()
+
+    validator = None
+    api_endpoint = args.network
+    if api_endpoint is None:
+        validator = FakeValidator(
+            latency=args.latency[0] if len(args.latency) == 1 else tuple(args.latency[:2]),
+            error_rate=args.error_rate,
+            rate_limit_rate=args.rate_limit_rate,
+            confirmation_delay=args.confirmation_delay,
+            finalization_delay=args.finalization_delay,
+        ).start()
+        api_endpoint = validator.endpoint
+    if args.config:
+        with open(args.config) as f:
+            cfg = json.load(f)
+    else:
+        # The fake validator does not check balances, any wallet will do
+        cfg = api_config()
+    api = MetaplexAPI(cfg, pool_size=args.concurrency)
+    try:
+        result = LoadDriver(api, api_endpoint, skip_confirmation=args.skip_confirmation).run(args.flows, args.concurrency)
+    finally:
+        api.clients.close()
+        if validator is not None:
+            validator.stop()
+    _print(result)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
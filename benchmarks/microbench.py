@@ -0,0 +1,224 @@
+"""
+Offline microbenchmarks for the instruction builders, decoders and transaction builders.
+
+    python -m benchmarks.microbench --output before.json
+    python -m benchmarks.microbench --output after.json --compare before.json
+
+Nothing here touches the network: the builders get an `_OfflineClient` answering RPC reads with fixed accounts and
+every transaction is signed with a fixed blockhash. Payloads are the largest the metadata program accepts. Only
+public entry points are timed, so a run on an older commit can be compared with a run on a newer one; entry points
+an older commit lacks are left out of its run. The one private helper timed is `_get_data_buffer`, the metadata
+encoder every builder shares, which older commits have as well.
+"""
+import argparse
+import base64
+import contextlib
+import inspect
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+import timeit
+from solana.blockhash import Blockhash
+from solana.keypair import Keypair
+from solana.publickey import PublicKey
+from spl.token._layouts import ACCOUNT_LAYOUT
+import metaplex.transactions
+from metaplex.metadata import (
+    _get_data_buffer,
+    create_master_edition_instruction,
+    create_metadata_instruction_data,
+    get_edition,
+    get_metadata_account,
+    update_metadata_instruction_data,
+    unpack_metadata_account,
+    MAX_CREATOR_LIMIT,
+    MAX_NAME_LENGTH,
+    MAX_SYMBOL_LENGTH,
+    MAX_URI_LENGTH,
+    ASSOCIATED_TOKEN_ACCOUNT_PROGRAM_ID,
+    METADATA_PROGRAM_ID,
+    TOKEN_PROGRAM_ID,
+)
+from metaplex.transactions import burn, deploy, mint, send, topup, update_token_metadata
+
+REPEAT = 5
+BLOCKHASH = Blockhash(str(PublicKey(3)))
+RENT_LAMPORTS = 1461600
+API_ENDPOINT = "offline"
+
+NAME = "N" * MAX_NAME_LENGTH
+SYMBOL = "S" * MAX_SYMBOL_LENGTH
+URI = "https://arweave.net/" + "u" * (MAX_URI_LENGTH - len("https://arweave.net/"))
+FEE = 500
+SOURCE = Keypair()
+CREATORS = [str(SOURCE.public_key)] + [str(Keypair().public_key) for _ in range(MAX_CREATOR_LIMIT - 1)]
+VERIFIED = [1, 0, 0, 0, 0]
+SHARE = [20] * MAX_CREATOR_LIMIT
+MINT = Keypair()
+OWNER = Keypair()
+DEST = Keypair().public_key
+# Key, update authority, mint, data, primary_sale_happened and is_mutable. The data is cut out of an update
+# instruction: instruction type and Some(data) in front, update authority and primary_sale_happened behind.
+METADATA_ACCOUNT = (
+    bytes([4]) + bytes(SOURCE.public_key) + bytes(MINT.public_key)
+    + update_metadata_instruction_data(NAME, SYMBOL, URI, FEE, CREATORS, VERIFIED, SHARE)[2:-2] + bytes([0, 1])
+)
+# Initialized token account of OWNER, DEST has none yet
+OWNER_ACCOUNT = ACCOUNT_LAYOUT.build(dict(
+    mint=bytes(MINT.public_key),
+    owner=bytes(OWNER.public_key),
+    amount=1,
+    delegate_option=0,
+    delegate=bytes(32),
+    state=1,
+    is_native_option=0,
+    is_native=0,
+    delegated_amount=0,
+    close_authority_option=0,
+    close_authority=bytes(32),
+))
+
+
+def _account_info(data):
+    return {"data": [base64.b64encode(data).decode("ascii"), "base64"], "executable": False, "lamports": RENT_LAMPORTS, "owner": str(METADATA_PROGRAM_ID), "rentEpoch": 0}
+
+
+class _OfflineClient():
+    """ Stands in for `solana.rpc.api.Client` in the transaction builders. """
+
+    accounts = {
+        str(get_metadata_account(MINT.public_key)): _account_info(METADATA_ACCOUNT),
+        str(PublicKey.find_program_address(
+            [bytes(OWNER.public_key), bytes(TOKEN_PROGRAM_ID), bytes(MINT.public_key)],
+            ASSOCIATED_TOKEN_ACCOUNT_PROGRAM_ID,
+        )[0]): _account_info(OWNER_ACCOUNT),
+    }
+
+    def __init__(self, endpoint=None, *args, **kwargs):
+        pass
+
+    def get_minimum_balance_for_rent_exemption(self, usize, *args, **kwargs):
+        return {"result": RENT_LAMPORTS}
+
+    def get_account_info(self, pubkey, *args, **kwargs):
+        return {"result": {"context": {"slot": 1}, "value": self.accounts.get(str(pubkey))}}
+
+    def get_multiple_accounts(self, pubkeys, *args, **kwargs):
+        return {"result": {"context": {"slot": 1}, "value": [self.accounts.get(str(pubkey)) for pubkey in pubkeys]}}
+
+
+@contextlib.contextmanager
+def _offline():
+    client, metaplex.transactions.Client = metaplex.transactions.Client, _OfflineClient
+    try:
+        yield
+    finally:
+        metaplex.transactions.Client = client
+
+
+def _signed(built):
+    tx, signers = built[:2]
+    tx.recent_blockhash = BLOCKHASH
+    tx.sign(*signers)
+    return tx.serialize()
+
+
+def _uncached_pda():
+    return PublicKey.find_program_address([b"metadata", bytes(METADATA_PROGRAM_ID), bytes(MINT.public_key)], METADATA_PROGRAM_ID)
+
+
+def _master_edition():
+    return create_master_edition_instruction(MINT.public_key, SOURCE.public_key, SOURCE.public_key, SOURCE.public_key, 1)
+
+
+BENCHMARKS = {
+    "_get_data_buffer": lambda: _get_data_buffer(NAME, SYMBOL, URI, FEE, CREATORS, VERIFIED, SHARE),
+    "create_metadata_instruction_data": lambda: create_metadata_instruction_data(NAME, SYMBOL, FEE, CREATORS),
+    "update_metadata_instruction_data": lambda: update_metadata_instruction_data(NAME, SYMBOL, URI, FEE, CREATORS, VERIFIED, SHARE),
+    "create_master_edition_instruction": _master_edition,
+    "unpack_metadata_account": lambda: unpack_metadata_account(METADATA_ACCOUNT),
+    "pda.find_program_address": _uncached_pda,
+    "pda.metadata_account": lambda: get_metadata_account(MINT.public_key),
+    "pda.edition": lambda: get_edition(MINT.public_key),
+    "tx.deploy": lambda: _signed(deploy(API_ENDPOINT, SOURCE, NAME, SYMBOL, FEE)),
+    "tx.topup": lambda: _signed(topup(API_ENDPOINT, SOURCE, str(DEST))),
+    "tx.mint": lambda: _signed(mint(API_ENDPOINT, SOURCE, str(MINT.public_key), str(DEST), URI)),
+    "tx.update_token_metadata": lambda: _signed(update_token_metadata(API_ENDPOINT, SOURCE, str(MINT.public_key), URI, {"name": NAME, "symbol": SYMBOL}, FEE, CREATORS, VERIFIED, SHARE)),
+    "tx.send": lambda: _signed(send(API_ENDPOINT, SOURCE, str(MINT.public_key), str(OWNER.public_key), str(DEST), list(OWNER.seed))),
+    "tx.burn": lambda: _signed(burn(API_ENDPOINT, str(MINT.public_key), str(OWNER.public_key), list(OWNER.seed))),
+}
+if "uri" in inspect.signature(create_metadata_instruction_data).parameters:
+    BENCHMARKS["create_metadata_instruction_data.max_uri"] = lambda: create_metadata_instruction_data(NAME, SYMBOL, FEE, CREATORS, uri=URI)
+if hasattr(metaplex.transactions, "create_and_mint"):
+    BENCHMARKS["tx.create_and_mint"] = lambda: _signed(metaplex.transactions.create_and_mint(API_ENDPOINT, SOURCE, NAME, SYMBOL, FEE, str(DEST), URI))
+
+
+def run(names=None, repeat=REPEAT):
+    """ Time each benchmark `repeat` times. Returns {name: {"min_us", "median_us", "number"}}, per call. """
+    results = {}
+    with _offline():
+        for name, func in BENCHMARKS.items():
+            if names and name not in names:
+                continue
+            results[name] = _time(func, repeat)
+    return results
+
+
+def _time(func, repeat):
+    timer = timeit.Timer(func)
+    # Builders may print, keep that out of the report
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        func()
+        number, _ = timer.autorange()
+        timings = [t / number * 1e6 for t in timer.repeat(repeat=repeat, number=number)]
+    return {
+        "min_us": min(timings),
+        "median_us": statistics.median(timings),
+        "number": number,
+    }
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def report(results, baseline=None):
+    for name, result in results.items():
+        line = f"{name:40s} {result['min_us']:10.2f} us"
+        if baseline and name in baseline:
+            line += f"  {baseline[name]['min_us'] / result['min_us']:6.2f}x"
+        print(line)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Offline microbenchmarks for the metaplex builders and decoders.")
+    ap.add_argument("--output", default=None, help="Write the results to this JSON file")
+    ap.add_argument("--compare", default=None, help="JSON file of a previous run to compare against")
+    ap.add_argument("--repeat", type=int, default=REPEAT)
+    ap.add_argument("names", nargs="*", help="Only run these benchmarks")
+    args = ap.parse_args()
+    results = run(args.names, repeat=args.repeat)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+    report(results, baseline)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "commit": _commit(),
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "time": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "results": results,
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+import base64
+from contextlib import asynccontextmanager
+from solana.publickey import PublicKey
+from solana.keypair import Keypair
+from solana.rpc.async_api import AsyncClient
+from spl.token._layouts import MINT_LAYOUT, ACCOUNT_LAYOUT
+from metaplex.metadata import get_metadata_account, unpack_metadata_account
+from utils.cluster_cache import cluster_cache
+from utils.signing import expand
+from metaplex.transactions import (
+    _accounts,
+    _burn,
+    _cached_states,
+    _create_and_mint,
+    _deploy,
+    _fill_states,
+    _metadata,
+    _mint,
+    _send,
+    _topup,
+    _topup_many,
+)
+
+# These are coroutine versions of the builders in `metaplex.transactions`. Only the RPC reads differ,
+# the transactions themselves are assembled by the same code.
+
+
+@asynccontextmanager
+async def _connect(api_endpoint, client):
+    if client is not None:
+        yield client
+    else:
+        async with AsyncClient(api_endpoint) as client:
+            yield client
+
+
+async def get_metadata(client, mint_key):
+    metadata_account = get_metadata_account(mint_key)
+    account_info = await client.get_account_info(metadata_account)
+    data = base64.b64decode(account_info['result']['value']['data'][0])
+    return unpack_metadata_account(data)
+
+
+async def deploy(api_endpoint, source_account, name, symbol, fees, client=None, mint_account=None):
+    async with _connect(api_endpoint, client) as client:
+        if mint_account is None:
+            mint_account = Keypair()
+        signers = [source_account, mint_account]
+        lamports = await cluster_cache.minimum_balance_for_rent_exemption_async(api_endpoint, client, MINT_LAYOUT.sizeof()) # type: ignore
+        tx = _deploy(source_account, mint_account, name, symbol, fees, lamports)
+        return tx, signers, str(mint_account.public_key)
+
+
+async def topup(api_endpoint, sender_account, to, amount=None, client=None):
+    signers = [sender_account]
+    if amount is None:
+        async with _connect(api_endpoint, client) as client:
+            lamports = await cluster_cache.minimum_balance_for_rent_exemption_async(api_endpoint, client, ACCOUNT_LAYOUT.sizeof())
+    else:
+        lamports = int(amount)
+    tx = _topup(sender_account, to, lamports)
+    return tx, signers
+
+
+async def topup_many(api_endpoint, sender_account, recipients, amount=None, client=None):
+    recipients = list(recipients)
+    if amount is None:
+        async with _connect(api_endpoint, client) as client:
+            lamports = await cluster_cache.minimum_balance_for_rent_exemption_async(api_endpoint, client, ACCOUNT_LAYOUT.sizeof())
+    else:
+        lamports = int(amount)
+    return _topup_many(sender_account, recipients, lamports)
+
+
+async def mint(api_endpoint, source_account, contract_key, dest_key, link, supply=1, client=None):
+    async with _connect(api_endpoint, client) as client:
+        mint_account = PublicKey(contract_key)
+        user_account = PublicKey(dest_key)
+        signers = [source_account]
+        states, addresses = _cached_states(api_endpoint, [user_account], mint_account)
+        infos = _accounts(await client.get_multiple_accounts(addresses + [get_metadata_account(mint_account)]))
+        (account_state,), (metadata_info,) = _fill_states(api_endpoint, [user_account], mint_account, states, infos)
+        metadata = _metadata(metadata_info)
+        tx = _mint(source_account, mint_account, user_account, link, supply, account_state, metadata)
+        return tx, signers
+
+
+async def create_and_mint(api_endpoint, source_account, name, symbol, fees, dest_key, link, supply=1, client=None, mint_account=None):
+    async with _connect(api_endpoint, client) as client:
+        if mint_account is None:
+            mint_account = Keypair()
+        user_account = PublicKey(dest_key)
+        signers = [source_account, mint_account]
+        lamports = await cluster_cache.minimum_balance_for_rent_exemption_async(api_endpoint, client, MINT_LAYOUT.sizeof()) # type: ignore
+        tx = _create_and_mint(source_account, mint_account, user_account, name, symbol, fees, link, supply, lamports)
+        return tx, signers, str(mint_account.public_key)
+
+
+async def send(api_endpoint, source_account, contract_key, sender_key, dest_key, private_key, client=None):
+    async with _connect(api_endpoint, client) as client:
+        owner_account = expand(private_key)
+        sender_account = PublicKey(sender_key)
+        mint_account = PublicKey(contract_key)
+        dest_account = PublicKey(dest_key)
+        signers = [source_account, owner_account]
+        states, addresses = _cached_states(api_endpoint, [sender_account, dest_account], mint_account)
+        infos = _accounts(await client.get_multiple_accounts(addresses)) if addresses else []
+        (sender_state, account_state), _ = _fill_states(api_endpoint, [sender_account, dest_account], mint_account, states, infos)
+        if sender_state == 0:
+            raise Exception
+        tx = _send(source_account, mint_account, sender_account, dest_account, account_state)
+        return tx, signers
+
+
+async def burn(api_endpoint, contract_key, owner_key, private_key, client=None):
+    async with _connect(api_endpoint, client) as client:
+        owner_account = PublicKey(owner_key)
+        mint_account = PublicKey(contract_key)
+        signers = [expand(private_key)]
+        states, addresses = _cached_states(api_endpoint, [owner_account], mint_account)
+        infos = _accounts(await client.get_multiple_accounts(addresses)) if addresses else []
+        (account_state,), _ = _fill_states(api_endpoint, [owner_account], mint_account, states, infos)
+        if account_state == 0:
+            raise Exception
+        tx = _burn(mint_account, owner_account)
+        return tx, signers
+
@@ -0,0 +1,125 @@
+import struct
+import base58
+
+METADATA_KEY = 4
+PUBKEY_LENGTH = 32
+
+_U32 = struct.Struct('<I')
+_I16 = struct.Struct('<h')
+
+
+class MetadataRecord():
+    """
+    Decoded Metadata account. Keys are kept as views into the account buffer and only base58 encoded on first access.
+    `to_dict()` returns exactly what `unpack_metadata_account` returns.
+    """
+    __slots__ = (
+        "_buffer",
+        "_update_authority",
+        "_mint",
+        "_creators",
+        "_creator_offsets",
+        "name",
+        "symbol",
+        "uri",
+        "seller_fee_basis_points",
+        "verified",
+        "share",
+        "primary_sale_happened",
+        "is_mutable",
+    )
+
+    def _key(self, offset):
+        return base58.b58encode(bytes(self._buffer[offset:offset+PUBKEY_LENGTH]))
+
+    @property
+    def update_authority(self):
+        if self._update_authority is None:
+            self._update_authority = self._key(1)
+        return self._update_authority
+
+    @property
+    def mint(self):
+        if self._mint is None:
+            self._mint = self._key(1 + PUBKEY_LENGTH)
+        return self._mint
+
+    @property
+    def creators(self):
+        if self._creators is None:
+            self._creators = [self._key(offset) for offset in self._creator_offsets]
+        return self._creators
+
+    def to_dict(self):
+        return {
+            "update_authority": self.update_authority,
+            "mint": self.mint,
+            "data": {
+                "name": self.name,
+                "symbol": self.symbol,
+                "uri": self.uri,
+                "seller_fee_basis_points": self.seller_fee_basis_points,
+                "creators": self.creators,
+                "verified": self.verified,
+                "share": self.share,
+            },
+            "primary_sale_happened": self.primary_sale_happened,
+            "is_mutable": self.is_mutable,
+        }
+
+    def __repr__(self):
+        return f"MetadataRecord(mint={self.mint}, name={self.name!r}, symbol={self.symbol!r})"
+
+
+def _read_string(view, i):
+    length = _U32.unpack_from(view, i)[0]
+    i += 4
+    if i + length > len(view):
+        raise struct.error(f"unpack requires a buffer of {length} bytes")
+    return str(view[i:i+length], "utf-8").strip("\x00"), i + length
+
+
+def decode_metadata(data):
+    """ Decode a raw Metadata account (bytes, bytearray or memoryview) into a MetadataRecord. """
+    view = memoryview(data)
+    assert(view[0] == METADATA_KEY)
+    record = MetadataRecord()
+    record._buffer = view
+    record._update_authority = None
+    record._mint = None
+    record._creators = None
+    i = 1 + 2 * PUBKEY_LENGTH
+    if i > len(view):
+        raise struct.error(f"unpack requires a buffer of {i} bytes")
+    record.name, i = _read_string(view, i)
+    record.symbol, i = _read_string(view, i)
+    record.uri, i = _read_string(view, i)
+    record.seller_fee_basis_points = _I16.unpack_from(view, i)[0]
+    i += 2
+    has_creator = view[i]
+    i += 1
+    creator_offsets = []
+    verified = []
+    share = []
+    if has_creator:
+        creator_len = _U32.unpack_from(view, i)[0]
+        i += 4
+        for _ in range(creator_len):
+            if i + PUBKEY_LENGTH > len(view):
+                raise struct.error(f"unpack requires a buffer of {PUBKEY_LENGTH} bytes")
+            creator_offsets.append(i)
+            i += PUBKEY_LENGTH
+            verified.append(view[i])
+            share.append(view[i+1])
+            i += 2
+    record._creator_offsets = creator_offsets
+    record.verified = verified
+    record.share = share
+    record.primary_sale_happened = bool(view[i])
+    record.is_mutable = bool(view[i+1])
+    return record
+
+
+def decode_many(buffers):
+    """ Decode a list of raw Metadata accounts. Missing accounts (None) are passed through as None. """
+    return [decode_metadata(data) if data is not None else None for data in buffers]
@@ -0,0 +1,213 @@
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from metaplex.metadata import MAX_MULTIPLE_ACCOUNTS, _read_metadata_chunk
+
+DEFAULT_MAX_AGE = 60
+# SQLite limits a statement to 999 bound parameters
+MAX_QUERY_PARAMS = 900
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS metadata (
+    mint TEXT PRIMARY KEY,
+    update_authority TEXT NOT NULL,
+    name TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    uri TEXT NOT NULL,
+    seller_fee_basis_points INTEGER NOT NULL,
+    primary_sale_happened INTEGER NOT NULL,
+    is_mutable INTEGER NOT NULL,
+    slot INTEGER NOT NULL,
+    fetched_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS metadata_update_authority ON metadata (update_authority);
+CREATE INDEX IF NOT EXISTS metadata_symbol ON metadata (symbol);
+CREATE TABLE IF NOT EXISTS creators (
+    mint TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    creator TEXT NOT NULL,
+    verified INTEGER NOT NULL,
+    share INTEGER NOT NULL,
+    PRIMARY KEY (mint, position)
+);
+CREATE INDEX IF NOT EXISTS creators_creator ON creators (creator);
+"""
+
+_COLUMNS = "mint, update_authority, name, symbol, uri, seller_fee_basis_points, primary_sale_happened, is_mutable, slot, fetched_at"
+
+
+def _text(key):
+    return key.decode("ascii") if isinstance(key, bytes) else str(key)
+
+
+class MetadataIndex():
+    """
+    SQLite index of decoded metadata accounts, stamped with the slot each account was read at. `get` and `get_many`
+    only serve entries that meet every bound given: read less than `max_age` seconds ago and, with `min_slot`, read
+    at or after that slot. Entries that fail either bound are stale and are fetched again with getMultipleAccounts. `by_creator`, `by_update_authority` and `by_symbol` only query the index.
+
+    Results are the same dicts `unpack_metadata_account` returns. An older read never overwrites a newer one, and
+    `invalidate` and `invalidate_before` drop entries whose on-chain state is known to have changed.
+    """
+
+    def __init__(self, path=":memory:", max_age=DEFAULT_MAX_AGE):
+        self.path = path
+        self.max_age = max_age
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        if path != ":memory:":
+            self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def put(self, metadata, slot, fetched_at=None):
+        """ Store one `unpack_metadata_account` result read at `slot`. Returns False if a newer read is already stored. """
+        return self.put_many([metadata], slot, fetched_at) == 1
+
+    def put_many(self, records, slot, fetched_at=None):
+        if fetched_at is None:
+            fetched_at = time.time()
+        stored = 0
+        with self._lock, self._db:
+            for metadata in records:
+                data = metadata["data"]
+                mint = _text(metadata["mint"])
+                cursor = self._db.execute(
+                    f"INSERT INTO metadata ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (mint) DO UPDATE SET "
+                    "update_authority=excluded.update_authority, name=excluded.name, symbol=excluded.symbol, "
+                    "uri=excluded.uri, seller_fee_basis_points=excluded.seller_fee_basis_points, "
+                    "primary_sale_happened=excluded.primary_sale_happened, is_mutable=excluded.is_mutable, "
+                    "slot=excluded.slot, fetched_at=excluded.fetched_at "
+                    "WHERE excluded.slot >= metadata.slot",
+                    (
+                        mint,
+                        _text(metadata["update_authority"]),
+                        data["name"],
+                        data["symbol"],
+                        data["uri"],
+                        data["seller_fee_basis_points"],
+                        int(metadata["primary_sale_happened"]),
+                        int(metadata["is_mutable"]),
+                        slot,
+                        fetched_at,
+                    ),
+                )
+                if cursor.rowcount == 0:
+                    continue
+                stored += 1
+                self._db.execute("DELETE FROM creators WHERE mint = ?", (mint,))
+                self._db.executemany(
+                    "INSERT INTO creators (mint, position, creator, verified, share) VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (mint, position, _text(creator), verified, share)
+                        for position, (creator, verified, share) in enumerate(zip(data["creators"], data["verified"], data["share"]))
+                    ],
+                )
+        return stored
+
+    def _select(self, where, params):
+        with self._lock:
+            rows = self._db.execute(f"SELECT {_COLUMNS} FROM metadata WHERE {where} ORDER BY mint", params).fetchall()
+            creators = self._db.execute(
+                f"SELECT mint, creator, verified, share FROM creators WHERE mint IN (SELECT mint FROM metadata WHERE {where}) ORDER BY mint, position",
+                params,
+            ).fetchall()
+        by_mint = {}
+        for mint, creator, verified, share in creators:
+            by_mint.setdefault(mint, []).append((creator, verified, share))
+        results = []
+        for mint, update_authority, name, symbol, uri, fee, primary_sale_happened, is_mutable, slot, fetched_at in rows:
+            mint_creators = by_mint.get(mint, [])
+            results.append((slot, fetched_at, {
+                "update_authority": update_authority.encode("ascii"),
+                "mint": mint.encode("ascii"),
+                "data": {
+                    "name": name,
+                    "symbol": symbol,
+                    "uri": uri,
+                    "seller_fee_basis_points": fee,
+                    "creators": [creator.encode("ascii") for creator, _, _ in mint_creators],
+                    "verified": [verified for _, verified, _ in mint_creators],
+                    "share": [share for _, _, share in mint_creators],
+                },
+                "primary_sale_happened": bool(primary_sale_happened),
+                "is_mutable": bool(is_mutable),
+            }))
+        return results
+
+    def lookup(self, mint_keys, max_age=None, min_slot=None):
+        """ Entries of the index meeting both `max_age` and `min_slot`, as a dict from mint (str) to metadata. """
+        if max_age is None:
+            max_age = self.max_age
+        mints = list(dict.fromkeys(_text(mint_key) for mint_key in mint_keys))
+        oldest = time.time() - max_age
+        found = {}
+        for i in range(0, len(mints), MAX_QUERY_PARAMS):
+            chunk = mints[i:i+MAX_QUERY_PARAMS]
+            for slot, fetched_at, metadata in self._select(f"mint IN ({', '.join('?' * len(chunk))})", chunk):
+                if fetched_at >= oldest and (min_slot is None or slot >= min_slot):
+                    found[metadata["mint"].decode("ascii")] = metadata
+        return found
+
+    def get_many(self, client, mint_keys, max_age=None, min_slot=None, chunk_size=MAX_MULTIPLE_ACCOUNTS, max_workers=4):
+        """
+        Index-backed `get_metadata_many`. Returns (mint_key, metadata) pairs in the order of `mint_keys`, reading
+        only the stale or missing entries from the chain. Metadata is None for accounts that do not exist.
+        """
+        mint_keys = list(mint_keys)
+        found = self.lookup(mint_keys, max_age=max_age, min_slot=min_slot)
+        missing = list(dict.fromkeys(_text(mint_key) for mint_key in mint_keys if _text(mint_key) not in found))
+        if missing:
+            chunks = [missing[i:i+chunk_size] for i in range(0, len(missing), chunk_size)]
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                for slot, results in pool.map(lambda chunk: _read_metadata_chunk(client, chunk), chunks):
+                    records = [metadata for _, metadata in results if metadata is not None]
+                    self.put_many(records, slot)
+                    for mint_key, metadata in results:
+                        found[mint_key] = metadata
+        return [(mint_key, found.get(_text(mint_key))) for mint_key in mint_keys]
+
+    def get(self, client, mint_key, max_age=None, min_slot=None):
+        """ Index-backed `get_metadata`. Returns None if the metadata account does not exist. """
+        return self.get_many(client, [mint_key], max_age=max_age, min_slot=min_slot)[0][1]
+
+    def by_creator(self, creator, verified=None):
+        where = "mint IN (SELECT mint FROM creators WHERE creator = ?"
+        params = [_text(creator)]
+        if verified is not None:
+            where += " AND verified = ?"
+            params.append(int(verified))
+        return [metadata for _, _, metadata in self._select(where + ")", params)]
+
+    def by_update_authority(self, update_authority):
+        return [metadata for _, _, metadata in self._select("update_authority = ?", [_text(update_authority)])]
+
+    def by_symbol(self, symbol):
+        return [metadata for _, _, metadata in self._select("symbol = ?", [symbol])]
+
+    def slot(self, mint_key):
+        """ Slot the stored entry of `mint_key` was read at, or None. """
+        with self._lock:
+            row = self._db.execute("SELECT slot FROM metadata WHERE mint = ?", (_text(mint_key),)).fetchone()
+        return row[0] if row is not None else None
+
+    def invalidate(self, mint_keys):
+        mints = [(_text(mint_key),) for mint_key in mint_keys]
+        with self._lock, self._db:
+            self._db.executemany("DELETE FROM creators WHERE mint = ?", mints)
+            self._db.executemany("DELETE FROM metadata WHERE mint = ?", mints)
+
+    def invalidate_before(self, slot):
+        """ Drop every entry read before `slot`. """
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM creators WHERE mint IN (SELECT mint FROM metadata WHERE slot < ?)", (slot,))
+            self._db.execute("DELETE FROM metadata WHERE slot < ?", (slot,))
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM metadata").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
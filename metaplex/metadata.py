@@ -1,18 +1,28 @@
 from typing import Union
+import os
 import struct
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
 from enum import IntEnum
-from construct import Bytes, Flag, Int8ul
-from construct import Struct as cStruct  # type: ignore
+from functools import lru_cache
 from solana.publickey import PublicKey
+from solana.rpc.core import RPCException
+from solana.rpc.types import MemcmpOpts
 from solana.transaction import AccountMeta, TransactionInstruction
 import base58
 import base64
+from metaplex.decoder import METADATA_KEY, decode_metadata
+from metaplex.pda import associated_token_seeds, derivation_cache, find_program_address
 
 MAX_NAME_LENGTH = 32
 MAX_SYMBOL_LENGTH = 10
 MAX_URI_LENGTH = 200
 MAX_CREATOR_LENGTH = 34
 MAX_CREATOR_LIMIT = 5
+MAX_METADATA_LEN = 679
+# Fixed offsets into a Metadata account, strings are padded to their maximum length on chain
+METADATA_UPDATE_AUTHORITY_OFFSET = 1
+METADATA_MINT_OFFSET = 33
+METADATA_FIRST_CREATOR_OFFSET = 1 + 32 + 32 + 4 + MAX_NAME_LENGTH + 4 + MAX_SYMBOL_LENGTH + 4 + MAX_URI_LENGTH + 2 + 1 + 4
 class InstructionType(IntEnum):
     CREATE_METADATA = 0
     UPDATE_METADATA = 1
@@ -23,17 +33,74 @@ SYSVAR_RENT_PUBKEY = PublicKey('SysvarRent111111111111111111111111111111111')
 ASSOCIATED_TOKEN_ACCOUNT_PROGRAM_ID = PublicKey('ATokenGPvbdGVxr1b2hvZbsiqW5xWH25efTNsLJA8knL')
 TOKEN_PROGRAM_ID = PublicKey('TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA')
 
+PROCESS_POOL_THRESHOLD = 4096
+MAX_MULTIPLE_ACCOUNTS = 100
+
+def metadata_seeds(mint_key):
+    return [b'metadata', bytes(METADATA_PROGRAM_ID), bytes(PublicKey(mint_key))]
+
+def edition_seeds(mint_key):
+    return [b'metadata', bytes(METADATA_PROGRAM_ID), bytes(PublicKey(mint_key)), b"edition"]
+
 def get_metadata_account(mint_key):
-    return PublicKey.find_program_address(
-        [b'metadata', bytes(METADATA_PROGRAM_ID), bytes(PublicKey(mint_key))],
-        METADATA_PROGRAM_ID
-    )[0]
+    return find_program_address(metadata_seeds(mint_key), METADATA_PROGRAM_ID)[0]
 
 def get_edition(mint_key):
-    return PublicKey.find_program_address(
-        [b'metadata', bytes(METADATA_PROGRAM_ID), bytes(PublicKey(mint_key)), b"edition"],
-        METADATA_PROGRAM_ID
-    )[0]
+    return find_program_address(edition_seeds(mint_key), METADATA_PROGRAM_ID)[0]
+
+def _derive_chunk(mints, owner):
+    # Runs in a worker process, so only plain bytes cross the process boundary
+    derived = []
+    for mint in mints:
+        metadata, metadata_bump = PublicKey.find_program_address(metadata_seeds(mint), METADATA_PROGRAM_ID)
+        edition, edition_bump = PublicKey.find_program_address(edition_seeds(mint), METADATA_PROGRAM_ID)
+        row = [(bytes(metadata), metadata_bump), (bytes(edition), edition_bump)]
+        if owner is not None:
+            ata, ata_bump = PublicKey.find_program_address(associated_token_seeds(owner, mint), ASSOCIATED_TOKEN_ACCOUNT_PROGRAM_ID)
+            row.append((bytes(ata), ata_bump))
+        derived.append(row)
+    return derived
+
+def derive_many(mints, owner=None, processes=None, chunksize=1024):
+    """
+    Derive the metadata and edition addresses (plus the associated token address of `owner`, if given) for many mints.
+    Collections larger than PROCESS_POOL_THRESHOLD are fanned out to a process pool unless `processes` is 0 or 1.
+    Everything derived is stored in the shared derivation cache. Returns one dict per mint, in order.
+    """
+    mints = [bytes(PublicKey(mint)) for mint in mints]
+    owner = bytes(PublicKey(owner)) if owner is not None else None
+    if processes is None:
+        processes = os.cpu_count() if len(mints) >= PROCESS_POOL_THRESHOLD else 1
+    if processes > 1 and len(mints) > chunksize:
+        chunks = [mints[i:i+chunksize] for i in range(0, len(mints), chunksize)]
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            derived = [row for rows in pool.map(_derive_chunk, chunks, [owner]*len(chunks)) for row in rows]
+        results = []
+        for mint, row in zip(mints, derived):
+            # Results come from the rows themselves, the cache is bounded and may already have evicted early mints
+            derivation_cache.prime(metadata_seeds(mint), METADATA_PROGRAM_ID, *row[0])
+            derivation_cache.prime(edition_seeds(mint), METADATA_PROGRAM_ID, *row[1])
+            result = {
+                "mint": PublicKey(mint),
+                "metadata": PublicKey(row[0][0]),
+                "edition": PublicKey(row[1][0]),
+            }
+            if owner is not None:
+                derivation_cache.prime(associated_token_seeds(owner, mint), ASSOCIATED_TOKEN_ACCOUNT_PROGRAM_ID, *row[2])
+                result["associated_token_account"] = PublicKey(row[2][0])
+            results.append(result)
+        return results
+    results = []
+    for mint in mints:
+        result = {
+            "mint": PublicKey(mint),
+            "metadata": get_metadata_account(mint),
+            "edition": get_edition(mint),
+        }
+        if owner is not None:
+            result["associated_token_account"] = find_program_address(associated_token_seeds(owner, mint), ASSOCIATED_TOKEN_ACCOUNT_PROGRAM_ID)[0]
+        results.append(result)
+    return results
 
 def create_associated_token_account_instruction(associated_token_account, payer, wallet_address, token_mint_address):
     keys = [
@@ -47,68 +114,81 @@ def create_associated_token_account_instruction(associated_token_account, payer,
     ]
     return TransactionInstruction(keys=keys, program_id=ASSOCIATED_TOKEN_ACCOUNT_PROGRAM_ID)
 
-def _get_data_buffer(name, symbol, uri, fee, creators, verified=None, share=None):
+_U8 = struct.Struct("<B")
+_U32 = struct.Struct("<I")
+_I16 = struct.Struct("<h")
+_CREATOR_FLAGS = struct.Struct("<BB")
+
+@lru_cache(maxsize=4096)
+def _creator_key(creator):
+    key = base58.b58decode(creator)
+    # A slice assignment of any other length would resize the buffer and shift everything after it
+    if len(key) != 32:
+        raise ValueError(f"Creator {creator!r} is not a 32-byte public key")
+    return key
+
+def _data_length(name, symbol, uri, creators):
+    length = 4 + len(name) + 4 + len(symbol) + 4 + len(uri) + 2 + 1
+    if creators:
+        length += 4 + (32 + 2) * len(creators)
+    return length
+
+def _pack_data(buffer, offset, name, symbol, uri, fee, creators, verified=None, share=None):
+    """ Write the metadata `Data` struct of already encoded strings into `buffer` at `offset`. Returns the end offset. """
     if isinstance(share, list):
         assert(len(share) == len(creators))
     if isinstance(verified, list):
         assert(len(verified) == len(creators))
-    args =  [
-        len(name),
-        *list(name.encode()),
-        len(symbol),
-        *list(symbol.encode()),
-        len(uri),
-        *list(uri.encode()),
-        fee,
-    ]
- 
-    byte_fmt = "<" 
-    byte_fmt += "I" + "B"*len(name)
-    byte_fmt += "I" + "B"*len(symbol)
-    byte_fmt += "I" + "B"*len(uri)
-    byte_fmt += "h"
-    byte_fmt += "B"
-    if creators:
-        args.append(1)
-        byte_fmt += "I"
-        args.append(len(creators))
-        for i, creator in enumerate(creators): 
-            byte_fmt +=  "B"*32 + "B" + "B"
-            args.extend(list(base58.b58decode(creator)))
-            if isinstance(verified, list):
-                args.append(verified[i])
-            else:
-                args.append(1)
-            if isinstance(share, list):
-                args.append(share[i])
-            else:
-                args.append(100)
-    else:
-        args.append(0) 
-    buffer = struct.pack(byte_fmt, *args)
-    return buffer
-    
-def create_metadata_instruction_data(name, symbol, fee, creators):
-    _data = _get_data_buffer(name, symbol, " "*64, fee, creators)
-    metadata_args_layout = cStruct(
-        "data" / Bytes(len(_data)),
-        "is_mutable" / Flag,
-    )
-    _create_metadata_args = dict(data=_data, is_mutable=True)
-    instruction_layout = cStruct(
-        "instruction_type" / Int8ul,
-        "args" / metadata_args_layout,
-    )
-    return instruction_layout.build(
-        dict(
-            instruction_type=InstructionType.CREATE_METADATA,
-            args=_create_metadata_args,
+    for value in (name, symbol, uri):
+        _U32.pack_into(buffer, offset, len(value))
+        offset += 4
+        buffer[offset:offset+len(value)] = value
+        offset += len(value)
+    _I16.pack_into(buffer, offset, fee)
+    offset += 2
+    if not creators:
+        _U8.pack_into(buffer, offset, 0)
+        return offset + 1
+    _U8.pack_into(buffer, offset, 1)
+    _U32.pack_into(buffer, offset + 1, len(creators))
+    offset += 5
+    for i, creator in enumerate(creators):
+        buffer[offset:offset+32] = _creator_key(creator)
+        _CREATOR_FLAGS.pack_into(
+            buffer,
+            offset + 32,
+            verified[i] if isinstance(verified, list) else 1,
+            share[i] if isinstance(share, list) else 100,
         )
-    )
+        offset += 34
+    return offset
+
+def _encode_instruction_data(prefix, suffix, name, symbol, uri, fee, creators, verified=None, share=None):
+    name, symbol, uri = name.encode(), symbol.encode(), uri.encode()
+    buffer = bytearray(len(prefix) + _data_length(name, symbol, uri, creators) + len(suffix))
+    buffer[:len(prefix)] = prefix
+    offset = _pack_data(buffer, len(prefix), name, symbol, uri, fee, creators, verified, share)
+    buffer[offset:] = suffix
+    return bytes(buffer)
+
+def _get_data_buffer(name, symbol, uri, fee, creators, verified=None, share=None):
+    return _encode_instruction_data(b"", b"", name, symbol, uri, fee, creators, verified, share)
+
+# Instruction type, then `Data` and is_mutable=True
+_CREATE_METADATA_PREFIX = bytes([InstructionType.CREATE_METADATA])
+_CREATE_METADATA_SUFFIX = bytes([1])
+# Instruction type and Some(data), then no new update authority and primary_sale_happened unchanged
+_UPDATE_METADATA_PREFIX = bytes([InstructionType.UPDATE_METADATA, 1])
+_UPDATE_METADATA_SUFFIX = bytes([0, 0])
+
+def create_metadata_instruction_data(name, symbol, fee, creators, uri=None):
+    # Without a uri, 64 spaces are written as a placeholder for `mint` to replace
+    if uri is None:
+        uri = " "*64
+    return _encode_instruction_data(_CREATE_METADATA_PREFIX, _CREATE_METADATA_SUFFIX, name, symbol, uri, fee, creators)
 
 def create_metadata_instruction(data, update_authority, mint_key, mint_authority_key, payer):
     metadata_account = get_metadata_account(mint_key)
-    print(metadata_account)
     keys = [
         AccountMeta(pubkey=metadata_account, is_signer=False, is_writable=True),
         AccountMeta(pubkey=mint_key, is_signer=False, is_writable=False),
@@ -121,61 +201,7 @@ def create_metadata_instruction(data, update_authority, mint_key, mint_authority
     return TransactionInstruction(keys=keys, program_id=METADATA_PROGRAM_ID, data=data)
 
 def unpack_metadata_account(data):
-    assert(data[0] == 4)
-    i = 1
-    source_account = base58.b58encode(bytes(struct.unpack('<' + "B"*32, data[i:i+32])))
-    i += 32
-    mint_account = base58.b58encode(bytes(struct.unpack('<' + "B"*32, data[i:i+32])))
-    i += 32
-    name_len = struct.unpack('<I', data[i:i+4])[0]
-    i += 4
-    name = struct.unpack('<' + "B"*name_len, data[i:i+name_len])
-    i += name_len
-    symbol_len = struct.unpack('<I', data[i:i+4])[0]
-    i += 4 
-    symbol = struct.unpack('<' + "B"*symbol_len, data[i:i+symbol_len])
-    i += symbol_len
-    uri_len = struct.unpack('<I', data[i:i+4])[0]
-    i += 4 
-    uri = struct.unpack('<' + "B"*uri_len, data[i:i+uri_len])
-    i += uri_len
-    fee = struct.unpack('<h', data[i:i+2])[0]
-    i += 2
-    has_creator = data[i] 
-    i += 1
-    creators = []
-    verified = []
-    share = []
-    if has_creator:
-        creator_len = struct.unpack('<I', data[i:i+4])[0]
-        i += 4
-        for _ in range(creator_len):
-            creator = base58.b58encode(bytes(struct.unpack('<' + "B"*32, data[i:i+32])))
-            creators.append(creator)
-            i += 32
-            verified.append(data[i])
-            i += 1
-            share.append(data[i])
-            i += 1
-    primary_sale_happened = bool(data[i])
-    i += 1
-    is_mutable = bool(data[i])
-    metadata = {
-        "update_authority": source_account,
-        "mint": mint_account,
-        "data": {
-            "name": bytes(name).decode("utf-8").strip("\x00"),
-            "symbol": bytes(symbol).decode("utf-8").strip("\x00"),
-            "uri": bytes(uri).decode("utf-8").strip("\x00"),
-            "seller_fee_basis_points": fee,
-            "creators": creators,
-            "verified": verified,
-            "share": share,
-        },
-        "primary_sale_happened": primary_sale_happened,
-        "is_mutable": is_mutable,
-    }
-    return metadata
+    return decode_metadata(data).to_dict()
 
 def get_metadata(client, mint_key):
     metadata_account = get_metadata_account(mint_key)
@@ -183,18 +209,84 @@ def get_metadata(client, mint_key):
     metadata = unpack_metadata_account(data)
     return metadata
 
+def _read_metadata_chunk(client, mint_keys):
+    """ Returns the slot the chunk was read at and its (mint_key, metadata) pairs. """
+    metadata_accounts = [get_metadata_account(mint_key) for mint_key in mint_keys]
+    resp = client.get_multiple_accounts(metadata_accounts)
+    if 'error' in resp:
+        raise RPCException(resp['error'])
+    results = []
+    for mint_key, account_info in zip(mint_keys, resp['result']['value']):
+        if account_info is None:
+            results.append((mint_key, None))
+        else:
+            results.append((mint_key, unpack_metadata_account(base64.b64decode(account_info['data'][0]))))
+    return resp['result']['context']['slot'], results
+
+def _get_metadata_chunk(client, mint_keys):
+    return _read_metadata_chunk(client, mint_keys)[1]
+
+def get_metadata_many(client, mint_keys, chunk_size=MAX_MULTIPLE_ACCOUNTS, max_workers=4):
+    """
+    Batched `get_metadata`. Metadata accounts are fetched with getMultipleAccounts in chunks of `chunk_size` keys,
+    with up to `max_workers` chunks in flight at once.
+    Yields (mint_key, metadata) pairs as chunks complete, where metadata is None for accounts that do not exist.
+    """
+    mint_keys = list(mint_keys)
+    chunks = iter([mint_keys[i:i+chunk_size] for i in range(0, len(mint_keys), chunk_size)])
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pending = set()
+        while True:
+            # Keep the window bounded so a slow consumer does not buffer the whole collection
+            for chunk in chunks:
+                pending.add(pool.submit(_get_metadata_chunk, client, chunk))
+                if len(pending) >= max_workers:
+                    break
+            if not pending:
+                return
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield from future.result()
+
+def _scan_filters(creator=None, update_authority=None, mint=None):
+    filters = [MemcmpOpts(offset=0, bytes=base58.b58encode(bytes([METADATA_KEY])).decode("ascii"))]
+    for offset, key in (
+        (METADATA_FIRST_CREATOR_OFFSET, creator),
+        (METADATA_UPDATE_AUTHORITY_OFFSET, update_authority),
+        (METADATA_MINT_OFFSET, mint),
+    ):
+        if key is not None:
+            filters.append(MemcmpOpts(offset=offset, bytes=str(PublicKey(key))))
+    return filters
+
+def scan_metadata(client, creator=None, update_authority=None, mint=None, shard_bytes=0, data_size=None):
+    """
+    Enumerate Metadata accounts with getProgramAccounts, filtered on the node by first creator, update authority
+    and mint. Yields (metadata account, MetadataRecord) pairs.
+
+    A node returns every match of a getProgramAccounts call at once, so with `shard_bytes` set the scan is split
+    into 256 ** shard_bytes calls, one per leading mint prefix, and only one shard is held in memory at a time.
+    """
+    filters = _scan_filters(creator, update_authority, mint)
+    if mint is not None:
+        shard_bytes = 0
+    for shard in range(256 ** shard_bytes):
+        memcmp_opts = list(filters)
+        if shard_bytes:
+            prefix = shard.to_bytes(shard_bytes, "big")
+            memcmp_opts.append(MemcmpOpts(offset=METADATA_MINT_OFFSET, bytes=base58.b58encode(prefix).decode("ascii")))
+        resp = client.get_program_accounts(METADATA_PROGRAM_ID, encoding="base64", data_size=data_size, memcmp_opts=memcmp_opts)
+        if 'error' in resp:
+            raise RPCException(resp['error'])
+        accounts = resp['result']
+        del resp
+        # Popped so each account's JSON is released as soon as it is decoded
+        while accounts:
+            account = accounts.pop()
+            yield account['pubkey'], decode_metadata(base64.b64decode(account['account']['data'][0]))
+
 def update_metadata_instruction_data(name, symbol, uri, fee, creators, verified, share):
-    _data = bytes([1]) + _get_data_buffer(name, symbol, uri, fee, creators,  verified, share) + bytes([0, 0])
-    instruction_layout = cStruct(
-        "instruction_type" / Int8ul,
-        "args" / Bytes(len(_data)),
-    )
-    return instruction_layout.build(
-        dict(
-            instruction_type=InstructionType.UPDATE_METADATA,
-            args=_data,
-        )
-    )
+    return _encode_instruction_data(_UPDATE_METADATA_PREFIX, _UPDATE_METADATA_SUFFIX, name, symbol, uri, fee, creators, verified, share)
 
 def update_metadata_instruction(data, update_authority, mint_key):
     metadata_account = get_metadata_account(mint_key)
@@ -0,0 +1,118 @@
+from solana.transaction import Transaction, PACKET_DATA_SIZE
+
+# A transaction may lock at most 64 accounts, program ids included
+MAX_ACCOUNT_KEYS = 64
+SIGNATURE_LENGTH = 64
+PUBLIC_KEY_LENGTH = 32
+# num_required_signatures, num_readonly_signed_accounts and num_readonly_unsigned_accounts
+MESSAGE_HEADER_LENGTH = 3
+
+
+def _shortvec_length(n):
+    """ Number of bytes of the compact-u16 length prefix used by the wire format. """
+    size = 1
+    while n >= 0x80:
+        n >>= 7
+        size += 1
+    return size
+
+
+def _instruction_length(ix):
+    return 1 + _shortvec_length(len(ix.keys)) + len(ix.keys) + _shortvec_length(len(ix.data)) + len(ix.data)
+
+
+class TransactionPacker():
+    """
+    Greedily packs groups of instructions into as few transactions as possible, without going over the
+    1232 byte packet limit or `max_accounts` account keys. A group (for example everything one builder adds
+    for a mint) is never split across transactions, and groups keep their order.
+
+    `add` returns the transaction it had to close to make room, if any, and `flush` returns the last one.
+    Transactions come as `(tx, signers)` with `fee_payer` set and no recent blockhash, ready for `execute`.
+    """
+
+    def __init__(self, fee_payer, max_size=PACKET_DATA_SIZE, max_accounts=MAX_ACCOUNT_KEYS):
+        self.fee_payer = fee_payer
+        self.max_size = max_size
+        self.max_accounts = max_accounts
+        self._reset()
+
+    def _reset(self):
+        fee_payer = str(self.fee_payer.public_key)
+        self._instructions = []
+        self._signers = {fee_payer: self.fee_payer}
+        self._keys = {fee_payer}
+        self._signer_keys = {fee_payer}
+        self._instructions_length = 0
+
+    def _size(self, keys, signer_keys, instructions, instructions_length):
+        return (
+            _shortvec_length(len(signer_keys)) + SIGNATURE_LENGTH * len(signer_keys)
+            + MESSAGE_HEADER_LENGTH
+            + _shortvec_length(len(keys)) + PUBLIC_KEY_LENGTH * len(keys)
+            + PUBLIC_KEY_LENGTH
+            + _shortvec_length(instructions) + instructions_length
+        )
+
+    def _fits(self, instructions):
+        keys = set(self._keys)
+        signer_keys = set(self._signer_keys)
+        length = self._instructions_length
+        for ix in instructions:
+            keys.add(str(ix.program_id))
+            for meta in ix.keys:
+                keys.add(str(meta.pubkey))
+                if meta.is_signer:
+                    signer_keys.add(str(meta.pubkey))
+            length += _instruction_length(ix)
+        if len(keys) > self.max_accounts:
+            return None
+        if self._size(keys, signer_keys, len(self._instructions) + len(instructions), length) > self.max_size:
+            return None
+        return keys, signer_keys, length
+
+    def add(self, instructions, signers=()):
+        """
+        Add a group of instructions (a list or a `Transaction`) along with the keypairs that must sign them.
+        Raises ValueError if the group does not fit in a transaction on its own.
+        """
+        if isinstance(instructions, Transaction):
+            instructions = instructions.instructions
+        instructions = list(instructions)
+        packed = None
+        fits = self._fits(instructions)
+        if fits is None and self._instructions:
+            packed = self.flush()
+            fits = self._fits(instructions)
+        if fits is None:
+            raise ValueError(f"{len(instructions)} instructions do not fit in a single transaction")
+        self._keys, self._signer_keys, self._instructions_length = fits
+        self._instructions.extend(instructions)
+        for signer in signers:
+            self._signers.setdefault(str(signer.public_key), signer)
+        return packed
+
+    def flush(self):
+        """ Close the transaction being filled. Returns `(tx, signers)`, or None if it is empty. """
+        if not self._instructions:
+            return None
+        tx = Transaction(fee_payer=self.fee_payer.public_key)
+        tx.add(*self._instructions)
+        signers = [self._signers[key] for key in self._signers if key in self._signer_keys]
+        self._reset()
+        return tx, signers
+
+
+def pack(groups, fee_payer, max_size=PACKET_DATA_SIZE, max_accounts=MAX_ACCOUNT_KEYS):
+    """
+    Pack an iterable of `(instructions, signers)` groups, e.g. the `(tx, signers)` pairs returned by the
+    builders in `metaplex.transactions`. Yields `(tx, signers)` as soon as each transaction is full.
+    """
+    packer = TransactionPacker(fee_payer, max_size=max_size, max_accounts=max_accounts)
+    for instructions, signers in groups:
+        packed = packer.add(instructions, signers)
+        if packed is not None:
+            yield packed
+    packed = packer.flush()
+    if packed is not None:
+        yield packed
@@ -0,0 +1,67 @@
+import threading
+from cachetools import LRUCache
+from solana.publickey import PublicKey
+from spl.token.constants import ASSOCIATED_TOKEN_PROGRAM_ID, TOKEN_PROGRAM_ID
+
+DEFAULT_CACHE_SIZE = 65536
+
+
+class DerivationCache():
+    """
+    Bounded LRU of program derived addresses keyed by (seeds, program).
+    Each entry holds the address together with its bump seed, exactly as returned by `find_program_address`.
+    """
+
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE):
+        self._cache = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(seeds, program_id):
+        return (tuple(bytes(seed) for seed in seeds), bytes(program_id))
+
+    def find_program_address(self, seeds, program_id):
+        key = self.key(seeds, program_id)
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                self.hits += 1
+                return entry
+            self.misses += 1
+        # Derive outside of the lock, a duplicate derivation is cheaper than serializing every caller
+        entry = PublicKey.find_program_address(list(key[0]), PublicKey(program_id))
+        with self._lock:
+            self._cache[key] = entry
+        return entry
+
+    def prime(self, seeds, program_id, address, bump):
+        """ Store an address that was derived elsewhere (e.g. in a worker process). """
+        with self._lock:
+            self._cache[self.key(seeds, program_id)] = (PublicKey(address), bump)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._cache)
+
+
+derivation_cache = DerivationCache()
+
+
+def find_program_address(seeds, program_id):
+    return derivation_cache.find_program_address(seeds, program_id)
+
+
+def associated_token_seeds(owner, mint):
+    return [bytes(PublicKey(owner)), bytes(TOKEN_PROGRAM_ID), bytes(PublicKey(mint))]
+
+
+def get_associated_token_address(owner, mint):
+    """ Cached equivalent of `spl.token.instructions.get_associated_token_address`. """
+    return find_program_address(associated_token_seeds(owner, mint), ASSOCIATED_TOKEN_PROGRAM_ID)[0]
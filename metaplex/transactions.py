@@ -4,10 +4,11 @@ from solana.publickey import PublicKey
 from solana.transaction import Transaction
 from solana.keypair import Keypair 
 from solana.rpc.api import Client
+from solana.rpc.core import RPCException
 from solana.system_program import transfer, TransferParams, create_account, CreateAccountParams 
 from spl.token._layouts import MINT_LAYOUT, ACCOUNT_LAYOUT
 from spl.token.instructions import (
-    get_associated_token_address, mint_to, MintToParams,
+    mint_to, MintToParams,
     transfer as spl_transfer, TransferParams as SPLTransferParams,
     burn as spl_burn, BurnParams,
     initialize_mint, InitializeMintParams,
@@ -17,27 +18,43 @@ from metaplex.metadata import (
     create_master_edition_instruction,
     create_metadata_instruction_data, 
     create_metadata_instruction,
-    get_metadata,
+    get_metadata_account,
+    unpack_metadata_account,
     update_metadata_instruction_data,
     update_metadata_instruction,
     ASSOCIATED_TOKEN_ACCOUNT_PROGRAM_ID,
     TOKEN_PROGRAM_ID,
 )
+from metaplex.packer import pack
+from metaplex.pda import get_associated_token_address
+from utils.account_cache import account_cache
+from utils.cluster_cache import cluster_cache
+from utils.signing import expand
 
 
-def deploy(api_endpoint, source_account, name, symbol, fees):
+def deploy(api_endpoint, source_account, name, symbol, fees, client=None, mint_account=None):
+    """
+    Pass the `mint_account` keypair of an earlier attempt to deploy the same contract again: if that attempt
+    landed after all, the new transaction fails instead of deploying a second contract.
+    """
     # Initalize Client
-    client = Client(api_endpoint)
+    if client is None:
+        client = Client(api_endpoint)
     # List non-derived accounts
-    mint_account = Keypair()
-    token_account = TOKEN_PROGRAM_ID 
+    if mint_account is None:
+        mint_account = Keypair()
     # List signers
     signers = [source_account, mint_account]
+    # Get the minimum rent balance for a mint account
+    lamports = cluster_cache.minimum_balance_for_rent_exemption(api_endpoint, client, MINT_LAYOUT.sizeof()) # type: ignore
+    tx = _deploy(source_account, mint_account, name, symbol, fees, lamports)
+    return tx, signers, str(mint_account.public_key)
+
+
+def _deploy(source_account, mint_account, name, symbol, fees, lamports, uri=None):
+    token_account = TOKEN_PROGRAM_ID 
     # Start transaction
     tx = Transaction()
-    # Get the minimum rent balance for a mint account
-    min_rent_reseponse = client.get_minimum_balance_for_rent_exemption(MINT_LAYOUT.sizeof()) # type: ignore
-    lamports = min_rent_reseponse["result"]
     # Generate Mint 
     create_mint_account_ix = create_account(
         CreateAccountParams(
@@ -61,14 +78,14 @@ def deploy(api_endpoint, source_account, name, symbol, fees):
     tx = tx.add(initialize_mint_ix)
     # Create Token Metadata
     create_metadata_ix = create_metadata_instruction(
-        data=create_metadata_instruction_data(name, symbol, fees, [str(source_account.public_key)]),
+        data=create_metadata_instruction_data(name, symbol, fees, [str(source_account.public_key)], uri=uri),
         update_authority=source_account.public_key,
         mint_key=mint_account.public_key,
         mint_authority_key=source_account.public_key,
         payer=source_account.public_key,
     )
     tx = tx.add(create_metadata_ix)
-    return tx, signers, str(mint_account.public_key)
+    return tx
     
 
 def wallet():
@@ -84,28 +101,60 @@ def wallet():
     )
 
 
-def topup(api_endpoint, sender_account, to, amount=None):
+def topup(api_endpoint, sender_account, to, amount=None, client=None):
     """
     Send a small amount of native currency to the specified wallet to handle gas fees. Return a status flag of success or fail and the native transaction data.
     """
     # Connect to the api_endpoint
-    client = Client(api_endpoint)
-    # List accounts 
-    dest_account = PublicKey(to)
+    if client is None:
+        client = Client(api_endpoint)
     # List signers
     signers = [sender_account]
-    # Start transaction
-    tx = Transaction()
     # Determine the amount to send 
     if amount is None:
-        min_rent_reseponse = client.get_minimum_balance_for_rent_exemption(ACCOUNT_LAYOUT.sizeof())
-        lamports = min_rent_reseponse["result"]
+        lamports = cluster_cache.minimum_balance_for_rent_exemption(api_endpoint, client, ACCOUNT_LAYOUT.sizeof())
     else:
         lamports = int(amount)
+    tx = _topup(sender_account, to, lamports)
+    return tx, signers
+
+
+def topup_many(api_endpoint, sender_account, recipients, amount=None, client=None):
+    """
+    Topup many wallets, packing as many transfers per transaction as fit. The default amount is resolved once.
+    Returns a list of (tx, signers, recipients) batches, one per transaction.
+    """
+    recipients = list(recipients)
+    if amount is None:
+        if client is None:
+            client = Client(api_endpoint)
+        lamports = cluster_cache.minimum_balance_for_rent_exemption(api_endpoint, client, ACCOUNT_LAYOUT.sizeof())
+    else:
+        lamports = int(amount)
+    return _topup_many(sender_account, recipients, lamports)
+
+
+def _topup_many(sender_account, recipients, lamports):
+    groups = ((_topup(sender_account, to, lamports), [sender_account]) for to in recipients)
+    batches = []
+    packed = 0
+    for tx, signers in pack(groups, sender_account):
+        # Each topup is a single transfer instruction
+        count = len(tx.instructions)
+        batches.append((tx, signers, recipients[packed:packed+count]))
+        packed += count
+    return batches
+
+
+def _topup(sender_account, to, lamports):
+    # List accounts 
+    dest_account = PublicKey(to)
+    # Start transaction
+    tx = Transaction()
     # Generate transaction
     transfer_ix = transfer(TransferParams(from_pubkey=sender_account.public_key, to_pubkey=dest_account, lamports=lamports))
     tx = tx.add(transfer_ix)
-    return tx, signers
+    return tx
 
 def update_token_metadata(api_endpoint, source_account, mint_token_id, link, data, fee, creators_addresses, creators_verified, creators_share):
     """
@@ -133,7 +182,7 @@ def update_token_metadata(api_endpoint, source_account, mint_token_id, link, dat
     return tx, signers
 
 
-def mint(api_endpoint, source_account, contract_key, dest_key, link, supply=1):
+def mint(api_endpoint, source_account, contract_key, dest_key, link, supply=1, client=None):
     """
     Mint a token on the specified network and contract, into the wallet specified by address.
     Required parameters: batch, sequence, limit
@@ -145,24 +194,65 @@ def mint(api_endpoint, source_account, contract_key, dest_key, link, supply=1):
     Return a status flag of success or fail and the native transaction data.
     """
     # Initialize Client
-    client = Client(api_endpoint)
+    if client is None:
+        client = Client(api_endpoint)
     # List non-derived accounts
     mint_account = PublicKey(contract_key)
     user_account = PublicKey(dest_key)
-    token_account = TOKEN_PROGRAM_ID
     # List signers
     signers = [source_account]
+    # Check if PDA is initialized. If not, the account is created in the transaction
+    # One round trip for the PDA (unless cached) and the metadata
+    states, addresses = _cached_states(api_endpoint, [user_account], mint_account)
+    infos = _accounts(client.get_multiple_accounts(addresses + [get_metadata_account(mint_account)]))
+    (account_state,), (metadata_info,) = _fill_states(api_endpoint, [user_account], mint_account, states, infos)
+    metadata = _metadata(metadata_info)
+    tx = _mint(source_account, mint_account, user_account, link, supply, account_state, metadata)
+    return tx, signers
+
+
+def _accounts(resp):
+    """ Account infos of a getMultipleAccounts response, None for accounts that do not exist. """
+    if 'error' in resp:
+        raise RPCException(resp['error'])
+    return resp['result']['value']
+
+
+def _metadata(account_info):
+    if account_info is None:
+        raise Exception
+    return unpack_metadata_account(base64.b64decode(account_info['data'][0]))
+
+
+def _cached_states(api_endpoint, owners, mint_account):
+    """ States of the PDAs of `owners` for `mint_account` from `account_cache`, None where unknown, and the PDAs to read. """
+    states = [account_cache.get(api_endpoint, owner, mint_account) for owner in owners]
+    addresses = [get_associated_token_address(owner, mint_account) for owner, state in zip(owners, states) if state is None]
+    return states, addresses
+
+
+def _fill_states(api_endpoint, owners, mint_account, states, infos):
+    """ Complete `states` with the account infos read for the PDAs of `_cached_states`. Returns the states and the remaining infos. """
+    infos = iter(infos)
+    states = list(states)
+    for i, (owner, state) in enumerate(zip(owners, states)):
+        if state is None:
+            states[i] = _account_state(next(infos))
+            account_cache.set(api_endpoint, owner, mint_account, states[i])
+    return states, list(infos)
+
+
+def _account_state(account_info):
+    if account_info is not None: 
+        return ACCOUNT_LAYOUT.parse(base64.b64decode(account_info['data'][0])).state
+    return 0
+
+
+def _mint(source_account, mint_account, user_account, link, supply, account_state, metadata):
     # Start transaction
     tx = Transaction()
     # Create Associated Token Account
     associated_token_account = get_associated_token_address(user_account, mint_account)
-    associated_token_account_info = client.get_account_info(associated_token_account)
-    # Check if PDA is initialized. If not, create the account
-    account_info = associated_token_account_info['result']['value']
-    if account_info is not None: 
-        account_state = ACCOUNT_LAYOUT.parse(base64.b64decode(account_info['data'][0])).state
-    else:
-        account_state = 0
     if account_state == 0:
         associated_token_account_ix = create_associated_token_account_instruction(
             associated_token_account=associated_token_account,
@@ -183,7 +273,6 @@ def mint(api_endpoint, source_account, contract_key, dest_key, link, supply=1):
         )
     )
     tx = tx.add(mint_to_ix) 
-    metadata = get_metadata(client, mint_account)
     update_metadata_data = update_metadata_instruction_data(
         metadata['data']['name'],
         metadata['data']['symbol'],
@@ -207,39 +296,95 @@ def mint(api_endpoint, source_account, contract_key, dest_key, link, supply=1):
         supply=supply,
     )
     tx = tx.add(create_master_edition_ix) 
-    return tx, signers
+    return tx
 
 
-def send(api_endpoint, source_account, contract_key, sender_key, dest_key, private_key):
+def create_and_mint(api_endpoint, source_account, name, symbol, fees, dest_key, link, supply=1, client=None, mint_account=None):
+    """
+    Deploy a contract and mint its token to `dest_key` in a single transaction. The metadata is created with its
+    final link, so unlike `deploy` followed by `mint` nothing has to be read back or confirmed in between.
+    `mint_account` works as for `deploy`.
+    """
+    # Initialize Client
+    if client is None:
+        client = Client(api_endpoint)
+    # List non-derived accounts
+    if mint_account is None:
+        mint_account = Keypair()
+    user_account = PublicKey(dest_key)
+    # List signers
+    signers = [source_account, mint_account]
+    lamports = cluster_cache.minimum_balance_for_rent_exemption(api_endpoint, client, MINT_LAYOUT.sizeof()) # type: ignore
+    tx = _create_and_mint(source_account, mint_account, user_account, name, symbol, fees, link, supply, lamports)
+    return tx, signers, str(mint_account.public_key)
+
+
+def _create_and_mint(source_account, mint_account, user_account, name, symbol, fees, link, supply, lamports):
+    tx = _deploy(source_account, mint_account, name, symbol, fees, lamports, uri=link)
+    # The mint is new, so its associated token account cannot exist yet
+    associated_token_account = get_associated_token_address(user_account, mint_account.public_key)
+    associated_token_account_ix = create_associated_token_account_instruction(
+        associated_token_account=associated_token_account,
+        payer=source_account.public_key, # signer
+        wallet_address=user_account,
+        token_mint_address=mint_account.public_key,
+    )
+    tx = tx.add(associated_token_account_ix)
+    mint_to_ix = mint_to(
+        MintToParams(
+            program_id=TOKEN_PROGRAM_ID,
+            mint=mint_account.public_key,
+            dest=associated_token_account,
+            mint_authority=source_account.public_key,
+            amount=1,
+            signers=[source_account.public_key],
+        )
+    )
+    tx = tx.add(mint_to_ix)
+    create_master_edition_ix = create_master_edition_instruction(
+        mint=mint_account.public_key,
+        update_authority=source_account.public_key,
+        mint_authority=source_account.public_key,
+        payer=source_account.public_key,
+        supply=supply,
+    )
+    tx = tx.add(create_master_edition_ix)
+    return tx
+
+
+def send(api_endpoint, source_account, contract_key, sender_key, dest_key, private_key, client=None):
     """
     Transfer a token on a given network and contract from the sender to the recipient.
     May require a private key, if so this will be provided encrypted using Fernet: https://cryptography.io/en/latest/fernet/
     Return a status flag of success or fail and the native transaction data. 
     """
     # Initialize Client
-    client = Client(api_endpoint)
+    if client is None:
+        client = Client(api_endpoint)
     # List non-derived accounts
-    owner_account = Keypair(private_key) # Owner of contract 
+    owner_account = expand(private_key) # Owner of contract 
     sender_account = PublicKey(sender_key) # Public key of `owner_account`
-    token_account = TOKEN_PROGRAM_ID
     mint_account = PublicKey(contract_key)
     dest_account = PublicKey(dest_key)
     # This is a very rare care, but in the off chance that the source wallet is the recipient of a transfer we don't need a list of 2 keys
     signers = [source_account, owner_account]
+    # Find PDA for sender, and for receiver. If the receiver's is not initialized, it is created in the transaction
+    # One round trip for both PDAs, none if both are cached
+    states, addresses = _cached_states(api_endpoint, [sender_account, dest_account], mint_account)
+    infos = _accounts(client.get_multiple_accounts(addresses)) if addresses else []
+    (sender_state, account_state), _ = _fill_states(api_endpoint, [sender_account, dest_account], mint_account, states, infos)
+    if sender_state == 0:
+        raise Exception
+    tx = _send(source_account, mint_account, sender_account, dest_account, account_state)
+    return tx, signers
+
+
+def _send(source_account, mint_account, sender_account, dest_account, account_state):
+    token_account = TOKEN_PROGRAM_ID
     # Start transaction
     tx = Transaction()
-    # Find PDA for sender
     token_pda_address = get_associated_token_address(sender_account, mint_account)
-    if client.get_account_info(token_pda_address)['result']['value'] is None: 
-        raise Exception
-    # Check if PDA is initialized for receiver. If not, create the account
     associated_token_account = get_associated_token_address(dest_account, mint_account)
-    associated_token_account_info = client.get_account_info(associated_token_account)
-    account_info = associated_token_account_info['result']['value']
-    if account_info is not None: 
-        account_state = ACCOUNT_LAYOUT.parse(base64.b64decode(account_info['data'][0])).state
-    else:
-        account_state = 0
     if account_state == 0:
         associated_token_account_ix = create_associated_token_account_instruction(
             associated_token_account=associated_token_account,
@@ -260,29 +405,38 @@ def send(api_endpoint, source_account, contract_key, sender_key, dest_key, priva
         )
     )
     tx = tx.add(spl_transfer_ix)
-    return tx, signers
+    return tx
 
 
-def burn(api_endpoint, contract_key, owner_key, private_key):
+def burn(api_endpoint, contract_key, owner_key, private_key, client=None):
     """
     Burn a token, permanently removing it from the blockchain.
     May require a private key, if so this will be provided encrypted using Fernet: https://cryptography.io/en/latest/fernet/
     Return a status flag of success or fail and the native transaction data.
     """
     # Initialize Client
-    client = Client(api_endpoint)
+    if client is None:
+        client = Client(api_endpoint)
     # List accounts
     owner_account = PublicKey(owner_key)
-    token_account = TOKEN_PROGRAM_ID
     mint_account = PublicKey(contract_key)
     # List signers
-    signers = [Keypair(private_key)]
+    signers = [expand(private_key)]
+    # Find PDA for sender
+    states, addresses = _cached_states(api_endpoint, [owner_account], mint_account)
+    infos = _accounts(client.get_multiple_accounts(addresses)) if addresses else []
+    (account_state,), _ = _fill_states(api_endpoint, [owner_account], mint_account, states, infos)
+    if account_state == 0:
+        raise Exception
+    tx = _burn(mint_account, owner_account)
+    return tx, signers
+
+
+def _burn(mint_account, owner_account):
+    token_account = TOKEN_PROGRAM_ID
     # Start transaction
     tx = Transaction()
-    # Find PDA for sender
     token_pda_address = get_associated_token_address(owner_account, mint_account)
-    if client.get_account_info(token_pda_address)['result']['value'] is None: 
-        raise Exception
     # Burn token
     burn_ix = spl_burn(
         BurnParams(
@@ -295,4 +449,4 @@ def burn(api_endpoint, contract_key, owner_key, private_key):
         )
     )
     tx = tx.add(burn_ix)
-    return tx, signers
+    return tx
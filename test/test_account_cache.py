@@ -0,0 +1,80 @@
+import json
+import time
+import pytest
+from solana.keypair import Keypair
+from api.metaplex_api import MetaplexAPI
+from metaplex.transactions import _send, send
+from testing.fake_validator import FakeValidator
+from testing.helpers import api_config
+from utils.account_cache import AccountStateCache, account_cache
+from utils.execution_engine import execute
+from utils.submission import TransactionFailed
+
+
+def test_negative_entries_expire():
+    cache = AccountStateCache(negative_ttl=0.05)
+    owner, mint = Keypair().public_key, Keypair().public_key
+    assert cache.get("a", owner, mint) is None
+    cache.set("a", owner, mint, 0)
+    assert cache.get("a", owner, mint) == 0
+    assert cache.get("b", owner, mint) is None
+    time.sleep(0.06)
+    assert cache.get("a", owner, mint) is None
+    cache.set("a", owner, mint, 1)
+    time.sleep(0.06)
+    assert cache.get("a", owner, mint) == 1
+    assert (cache.hits, cache.misses) == (2, 3)
+
+
+def test_positive_entries_expire():
+    cache = AccountStateCache(positive_ttl=0.05)
+    owner, mint = Keypair().public_key, Keypair().public_key
+    cache.set("a", owner, mint, 1)
+    assert cache.get("a", owner, mint) == 1
+    time.sleep(0.06)
+    assert cache.get("a", owner, mint) is None
+
+
+def test_failed_transactions_are_not_recorded():
+    source, sender, dest, mint = Keypair(), Keypair(), Keypair().public_key, Keypair().public_key
+    with FakeValidator(confirmation_delay=0, finalization_delay=0) as validator:
+        api_endpoint = validator.endpoint
+        # A stale entry: the sender's account does not exist
+        account_cache.set(api_endpoint, sender.public_key, mint, 1)
+        # Creates the recipient's account, then fails the transfer
+        tx = _send(source, mint, sender.public_key, dest, 0)
+        with pytest.raises(TransactionFailed):
+            execute(api_endpoint, tx, [source, sender], skip_confirmation=False, rebroadcast_interval=0.02)
+        assert account_cache.get(api_endpoint, dest, mint) is None
+        assert account_cache.get(api_endpoint, sender.public_key, mint) is None
+
+
+def test_lru_and_record_transaction():
+    cache = AccountStateCache(maxsize=2)
+    source, mint, sender, dest = Keypair(), Keypair().public_key, Keypair().public_key, Keypair().public_key
+    cache.record_transaction("a", _send(source, mint, sender, dest, 0))
+    assert cache.get("a", dest, mint) == 1
+    assert cache.get("a", sender, mint) is None
+    cache.set("a", sender, mint, 1)
+    cache.set("a", source.public_key, mint, 1)
+    assert len(cache) == 2 and cache.get("a", dest, mint) is None
+
+
+def test_repeat_sends_skip_reads():
+    source, holder, dest = Keypair(), Keypair(), Keypair()
+    cfg = api_config(source)
+    with FakeValidator(confirmation_delay=0, finalization_delay=0) as validator:
+        api_endpoint = validator.endpoint
+        api = MetaplexAPI(cfg)
+        try:
+            contract = json.loads(api.deploy(api_endpoint, "name", "SYM", 0))["contract"]
+            assert json.loads(api.mint(api_endpoint, contract, str(holder.public_key), "https://arweave.net/x"))["status"] == 200
+            encrypted = api.cipher.encrypt(holder.seed)
+            assert json.loads(api.send(api_endpoint, contract, str(holder.public_key), str(dest.public_key), encrypted))["status"] == 200
+            validator.requests.clear()
+            # Both PDAs were created by our own confirmed transactions
+            tx, _ = send(api_endpoint, api.keypair, contract, str(dest.public_key), str(holder.public_key), list(dest.seed), client=api.clients.get(api_endpoint))
+            assert validator.requests == {}
+            assert len(tx.instructions) == 1
+        finally:
+            api.clients.close()
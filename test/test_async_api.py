@@ -0,0 +1,70 @@
+import asyncio
+import json
+from solana.keypair import Keypair
+from solana.rpc.api import Client
+import api.async_metaplex_api
+from api.async_metaplex_api import AsyncMetaplexAPI
+from metaplex.metadata import get_metadata
+from testing.fake_validator import FakeValidator
+from testing.helpers import api_config, token_amount
+
+
+def test_async_api_story():
+    with FakeValidator(confirmation_delay=0.05, finalization_delay=0.1) as validator:
+        api_endpoint = validator.endpoint
+        client = Client(api_endpoint)
+
+        async def story():
+            async with AsyncMetaplexAPI(api_config()) as api:
+                deploy_response = json.loads(await api.deploy(api_endpoint, "N"*32, "S"*10, 250))
+                assert deploy_response["status"] == 200
+                contract = deploy_response["contract"]
+                wallet, wallet2 = json.loads(api.wallet()), json.loads(api.wallet())
+                encrypted_pk1 = api.cipher.encrypt(bytes(wallet["private_key"]))
+                encrypted_pk2 = api.cipher.encrypt(bytes(wallet2["private_key"]))
+                assert json.loads(await api.mint(api_endpoint, contract, wallet["address"], "https://arweave.net/x"))["status"] == 200
+                metadata = get_metadata(client, contract)
+                assert metadata["data"]["uri"] == "https://arweave.net/x"
+                assert metadata["data"]["seller_fee_basis_points"] == 250
+                assert token_amount(client, wallet["address"], contract) == 1
+                assert json.loads(await api.send(api_endpoint, contract, wallet["address"], wallet2["address"], encrypted_pk1))["status"] == 200
+                assert (token_amount(client, wallet["address"], contract), token_amount(client, wallet2["address"], contract)) == (0, 1)
+                assert json.loads(await api.burn(api_endpoint, contract, wallet2["address"], encrypted_pk2))["status"] == 200
+                assert token_amount(client, wallet2["address"], contract) == 0
+                # Sending again fails on chain, the account is empty
+                assert json.loads(await api.send(api_endpoint, contract, wallet2["address"], wallet["address"], encrypted_pk2))["status"] == 400
+                created, topped_up = await asyncio.gather(
+                    api.create_and_mint(api_endpoint, "M"*32, "T"*10, 0, wallet2["address"], "https://arweave.net/y"),
+                    api.topup_many(api_endpoint, [wallet["address"], wallet2["address"]], amount=1000),
+                )
+                created = json.loads(created)
+                assert created["status"] == 200
+                assert token_amount(client, wallet2["address"], created["contract"]) == 1
+                assert [result["status"] for result in json.loads(topped_up)["results"]] == [200, 200]
+
+        asyncio.run(story())
+    assert validator.requests["sendTransaction"] == 7
+
+
+def test_topup_many_is_bounded(monkeypatch):
+    in_flight = []
+    peak = []
+
+    async def execute(api_endpoint, tx, signers, **kwargs):
+        in_flight.append(tx)
+        peak.append(len(in_flight))
+        await asyncio.sleep(0.01)
+        in_flight.remove(tx)
+        return {"result": "sig"}
+
+    monkeypatch.setattr(api.async_metaplex_api, "execute", execute)
+    recipients = [str(Keypair().public_key) for _ in range(200)]
+
+    async def topup():
+        async with AsyncMetaplexAPI(api_config()) as api:
+            return json.loads(await api.topup_many("http://localhost:8899", recipients, amount=1000, max_workers=3))
+
+    resp = asyncio.run(topup())
+    assert [result["to"] for result in resp["results"]] == recipients
+    assert all(result["status"] == 200 for result in resp["results"])
+    assert max(peak) == 3
@@ -0,0 +1,41 @@
+from utils.blockhash_provider import BlockhashProvider
+
+
+class _BlockhashClient():
+
+    def __init__(self):
+        self.calls = 0
+
+    def get_recent_blockhash(self, commitment=None):
+        self.calls += 1
+        return {
+            "jsonrpc": "2.0",
+            "result": {"context": {"slot": self.calls}, "value": {"blockhash": f"hash{self.calls}", "feeCalculator": {"lamportsPerSignature": 5000}}},
+            "id": 1,
+        }
+
+
+def test_blockhash_is_cached_until_it_runs_low():
+    client = _BlockhashClient()
+    provider = BlockhashProvider(client, refresh_interval=60)
+    try:
+        assert [provider.get() for _ in range(5)] == ["hash1"] * 5
+        assert client.calls == 1
+        provider.invalidate()
+        assert provider.get() == "hash2"
+        provider.min_remaining_slots = provider.remaining_slots() + 1
+        assert provider.get() == "hash3"
+    finally:
+        provider.close()
+
+
+def test_background_refresh():
+    client = _BlockhashClient()
+    provider = BlockhashProvider(client, refresh_interval=0.05)
+    try:
+        provider.get()
+        provider._stop.wait(0.3)
+        assert client.calls > 2
+        assert client.calls >= provider.fetches > 2
+    finally:
+        provider.close()
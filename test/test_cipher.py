@@ -0,0 +1,86 @@
+import json
+import time
+import pytest
+from cryptography.fernet import Fernet, InvalidToken
+from solana.keypair import Keypair
+from api.metaplex_api import MetaplexAPI
+from testing.fake_validator import FakeValidator
+from testing.helpers import api_config
+from utils.cipher import CachingFernet
+from utils.signing import keypair_cache
+
+
+def test_repeated_tokens_are_decrypted_once():
+    key = Fernet.generate_key()
+    cipher = CachingFernet(key)
+    token = Fernet(key).encrypt(b"seed")
+    assert cipher.decrypt(token) == b"seed"
+    assert cipher.decrypt(token.decode("ascii")) == b"seed"
+    assert (cipher.hits, cipher.misses) == (1, 1)
+    with pytest.raises(InvalidToken):
+        cipher.decrypt(Fernet(Fernet.generate_key()).encrypt(b"seed"))
+
+
+def test_token_ttl_is_checked_on_hits():
+    key = Fernet.generate_key()
+    cipher = CachingFernet(key)
+    token = Fernet(key).encrypt_at_time(b"seed", int(time.time()) - 100)
+    assert cipher.decrypt(token) == b"seed"
+    assert cipher.decrypt(token, ttl=1000) == b"seed"
+    with pytest.raises(InvalidToken):
+        cipher.decrypt(token, ttl=10)
+    assert cipher.hits == 2
+
+
+def test_evicted_plaintexts_are_zeroed():
+    key = Fernet.generate_key()
+    cipher = CachingFernet(key, maxsize=2)
+    tokens = [Fernet(key).encrypt(bytes([i + 1]) * 32) for i in range(3)]
+    returned = [cipher.decrypt(token) for token in tokens[:2]]
+    first = next(iter(cipher._plaintexts.values()))[2]
+    cipher.decrypt(tokens[2])
+    assert len(cipher) == 2
+    assert first == bytearray(32)
+    second = next(iter(cipher._plaintexts.values()))[2]
+    cipher.clear()
+    assert second == bytearray(32)
+    assert len(cipher) == 0
+    # Callers get copies, which are not zeroed
+    assert returned == [bytes([1]) * 32, bytes([2]) * 32]
+
+
+def test_cache_ttl():
+    key = Fernet.generate_key()
+    cipher = CachingFernet(key, cache_ttl=0)
+    token = Fernet(key).encrypt(b"seed")
+    cipher.decrypt(token)
+    cipher.decrypt(token)
+    assert (cipher.hits, cipher.misses) == (0, 2)
+
+
+def test_decrypt_many():
+    key = Fernet.generate_key()
+    cipher = CachingFernet(key)
+    tokens = [Fernet(key).encrypt(b"a"), Fernet(key).encrypt(b"b"), b"garbage"]
+    assert cipher.decrypt_many(tokens + tokens[:1]) == [b"a", b"b", None, b"a"]
+    assert cipher.misses == 3
+
+
+def test_decrypted_keys_are_only_kept_by_the_cipher():
+    source, holder, dest = Keypair(), Keypair(), Keypair()
+    cfg = api_config(source)
+    with FakeValidator(confirmation_delay=0, finalization_delay=0) as validator:
+        api_endpoint = validator.endpoint
+        api = MetaplexAPI(cfg)
+        try:
+            contract = json.loads(api.deploy(api_endpoint, "name", "SYM", 0))["contract"]
+            assert json.loads(api.mint(api_endpoint, contract, str(holder.public_key), "https://arweave.net/x"))["status"] == 200
+            cached = len(keypair_cache)
+            assert json.loads(api.send(api_endpoint, contract, str(holder.public_key), str(dest.public_key), api.cipher.encrypt(holder.seed)))["status"] == 200
+            assert json.loads(api.burn(api_endpoint, contract, str(dest.public_key), api.cipher.encrypt(dest.seed)))["status"] == 200
+            assert len(keypair_cache) == cached
+            assert {bytes(entry[2]) for entry in api.cipher._plaintexts.values()} == {holder.seed, dest.seed}
+            api.cipher.clear()
+            assert len(api.cipher) == 0
+        finally:
+            api.clients.close()
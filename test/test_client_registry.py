@@ -0,0 +1,36 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from utils.client_registry import ClientRegistry
+
+
+class _RentHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        body = json.dumps({"jsonrpc": "2.0", "result": 2039280, "id": request["id"]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_registry_reuses_connections_per_endpoint():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _RentHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    api_endpoint = f"http://127.0.0.1:{server.server_address[1]}"
+    registry = ClientRegistry(pool_size=2)
+    try:
+        assert registry.get(api_endpoint) is registry.get(api_endpoint)
+        for _ in range(5):
+            assert registry.get(api_endpoint).get_minimum_balance_for_rent_exemption(165)["result"] == 2039280
+        stats = registry.stats()[api_endpoint]
+        assert stats == {"requests": 5, "connections": 1, "reused": 4}
+    finally:
+        registry.close()
+        server.shutdown()
@@ -0,0 +1,58 @@
+import asyncio
+import pytest
+from solana.rpc.core import RPCException
+from utils.cluster_cache import ClusterCache, WARMUP_SIZES
+
+
+class _RentClient():
+
+    def __init__(self, error=False):
+        self.calls = []
+        self.error = error
+
+    def get_minimum_balance_for_rent_exemption(self, size):
+        self.calls.append(size)
+        if self.error:
+            return {"jsonrpc": "2.0", "error": {"code": -32005, "message": "Node is behind"}, "id": 1}
+        return {"jsonrpc": "2.0", "result": 890880 + size, "id": 1}
+
+
+class _AsyncRentClient(_RentClient):
+
+    async def get_minimum_balance_for_rent_exemption(self, size):
+        return super().get_minimum_balance_for_rent_exemption(size)
+
+
+def test_rent_is_cached_per_endpoint_and_size():
+    cache = ClusterCache()
+    client = _RentClient()
+    assert cache.minimum_balance_for_rent_exemption("http://a", client, 82) == 890962
+    assert cache.minimum_balance_for_rent_exemption("http://a", client, 82) == 890962
+    assert cache.minimum_balance_for_rent_exemption("http://a", client, 165) == 891045
+    assert cache.minimum_balance_for_rent_exemption("http://b", client, 82) == 890962
+    assert client.calls == [82, 165, 82]
+    assert (cache.hits, cache.misses) == (1, 3)
+
+
+def test_warm_and_async_lookup_share_entries():
+    cache = ClusterCache()
+    cache.warm("http://a", _RentClient())
+    client = _AsyncRentClient()
+    lamports = asyncio.run(cache.minimum_balance_for_rent_exemption_async("http://a", client, WARMUP_SIZES[0]))
+    assert lamports == 890880 + WARMUP_SIZES[0]
+    assert client.calls == []
+
+
+def test_errors_are_not_cached():
+    cache = ClusterCache()
+    with pytest.raises(RPCException):
+        cache.minimum_balance_for_rent_exemption("http://a", _RentClient(error=True), 82)
+    assert cache.minimum_balance_for_rent_exemption("http://a", _RentClient(), 82) == 890962
+
+
+def test_entries_expire():
+    cache = ClusterCache(ttl=0)
+    client = _RentClient()
+    cache.minimum_balance_for_rent_exemption("http://a", client, 82)
+    cache.minimum_balance_for_rent_exemption("http://a", client, 82)
+    assert client.calls == [82, 82]
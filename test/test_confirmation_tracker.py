@@ -0,0 +1,56 @@
+import threading
+import time
+from utils.confirmation_tracker import ConfirmationTracker, MAX_SIGNATURES_PER_REQUEST
+
+
+class _StatusClient():
+    """ Confirms every signature `delay` seconds after it was first polled. """
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = []
+        self.first_seen = {}
+        self.lock = threading.Lock()
+
+    def get_signature_statuses(self, signatures):
+        now = time.time()
+        with self.lock:
+            self.calls.append(len(signatures))
+            value = []
+            for signature in signatures:
+                first_seen = self.first_seen.setdefault(signature, now)
+                if now - first_seen >= self.delay:
+                    value.append({"slot": 1, "confirmations": None, "err": None, "confirmationStatus": "finalized"})
+                else:
+                    value.append({"slot": 1, "confirmations": 1, "err": None, "confirmationStatus": "processed"})
+        return {"jsonrpc": "2.0", "result": {"context": {"slot": 1}, "value": value}, "id": 1}
+
+
+def test_tracker_batches_signatures_per_poll():
+    client = _StatusClient()
+    tracker = ConfirmationTracker(client, min_interval=0.05)
+    confirmed = []
+    futures = [
+        tracker.track(f"sig{n}", callback=lambda signature, status: confirmed.append(signature))
+        for n in range(600)
+    ]
+    try:
+        statuses = [future.result(timeout=5) for future in futures]
+        assert all(status["confirmationStatus"] == "finalized" for status in statuses)
+        assert sorted(client.calls, reverse=True)[:3] == [MAX_SIGNATURES_PER_REQUEST, MAX_SIGNATURES_PER_REQUEST, 600 - 2 * MAX_SIGNATURES_PER_REQUEST]
+        assert len(client.calls) < 10
+        assert len(confirmed) == 600
+        assert tracker.pending() == 0
+    finally:
+        tracker.close()
+
+
+def test_tracker_respects_target_and_timeout():
+    client = _StatusClient(delay=10)
+    tracker = ConfirmationTracker(client, min_interval=0.05)
+    try:
+        status = tracker.wait("sig", max_timeout=5, target=1, finalized=False)
+        assert status["confirmationStatus"] == "processed"
+        assert tracker.wait("other", max_timeout=0.2) is None
+    finally:
+        tracker.close()
@@ -0,0 +1,106 @@
+import asyncio
+import json
+import time
+from contextlib import ExitStack
+import pytest
+from solana.keypair import Keypair
+from api.async_metaplex_api import AsyncMetaplexAPI
+from api.metaplex_api import MetaplexAPI
+from metaplex.metadata import get_metadata
+from testing.fake_validator import FakeValidator
+from testing.helpers import api_config
+from utils.endpoint_pool import EndpointPool
+from utils.metrics import metrics, HEDGES
+
+RENT = "getMinimumBalanceForRentExemption"
+
+
+def _cluster(stack, *configs):
+    primary = stack.enter_context(FakeValidator(**configs[0]))
+    return [primary] + [stack.enter_context(FakeValidator(replica_of=primary, **config)) for config in configs[1:]]
+
+
+def test_reads_go_to_the_fastest_node():
+    with ExitStack() as stack:
+        slow, fast, medium = _cluster(stack, {"latency": 0.1}, {"latency": 0}, {"latency": 0.05})
+        pool = EndpointPool([slow.endpoint, fast.endpoint, medium.endpoint])
+        stack.callback(pool.close)
+        for _ in range(10):
+            assert pool.make_request(RENT, 0)["result"] > 0
+        # One request each to measure them, then the fastest only
+        assert [node.requests[RENT] for node in (slow, fast, medium)] == [1, 8, 1]
+        assert pool.endpoint_uri == fast.endpoint
+
+
+def test_failing_nodes_are_skipped():
+    with ExitStack() as stack:
+        broken, healthy = _cluster(stack, {"error_rate": 1}, {"latency": 0.01})
+        pool = EndpointPool([broken.endpoint, healthy.endpoint], cooldown=60)
+        stack.callback(pool.close)
+        for _ in range(20):
+            assert "result" in pool.make_request(RENT, 0)
+        assert pool.health()[broken.endpoint]["down"]
+        assert broken.requests[RENT] == 5
+        assert healthy.requests[RENT] == 20
+
+
+def test_slow_reads_are_hedged():
+    with ExitStack() as stack:
+        first, second = _cluster(stack, {}, {"latency": 0.01})
+        pool = EndpointPool([first.endpoint, second.endpoint], hedge_percentile=0.9)
+        stack.callback(pool.close)
+        for _ in range(10):
+            pool.make_request(RENT, 0)
+        assert pool.endpoint_uri == first.endpoint
+        first.latency = 2
+        started = time.monotonic()
+        assert "result" in pool.make_request(RENT, 0)
+        assert time.monotonic() - started < 1
+        assert metrics.snapshot()["counters"][(HEDGES, (("endpoint", str(pool)), ("method", RENT)))] >= 1
+
+
+def test_transactions_fan_out():
+    keypair = Keypair()
+    with ExitStack() as stack:
+        # Only one node gets transactions through to the leader
+        nodes = _cluster(
+            stack,
+            {"drop_rate": 1, "confirmation_delay": 0, "finalization_delay": 0},
+            {"drop_rate": 1},
+            {"latency": 0.05},
+        )
+        pool = EndpointPool([node.endpoint for node in nodes])
+        api = MetaplexAPI(api_config(keypair))
+        stack.callback(api.clients.close)
+        result = json.loads(api.deploy(pool, "A"*32, "B"*10, 100))
+        assert result["status"] == 200
+        assert all(node.requests["sendTransaction"] >= 1 for node in nodes)
+        assert get_metadata(api.clients.get(pool), result["contract"])["data"]["symbol"] == "B"*10
+
+
+def test_api_story_through_a_pool():
+    with ExitStack() as stack:
+        nodes = _cluster(stack, {"confirmation_delay": 0, "finalization_delay": 0}, {"latency": 0.01})
+        pool = EndpointPool([node.endpoint for node in nodes])
+        api = MetaplexAPI(api_config())
+        stack.callback(api.clients.close)
+        holder, dest = Keypair(), Keypair()
+        contract = json.loads(api.deploy(pool, "A"*32, "B"*10, 100))["contract"]
+        assert json.loads(api.mint(pool, contract, str(holder.public_key), "https://arweave.net/x"))["status"] == 200
+        assert json.loads(api.send(pool, contract, str(holder.public_key), str(dest.public_key), api.cipher.encrypt(holder.seed)))["status"] == 200
+        assert json.loads(api.burn(pool, contract, str(dest.public_key), api.cipher.encrypt(dest.seed)))["status"] == 200
+        assert len(nodes[0].signatures) == 4
+
+
+def test_async_api_takes_urls_only():
+    pool = EndpointPool(["http://127.0.0.1:1"])
+    try:
+        async def deploy():
+            async with AsyncMetaplexAPI(api_config()) as api:
+                with pytest.raises(TypeError):
+                    api.client(pool)
+                return json.loads(await api.deploy(pool, "A"*32, "B"*10, 100))
+
+        assert asyncio.run(deploy())["status"] == 400
+    finally:
+        pool.close()
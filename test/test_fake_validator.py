@@ -0,0 +1,75 @@
+import json
+import pytest
+import requests
+from solana.keypair import Keypair
+from solana.publickey import PublicKey
+from solana.rpc.api import Client
+from solana.rpc.types import TxOpts
+from api.metaplex_api import MetaplexAPI
+from metaplex.metadata import get_metadata
+from metaplex.pda import get_associated_token_address
+from metaplex.transactions import _send
+from testing.fake_validator import FakeValidator
+from testing.helpers import api_config, token_amount
+
+
+def test_api_story():
+    keypair = Keypair()
+    cfg = api_config(keypair)
+    with FakeValidator(confirmation_delay=0.05, finalization_delay=0.1) as validator:
+        api_endpoint = validator.endpoint
+        api = MetaplexAPI(cfg)
+        client = api.clients.get(api_endpoint)
+        try:
+            deploy_response = json.loads(api.deploy(api_endpoint, "N"*32, "S"*10, 250))
+            assert deploy_response["status"] == 200
+            contract = deploy_response["contract"]
+            wallet, wallet2 = json.loads(api.wallet()), json.loads(api.wallet())
+            encrypted_pk1 = api.cipher.encrypt(bytes(wallet["private_key"]))
+            encrypted_pk2 = api.cipher.encrypt(bytes(wallet2["private_key"]))
+            assert json.loads(api.mint(api_endpoint, contract, wallet["address"], "https://arweave.net/x"))["status"] == 200
+            metadata = get_metadata(client, contract)
+            assert metadata["data"]["uri"] == "https://arweave.net/x"
+            assert metadata["data"]["seller_fee_basis_points"] == 250
+            assert token_amount(client, wallet["address"], contract) == 1
+            assert json.loads(api.send(api_endpoint, contract, wallet["address"], wallet2["address"], encrypted_pk1))["status"] == 200
+            assert (token_amount(client, wallet["address"], contract), token_amount(client, wallet2["address"], contract)) == (0, 1)
+            assert json.loads(api.burn(api_endpoint, contract, wallet2["address"], encrypted_pk2))["status"] == 200
+            assert token_amount(client, wallet2["address"], contract) == 0
+        finally:
+            api.clients.close()
+    assert validator.requests["sendTransaction"] == 4
+
+
+def test_error_injection():
+    with FakeValidator(error_rate=1) as validator:
+        assert Client(validator.endpoint).get_minimum_balance_for_rent_exemption(82)["error"]["code"] == -32005
+    with FakeValidator(rate_limit_rate=1) as validator:
+        with pytest.raises(requests.HTTPError):
+            Client(validator.endpoint).get_minimum_balance_for_rent_exemption(82)
+
+
+def test_failed_transactions_are_rolled_back():
+    keypair, owner = Keypair(), Keypair()
+    cfg = api_config(keypair)
+    with FakeValidator(confirmation_delay=0, finalization_delay=0) as validator:
+        api = MetaplexAPI(cfg)
+        client = api.clients.get(validator.endpoint)
+        try:
+            contract = json.loads(api.deploy(validator.endpoint, "N"*32, "S"*10, 250))["contract"]
+            assert json.loads(api.mint(validator.endpoint, contract, str(owner.public_key), "https://arweave.net/x"))["status"] == 200
+            statuses = []
+            # The second transfer creates an account for the recipient, then fails: the owner has no token left
+            for dest in (Keypair().public_key, Keypair().public_key):
+                tx = _send(keypair, PublicKey(contract), owner.public_key, dest, 0)
+                tx.recent_blockhash = client.get_recent_blockhash()["result"]["value"]["blockhash"]
+                tx.sign(keypair, owner)
+                signature = client.send_raw_transaction(tx.serialize(), opts=TxOpts(skip_preflight=True))["result"]
+                statuses.append(client.get_signature_statuses([signature])["result"]["value"][0])
+            assert token_amount(client, str(owner.public_key), contract) == 0
+        finally:
+            api.clients.close()
+        assert statuses[0]["err"] is None
+        assert statuses[1]["err"] == {"InstructionError": [1, {"Custom": 1}]}
+        assert statuses[1]["status"] == {"Err": statuses[1]["err"]}
+        assert str(get_associated_token_address(dest, PublicKey(contract))) not in validator.accounts
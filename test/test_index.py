@@ -0,0 +1,86 @@
+import json
+import time
+from solana.keypair import Keypair
+from api.metaplex_api import MetaplexAPI
+from metaplex.index import MetadataIndex
+from metaplex.metadata import get_metadata
+from testing.fake_validator import FakeValidator
+from testing.helpers import api_config
+
+
+def test_index_serves_fresh_entries(tmp_path):
+    keypair = Keypair()
+    with FakeValidator(confirmation_delay=0, finalization_delay=0) as validator:
+        api_endpoint = validator.endpoint
+        api = MetaplexAPI(api_config(keypair))
+        client = api.clients.get(api_endpoint)
+        index = MetadataIndex(str(tmp_path / "metadata.db"))
+        try:
+            contracts = [json.loads(api.deploy(api_endpoint, name*32, symbol*10, 100))["contract"] for name, symbol in (("A", "X"), ("B", "X"), ("C", "Y"))]
+            missing = str(Keypair().public_key)
+            reads = validator.requests.get("getMultipleAccounts", 0)
+            results = index.get_many(client, contracts + [missing])
+            assert [mint for mint, _ in results] == contracts + [missing]
+            assert results[-1][1] is None
+            for mint, metadata in results[:-1]:
+                assert metadata == get_metadata(client, mint)
+            assert validator.requests["getMultipleAccounts"] == reads + 1
+
+            # Served from the index until stale
+            assert index.get(client, contracts[0]) == results[0][1]
+            assert validator.requests["getMultipleAccounts"] == reads + 1
+            assert index.get(client, contracts[0], max_age=0) == results[0][1]
+            assert index.get(client, contracts[0], min_slot=index.slot(contracts[0]) + 1000) == results[0][1]
+            assert validator.requests["getMultipleAccounts"] == reads + 3
+
+            assert [m["mint"].decode() for m in index.by_symbol("X"*10)] == sorted(contracts[:2])
+            assert len(index.by_creator(keypair.public_key)) == 3
+            assert len(index.by_update_authority(str(keypair.public_key))) == 3
+            assert index.by_creator(keypair.public_key, verified=False) == []
+        finally:
+            api.clients.close()
+            index.close()
+
+    # Persisted across instances
+    index = MetadataIndex(str(tmp_path / "metadata.db"))
+    assert len(index) == 3
+    index.invalidate([contracts[0]])
+    assert len(index) == 2 and index.by_symbol("X"*10)[0]["mint"].decode() == contracts[1]
+    index.invalidate_before(10**9)
+    assert len(index) == 0
+    index.close()
+
+
+def test_older_reads_do_not_overwrite():
+    index = MetadataIndex()
+    metadata = {
+        "update_authority": b"1"*32,
+        "mint": b"2"*32,
+        "data": {"name": "new", "symbol": "S", "uri": "u", "seller_fee_basis_points": 1, "creators": [b"3"*32], "verified": [1], "share": [100]},
+        "primary_sale_happened": False,
+        "is_mutable": True,
+    }
+    assert index.put(metadata, slot=10)
+    stale = dict(metadata, data=dict(metadata["data"], name="old", creators=[], verified=[], share=[]))
+    assert not index.put(stale, slot=9)
+    assert index.lookup(["2"*32])["2"*32] == metadata
+
+
+def test_either_bound_makes_an_entry_stale():
+    index = MetadataIndex(max_age=60)
+    metadata = {
+        "update_authority": b"1"*32,
+        "mint": b"2"*32,
+        "data": {"name": "n", "symbol": "S", "uri": "u", "seller_fee_basis_points": 1, "creators": [], "verified": [], "share": []},
+        "primary_sale_happened": False,
+        "is_mutable": True,
+    }
+    index.put(metadata, slot=10)
+    # Recent but below min_slot
+    assert index.lookup(["2"*32], min_slot=11) == {}
+    assert "2"*32 in index.lookup(["2"*32], min_slot=10)
+    # Recent enough slot, too old
+    index.put(metadata, slot=20, fetched_at=time.time() - 120)
+    assert index.lookup(["2"*32]) == {}
+    assert index.lookup(["2"*32], min_slot=20) == {}
+    assert "2"*32 in index.lookup(["2"*32], max_age=300)
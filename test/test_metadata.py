@@ -0,0 +1,111 @@
+import base64
+import base58
+import pytest
+from solana.keypair import Keypair
+from metaplex.decoder import decode_many, decode_metadata
+from metaplex.metadata import (
+    _get_data_buffer,
+    create_metadata_instruction_data,
+    get_metadata_account,
+    get_metadata_many,
+    unpack_metadata_account,
+    update_metadata_instruction_data,
+)
+
+
+def _metadata_account(name, symbol, uri, fee, creators, verified, share, primary_sale_happened=False, is_mutable=True):
+    update_authority = bytes(Keypair().public_key)
+    mint = bytes(Keypair().public_key)
+    data = _get_data_buffer(name, symbol, uri, fee, creators, verified, share)
+    return update_authority, mint, bytes([4]) + update_authority + mint + data + bytes([primary_sale_happened, is_mutable])
+
+
+def test_decode_metadata_matches_dict_layout():
+    creators = [str(Keypair().public_key) for _ in range(5)]
+    update_authority, mint, account = _metadata_account(
+        "N"*32, "S"*10, "https://arweave.net/" + "u"*180, 500, creators, [1, 0, 1, 0, 1], [20]*5, True, False,
+    )
+    expected = {
+        "update_authority": base58.b58encode(update_authority),
+        "mint": base58.b58encode(mint),
+        "data": {
+            "name": "N"*32,
+            "symbol": "S"*10,
+            "uri": "https://arweave.net/" + "u"*180,
+            "seller_fee_basis_points": 500,
+            "creators": [creator.encode() for creator in creators],
+            "verified": [1, 0, 1, 0, 1],
+            "share": [20]*5,
+        },
+        "primary_sale_happened": True,
+        "is_mutable": False,
+    }
+    assert unpack_metadata_account(account) == expected
+    assert decode_metadata(memoryview(account)).to_dict() == expected
+
+
+def test_decode_strips_padding_and_handles_no_creators():
+    _, _, account = _metadata_account("A\x00\x00", "B\x00", " "*64, 0, [], None, None)
+    record = decode_metadata(account)
+    assert record.name == "A"
+    assert record.symbol == "B"
+    assert record.uri == " "*64
+    assert record.creators == []
+    assert record.is_mutable
+
+
+def test_decode_many_passes_through_missing_accounts():
+    _, mint, account = _metadata_account("A", "B", "C", 0, [], None, None)
+    records = decode_many([account, None])
+    assert records[0].mint == base58.b58encode(mint)
+    assert records[1] is None
+
+
+class _MultipleAccountsClient():
+
+    def __init__(self, accounts):
+        self.accounts = accounts
+        self.calls = []
+
+    def get_multiple_accounts(self, pubkeys):
+        self.calls.append(len(pubkeys))
+        value = []
+        for pubkey in pubkeys:
+            data = self.accounts.get(str(pubkey))
+            value.append(None if data is None else {"data": [base64.b64encode(data).decode(), "base64"]})
+        return {"jsonrpc": "2.0", "result": {"context": {"slot": 1}, "value": value}, "id": 1}
+
+
+def test_get_metadata_many_chunks_and_reports_missing():
+    mints = [str(Keypair().public_key) for _ in range(250)]
+    accounts = {}
+    for n, mint in enumerate(mints):
+        if n % 3:
+            _, _, account = _metadata_account(f"NFT #{n}", "S", "C", 0, [], None, None)
+            accounts[str(get_metadata_account(mint))] = account
+    client = _MultipleAccountsClient(accounts)
+    results = dict(get_metadata_many(client, mints, max_workers=2))
+    assert sorted(client.calls) == [50, 100, 100]
+    assert len(results) == len(mints)
+    for n, mint in enumerate(mints):
+        if n % 3:
+            assert results[mint]["data"]["name"] == f"NFT #{n}"
+        else:
+            assert results[mint] is None
+
+
+def test_instruction_data_layout():
+    creator = Keypair().public_key
+    data = b"\x04\x00\x00\x00name" + b"\x03\x00\x00\x00SYM" + b"\x03\x00\x00\x00uri" + b"\xf4\x01"
+    creators = b"\x01\x01\x00\x00\x00" + bytes(creator) + b"\x00\x2a"
+    assert create_metadata_instruction_data("name", "SYM", 500, [str(creator)], uri="uri") == b"\x00" + data + b"\x01\x01\x00\x00\x00" + bytes(creator) + b"\x01\x64" + b"\x01"
+    assert update_metadata_instruction_data("name", "SYM", "uri", 500, [str(creator)], [0], [42]) == b"\x01\x01" + data + creators + b"\x00\x00"
+    assert update_metadata_instruction_data("name", "SYM", "uri", 500, [], None, None) == b"\x01\x01" + data + b"\x00" + b"\x00\x00"
+
+
+def test_creators_must_be_32_bytes():
+    short = base58.b58encode(bytes(31)).decode("ascii")
+    with pytest.raises(ValueError):
+        create_metadata_instruction_data("name", "SYM", 500, [short])
+    with pytest.raises(ValueError):
+        update_metadata_instruction_data("name", "SYM", "uri", 500, [str(Keypair().public_key) + "1"], [0], [100])
@@ -0,0 +1,73 @@
+import pytest
+from solana.keypair import Keypair
+from api.metaplex_api import MetaplexAPI
+from testing.fake_validator import FakeValidator
+from testing.helpers import api_config
+from utils.metrics import Metrics, metrics, FAILURES, RETRIES, RPC_SECONDS, STAGE_SECONDS
+from utils.execution_engine import execute
+
+
+def test_counters_and_histograms():
+    registry = Metrics(buckets=(0.1, 1))
+    registry.count(RETRIES, operation="mint", endpoint="http://a")
+    registry.count(RETRIES, operation="mint", endpoint="http://a")
+    registry.observe(STAGE_SECONDS, 0.05, stage="sign", operation="mint", endpoint="http://a")
+    registry.observe(STAGE_SECONDS, 0.5, stage="sign", operation="mint", endpoint="http://a")
+    registry.observe(STAGE_SECONDS, 5, stage="sign", operation="mint", endpoint="http://a")
+    text = registry.render_prometheus()
+    assert '# TYPE metaplex_retries_total counter' in text
+    assert 'metaplex_retries_total{endpoint="http://a",operation="mint"} 2' in text
+    labels = 'endpoint="http://a",operation="mint",stage="sign"'
+    assert f'metaplex_stage_seconds_bucket{{{labels},le="0.1"}} 1' in text
+    assert f'metaplex_stage_seconds_bucket{{{labels},le="1"}} 2' in text
+    assert f'metaplex_stage_seconds_bucket{{{labels},le="+Inf"}} 3' in text
+    assert f'metaplex_stage_seconds_count{{{labels}}} 3' in text
+    assert f'metaplex_stage_seconds_sum{{{labels}}} 5.55' in text
+
+
+def test_hooks_and_disable():
+    registry = Metrics()
+    seen = []
+    registry.add_hook(lambda kind, name, value, labels: seen.append((kind, name, labels["stage"])))
+    with registry.stage("build", "deploy", "http://a"):
+        pass
+    assert seen == [("timer", STAGE_SECONDS, "build")]
+    registry.enabled = False
+    registry.count(FAILURES)
+    assert registry.snapshot()["counters"] == {}
+
+
+def test_label_escaping():
+    registry = Metrics()
+    registry.count(FAILURES, operation='a"b\\c')
+    assert 'operation="a\\"b\\\\c"' in registry.render_prometheus()
+
+
+def test_execute_records_stages():
+    keypair = Keypair()
+    cfg = api_config(keypair)
+    metrics.reset()
+    with FakeValidator(confirmation_delay=0.05, finalization_delay=0.1) as validator:
+        api_endpoint = validator.endpoint
+        api = MetaplexAPI(cfg)
+        try:
+            assert '"status": 200' in api.topup(api_endpoint, str(Keypair().public_key), amount=1000)
+        finally:
+            api.clients.close()
+    timers = metrics.snapshot()["timers"]
+    for stage in ("build", "blockhash", "sign", "send", "confirm"):
+        key = (STAGE_SECONDS, (("endpoint", api_endpoint), ("operation", "topup"), ("stage", stage)))
+        assert timers[key]["count"] == 1
+    assert timers[(RPC_SECONDS, (("endpoint", api_endpoint), ("method", "sendTransaction")))]["count"] == 1
+
+
+def test_execute_counts_failures():
+    metrics.reset()
+    with FakeValidator(error_rate=1) as validator:
+        api_endpoint = validator.endpoint
+        with pytest.raises(Exception):
+            execute(api_endpoint, None, [], max_retries=2, operation="mint")
+    counters = metrics.snapshot()["counters"]
+    labels = (("endpoint", api_endpoint), ("operation", "mint"))
+    assert counters[(RETRIES, labels)] == 2
+    assert counters[(FAILURES, labels)] == 1
@@ -0,0 +1,59 @@
+import pytest
+from solana.blockhash import Blockhash
+from solana.keypair import Keypair
+from solana.publickey import PublicKey
+from solana.transaction import PACKET_DATA_SIZE
+from metaplex.packer import pack, TransactionPacker, PUBLIC_KEY_LENGTH
+from metaplex.transactions import _topup, _send, _deploy
+
+BLOCKHASH = Blockhash(str(PublicKey(3)))
+
+
+def _wire_size(tx, signers):
+    tx.recent_blockhash = BLOCKHASH
+    tx.sign(*signers)
+    return len(tx.serialize())
+
+
+def test_topups_fill_transactions_to_the_packet_limit():
+    payer = Keypair()
+    groups = [(_topup(payer, str(Keypair().public_key), 1000), [payer]) for _ in range(100)]
+    packed = list(pack(groups, payer))
+    assert [len(tx.instructions) for tx, _ in packed] == [21, 21, 21, 21, 16]
+    for tx, signers in packed:
+        assert signers == [payer]
+        assert tx.fee_payer == payer.public_key
+        assert _wire_size(tx, signers) <= PACKET_DATA_SIZE
+    # One more transfer would have pushed the first transaction over the limit
+    assert _wire_size(packed[0][0], [payer]) + PUBLIC_KEY_LENGTH + 17 > PACKET_DATA_SIZE
+
+
+def test_signers_are_collected_per_transaction():
+    payer = Keypair()
+    owners = [Keypair() for _ in range(10)]
+    groups = [(_send(payer, Keypair().public_key, owner.public_key, Keypair().public_key, 1), [payer, owner]) for owner in owners]
+    packed = list(pack(groups, payer))
+    assert sum(len(tx.instructions) for tx, _ in packed) == 10
+    assert [signer for _, signers in packed for signer in signers[1:]] == owners
+    for tx, signers in packed:
+        assert signers[0] is payer
+        assert _wire_size(tx, signers) <= PACKET_DATA_SIZE
+
+
+def test_groups_are_not_split():
+    payer = Keypair()
+    mints = [Keypair() for _ in range(3)]
+    groups = [(_deploy(payer, mint, "name", "SYM", 500, 1461600), [payer, mint]) for mint in mints]
+    packed = list(pack(groups, payer))
+    assert all(len(tx.instructions) % 3 == 0 for tx, _ in packed)
+    assert sum(len(tx.instructions) for tx, _ in packed) == 9
+
+
+def test_account_limit_and_oversized_groups():
+    payer = Keypair()
+    groups = [(_topup(payer, str(Keypair().public_key), 1), [payer]) for _ in range(10)]
+    assert [len(tx.instructions) for tx, _ in pack(groups, payer, max_accounts=6)] == [4, 4, 2]
+    packer = TransactionPacker(payer, max_size=100)
+    with pytest.raises(ValueError):
+        packer.add(*groups[0])
+    assert packer.flush() is None
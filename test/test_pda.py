@@ -0,0 +1,61 @@
+from solana.keypair import Keypair
+from solana.publickey import PublicKey
+from spl.token.instructions import get_associated_token_address as spl_get_associated_token_address
+import metaplex.metadata
+import metaplex.pda
+from metaplex.metadata import derive_many, get_edition, get_metadata_account, METADATA_PROGRAM_ID
+from metaplex.pda import DerivationCache, derivation_cache, get_associated_token_address
+
+
+def test_cached_addresses_match_uncached():
+    mint = Keypair().public_key
+    owner = Keypair().public_key
+    expected_metadata = PublicKey.find_program_address(
+        [b'metadata', bytes(METADATA_PROGRAM_ID), bytes(mint)], METADATA_PROGRAM_ID
+    )[0]
+    expected_edition = PublicKey.find_program_address(
+        [b'metadata', bytes(METADATA_PROGRAM_ID), bytes(mint), b"edition"], METADATA_PROGRAM_ID
+    )[0]
+    for _ in range(2):
+        assert get_metadata_account(mint) == expected_metadata
+        assert get_metadata_account(str(mint)) == expected_metadata
+        assert get_edition(mint) == expected_edition
+        assert get_associated_token_address(owner, mint) == spl_get_associated_token_address(owner, mint)
+
+
+def test_cache_is_bounded_and_counts_hits():
+    cache = DerivationCache(maxsize=2)
+    seeds = [[b'metadata', bytes(Keypair().public_key)] for _ in range(3)]
+    for seed in seeds:
+        cache.find_program_address(seed, METADATA_PROGRAM_ID)
+    assert len(cache) == 2
+    address, bump = cache.find_program_address(seeds[-1], METADATA_PROGRAM_ID)
+    assert (address, bump) == PublicKey.find_program_address(seeds[-1], METADATA_PROGRAM_ID)
+    assert cache.hits == 1
+    assert cache.misses == 3
+
+
+def test_derive_many_process_pool_matches_inline():
+    mints = [Keypair().public_key for _ in range(8)]
+    owner = Keypair().public_key
+    pooled = derive_many(mints, owner=owner, processes=2, chunksize=3)
+    derivation_cache.clear()
+    inline = derive_many(mints, owner=owner, processes=1)
+    assert pooled == inline
+    for mint, row in zip(mints, inline):
+        assert row["mint"] == mint
+        assert row["metadata"] == get_metadata_account(mint)
+        assert row["edition"] == get_edition(mint)
+        assert row["associated_token_account"] == spl_get_associated_token_address(owner, mint)
+
+
+def test_derive_many_outgrows_the_cache(monkeypatch):
+    cache = DerivationCache(maxsize=4)
+    monkeypatch.setattr(metaplex.metadata, "derivation_cache", cache)
+    monkeypatch.setattr(metaplex.pda, "derivation_cache", cache)
+    mints = [Keypair().public_key for _ in range(8)]
+    rows = derive_many(mints, processes=2, chunksize=3)
+    assert (cache.hits, cache.misses) == (0, 0)
+    assert len(cache) == 4
+    assert [row["metadata"] for row in rows] == [get_metadata_account(mint) for mint in mints]
+    assert [row["edition"] for row in rows] == [get_edition(mint) for mint in mints]
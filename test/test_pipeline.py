@@ -0,0 +1,178 @@
+import hashlib
+import json
+from solana.keypair import Keypair
+from solana.rpc.core import RPCException
+import api.pipeline
+from api.metaplex_api import MetaplexAPI
+from api.pipeline import Checkpoint, CollectionPipeline, read_manifest
+from testing.fake_validator import NODE_BEHIND
+from testing.helpers import api_config
+from utils.submission import ConfirmationTimeout
+
+
+def _write_manifest(tmp_path, n):
+    path = tmp_path / "manifest.jsonl"
+    with open(path, "w") as f:
+        for i in range(n):
+            f.write(json.dumps({"name": f"NFT {i}", "symbol": "NFT", "fee": 500, "uri": f"https://example.com/{i}.json", "recipient": f"wallet{i}"}) + "\n")
+    return str(path)
+
+
+def _contract(name):
+    return Keypair.from_seed(hashlib.sha256(name.encode()).digest())
+
+
+class _Chain():
+    """
+    Stands in for the builders, `execute` and the chain, failing the mint of every item listed in `broken`, and
+    the first mint of every item in `flaky` with a transient error. Transactions of the items in `timeouts` and
+    `late` do not confirm in time, and only the latter land.
+    """
+
+    def __init__(self, broken=(), flaky=(), timeouts=(), late=(), supplies=None):
+        self.broken = set(broken)
+        self.flaky = set(flaky)
+        self.timeouts = set(timeouts)
+        self.late = set(late)
+        # Mint supplies on-chain, kept across runs
+        self.supplies = {} if supplies is None else supplies
+        self.deploys = []
+        self.mints = []
+        # Contracts deployed again with the keypair of an earlier attempt
+        self.redeploys = []
+
+    def deploy(self, api_endpoint, source_account, name, symbol, fees, client=None, mint_account=None):
+        if mint_account is not None:
+            self.redeploys.append(str(mint_account.public_key))
+        mint_account = mint_account or _contract(name)
+        self.deploys.append(name)
+        contract = str(mint_account.public_key)
+        return ("deploy", name, contract), [source_account, mint_account], contract
+
+    def mint(self, api_endpoint, source_account, contract_key, dest_key, link, supply=1, client=None):
+        if dest_key in self.broken:
+            raise Exception("Node is behind")
+        if dest_key in self.flaky:
+            self.flaky.discard(dest_key)
+            raise RPCException(NODE_BEHIND)
+        self.mints.append(contract_key)
+        return ("mint", dest_key, contract_key), [source_account]
+
+    def create_and_mint(self, api_endpoint, source_account, name, symbol, fees, dest_key, link, supply=1, client=None, mint_account=None):
+        mint_account = mint_account or _contract(name)
+        contract = str(mint_account.public_key)
+        self.deploys.append(name)
+        self.mints.append(contract)
+        return ("create_and_mint", dest_key, contract), [source_account, mint_account], contract
+
+    def execute(self, api_endpoint, tx, signers, **kwargs):
+        operation, label, contract = tx
+        if label not in self.timeouts:
+            self.supplies[contract] = 0 if operation == "deploy" else 1
+        if label in self.timeouts or label in self.late:
+            raise ConfirmationTimeout(f"{operation}:{label}", None)
+        return {"result": f"{operation}:{label}"}
+
+    def mint_supply(self, client, contract):
+        return self.supplies.get(contract)
+
+    def patch(self, monkeypatch):
+        for name in ("deploy", "mint", "create_and_mint", "execute", "mint_supply"):
+            monkeypatch.setattr(api.pipeline, name, getattr(self, name))
+        monkeypatch.setattr(api.pipeline, "backoff", lambda attempt: 0)
+
+
+def _run(tmp_path, manifest, chain, one_shot=False):
+    metaplex_api = MetaplexAPI(api_config())
+    checkpoint = Checkpoint(str(tmp_path / "manifest.checkpoint"))
+    try:
+        pipeline = CollectionPipeline(metaplex_api, "http://localhost:8899", checkpoint, max_workers=2, one_shot=one_shot)
+        return pipeline.run(read_manifest(manifest))
+    finally:
+        checkpoint.close()
+        metaplex_api.clients.close()
+
+
+def test_restart_skips_finished_items(tmp_path, monkeypatch):
+    manifest = _write_manifest(tmp_path, 10)
+    chain = _Chain(broken={"wallet3", "wallet7"})
+    chain.patch(monkeypatch)
+    counters = _run(tmp_path, manifest, chain)
+    assert counters == {"deployed": 10, "minted": 8, "skipped": 0, "failed": 2}
+
+    chain = _Chain(supplies=chain.supplies)
+    chain.patch(monkeypatch)
+    counters = _run(tmp_path, manifest, chain)
+    assert counters == {"deployed": 0, "minted": 2, "skipped": 8, "failed": 0}
+    # The two items that failed to mint reuse the contracts they already deployed
+    assert sorted(chain.mints) == sorted(str(_contract(f"NFT {i}").public_key) for i in (3, 7))
+
+    checkpoint = Checkpoint(str(tmp_path / "manifest.checkpoint"))
+    checkpoint.close()
+    assert all(item["stage"] == "minted" for item in checkpoint.items.values())
+    assert checkpoint.get("3")["mint_signature"] == "mint:wallet3"
+    assert checkpoint.get("3")["deploy_signature"] == "deploy:NFT 3"
+
+
+def test_transient_build_errors_are_retried(tmp_path, monkeypatch):
+    manifest = _write_manifest(tmp_path, 3)
+    chain = _Chain(flaky={"wallet0", "wallet2"})
+    chain.patch(monkeypatch)
+    assert _run(tmp_path, manifest, chain) == {"deployed": 3, "minted": 3, "skipped": 0, "failed": 0}
+    assert len(chain.mints) == 3
+
+
+def test_one_shot_only_finishes_deployed_items(tmp_path, monkeypatch):
+    manifest = _write_manifest(tmp_path, 4)
+    chain = _Chain(broken={"wallet1"})
+    chain.patch(monkeypatch)
+    _run(tmp_path, manifest, chain)
+    chain = _Chain(supplies=chain.supplies)
+    chain.patch(monkeypatch)
+    counters = _run(tmp_path, manifest, chain, one_shot=True)
+    assert counters == {"deployed": 0, "minted": 1, "skipped": 3, "failed": 0}
+    assert chain.deploys == []
+
+    manifest = _write_manifest(tmp_path, 6)
+    counters = _run(tmp_path, manifest, chain, one_shot=True)
+    assert counters == {"deployed": 0, "minted": 2, "skipped": 4, "failed": 0}
+    assert sorted(chain.deploys) == ["NFT 4", "NFT 5"]
+
+
+def test_unconfirmed_deploys_are_not_repeated(tmp_path, monkeypatch):
+    manifest = _write_manifest(tmp_path, 3)
+    # NFT 1 lands after its confirmation timed out, NFT 2 never lands
+    chain = _Chain(late={"NFT 1"}, timeouts={"NFT 2"})
+    chain.patch(monkeypatch)
+    assert _run(tmp_path, manifest, chain) == {"deployed": 1, "minted": 1, "skipped": 0, "failed": 2}
+    checkpoint = Checkpoint(str(tmp_path / "manifest.checkpoint"))
+    checkpoint.close()
+    assert checkpoint.get("1")["stage"] == checkpoint.get("2")["stage"] == "deploying"
+
+    chain = _Chain(supplies=chain.supplies)
+    chain.patch(monkeypatch)
+    # Items keep the kind of deploy they started with
+    assert _run(tmp_path, manifest, chain, one_shot=True) == {"deployed": 1, "minted": 2, "skipped": 1, "failed": 0}
+    # NFT 1 is only minted, NFT 2 is deployed again with the keypair of its first attempt
+    assert chain.deploys == ["NFT 2"]
+    assert chain.redeploys == [checkpoint.get("2")["contract"]]
+    assert sorted(chain.mints) == sorted(str(_contract(f"NFT {i}").public_key) for i in (1, 2))
+
+
+def test_unconfirmed_mints_are_checked_on_chain(tmp_path, monkeypatch):
+    manifest = _write_manifest(tmp_path, 2)
+    chain = _Chain(timeouts={"wallet0", "wallet1"})
+    chain.patch(monkeypatch)
+    assert _run(tmp_path, manifest, chain) == {"deployed": 2, "minted": 0, "skipped": 0, "failed": 2}
+    # The mint of NFT 0 landed late
+    chain.supplies[str(_contract("NFT 0").public_key)] = 1
+    chain = _Chain(supplies=chain.supplies)
+    chain.patch(monkeypatch)
+    assert _run(tmp_path, manifest, chain) == {"deployed": 0, "minted": 1, "skipped": 1, "failed": 0}
+    assert chain.mints == [str(_contract("NFT 1").public_key)]
+
+
+def test_csv_manifest(tmp_path):
+    path = tmp_path / "manifest.csv"
+    path.write_text("name,symbol,fee,uri,recipient\nNFT 0,NFT,500,https://example.com/0.json,wallet0\n")
+    assert list(read_manifest(str(path))) == [("0", {"name": "NFT 0", "symbol": "NFT", "fee": "500", "uri": "https://example.com/0.json", "recipient": "wallet0"})]
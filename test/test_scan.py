@@ -0,0 +1,34 @@
+import json
+from solana.keypair import Keypair
+from api.metaplex_api import MetaplexAPI
+from metaplex.metadata import MAX_METADATA_LEN, get_metadata_account, scan_metadata
+from testing.fake_validator import FakeValidator
+from testing.helpers import api_config
+
+
+def test_scan_metadata():
+    alice, bob = Keypair(), Keypair()
+    with FakeValidator(confirmation_delay=0, finalization_delay=0) as validator:
+        api_endpoint = validator.endpoint
+        alice_api, bob_api = MetaplexAPI(api_config(alice)), MetaplexAPI(api_config(bob))
+        client = alice_api.clients.get(api_endpoint)
+        try:
+            alice_contracts = {json.loads(alice_api.deploy(api_endpoint, f"A{i}", "A", 0))["contract"] for i in range(3)}
+            bob_contract = json.loads(bob_api.deploy(api_endpoint, "B", "B", 0))["contract"]
+            # Master editions belong to the same program and must be filtered out
+            assert json.loads(alice_api.mint(api_endpoint, sorted(alice_contracts)[0], str(bob.public_key), "https://arweave.net/x"))["status"] == 200
+
+            found = list(scan_metadata(client, creator=alice.public_key))
+            assert {record.mint.decode() for _, record in found} == alice_contracts
+            assert all(address == str(get_metadata_account(record.mint.decode())) for address, record in found)
+            assert {r.mint.decode() for _, r in scan_metadata(client, update_authority=bob.public_key)} == {bob_contract}
+            assert [r.name for _, r in scan_metadata(client, mint=bob_contract)] == ["B"]
+            assert len(list(scan_metadata(client, data_size=MAX_METADATA_LEN))) == 4
+
+            calls = validator.requests["getProgramAccounts"]
+            sharded = list(scan_metadata(client, creator=alice.public_key, shard_bytes=1))
+            assert {r.mint.decode() for _, r in sharded} == alice_contracts
+            assert validator.requests["getProgramAccounts"] == calls + 256
+        finally:
+            alice_api.clients.close()
+            bob_api.clients.close()
@@ -0,0 +1,76 @@
+from solana.blockhash import Blockhash
+from solana.keypair import Keypair
+from solana.publickey import PublicKey
+from metaplex.transactions import _topup, _send
+from utils.signing import CachedKeypair, KeypairCache, keypair_cache, sign_many, unique_signers
+
+BLOCKHASH = Blockhash(str(PublicKey(3)))
+
+
+def test_cached_keypair_matches_keypair():
+    keypair = Keypair()
+    cached = CachedKeypair.from_seed(keypair.seed)
+    assert cached.public_key == keypair.public_key
+    assert cached.sign(b"message").signature == keypair.sign(b"message").signature
+    assert cached == keypair
+
+
+def test_cache_is_bounded_and_evictable():
+    cache = KeypairCache(maxsize=2)
+    seeds = [Keypair().seed for _ in range(3)]
+    first = cache.get(seeds[0])
+    assert cache.get(list(seeds[0])) is first
+    assert (cache.hits, cache.misses) == (1, 1)
+    cache.get(seeds[1])
+    cache.get(seeds[2])
+    assert len(cache) == 2
+    assert cache.get(seeds[0]) is not first
+    cache.evict(seeds[0])
+    assert len(cache) == 1
+
+
+def test_unique_signers_keeps_order():
+    payer, owner = Keypair(), Keypair()
+    signers = unique_signers([payer, owner, Keypair.from_seed(payer.seed)])
+    assert [signer.public_key for signer in signers] == [payer.public_key, owner.public_key]
+
+
+def test_user_keypairs_are_not_cached():
+    service = keypair_cache.get(Keypair().seed)
+    cached = len(keypair_cache)
+    signers = unique_signers([service, list(Keypair().seed), Keypair()])
+    assert signers[0] is service
+    assert all(isinstance(signer, CachedKeypair) for signer in signers)
+    assert len(keypair_cache) == cached
+
+
+def _batch(payer, n):
+    batch = []
+    for i in range(n):
+        if i % 2:
+            owner = Keypair()
+            batch.append((_send(payer, Keypair().public_key, owner.public_key, Keypair().public_key, 1), [payer, owner, payer]))
+        else:
+            batch.append((_topup(payer, str(Keypair().public_key), 1000), [payer]))
+    return batch
+
+
+def _expected(batch):
+    expected = []
+    for tx, signers in batch:
+        tx.recent_blockhash = BLOCKHASH
+        tx.sign(*unique_signers(signers))
+        expected.append(tx.serialize())
+    return expected
+
+
+def test_sign_many_with_threads():
+    batch = _batch(Keypair(), 20)
+    expected = _expected(batch)
+    assert [tx.serialize() for tx in sign_many(batch, BLOCKHASH, max_workers=4)] == expected
+
+
+def test_sign_many_with_processes():
+    batch = _batch(Keypair(), 6)
+    expected = _expected(batch)
+    assert [tx.serialize() for tx in sign_many(batch, BLOCKHASH, max_workers=2, processes=True, chunksize=2)] == expected
@@ -0,0 +1,226 @@
+import time
+import pytest
+import requests
+from solana.keypair import Keypair
+from solana.publickey import PublicKey
+from solana.rpc.api import Client
+from solana.rpc.core import RPCException
+import utils.execution_engine
+import utils.submission
+from metaplex.transactions import _send, _topup
+from testing.fake_validator import NODE_BEHIND, FakeValidator
+from utils.blockhash_provider import BlockhashProvider
+from utils.execution_engine import execute
+from utils.metrics import metrics, EXPIRATIONS, FAILURES, REBROADCASTS, RETRIES
+from utils.submission import (
+    EXPIRED,
+    PERMANENT,
+    TRANSIENT,
+    BlockhashExpired,
+    ConfirmationTimeout,
+    Rebroadcaster,
+    TransactionFailed,
+    backoff,
+    classify_error,
+    next_step,
+    unproven_expiry,
+)
+
+
+def _http_error(status):
+    response = requests.Response()
+    response.status_code = status
+    return requests.HTTPError(response=response)
+
+
+def test_classify_error():
+    assert classify_error(RPCException({"code": -32005, "message": "Node is behind by 42 slots"})) == TRANSIENT
+    assert classify_error(RPCException({"code": -32003, "message": "Transaction signature verification failure"})) == PERMANENT
+    assert classify_error(RPCException({"code": -32002, "message": "Transaction simulation failed: Blockhash not found"})) == EXPIRED
+    assert classify_error(BlockhashExpired("x")) == EXPIRED
+    assert classify_error(_http_error(429)) == TRANSIENT
+    assert classify_error(_http_error(503)) == TRANSIENT
+    assert classify_error(_http_error(403)) == PERMANENT
+    assert classify_error(requests.ConnectionError()) == TRANSIENT
+
+
+def test_backoff_is_jittered_and_capped():
+    delays = [backoff(attempt, base=0.1, cap=1) for attempt in range(10) for _ in range(20)]
+    assert all(0.05 <= delay <= 1 for delay in delays)
+    assert len(set(delays)) > 100
+    assert max(backoff(10, base=0.1, cap=1) for _ in range(20)) > 0.5
+
+
+def test_next_step():
+    behind = RPCException({"code": -32005, "message": "Node is behind by 42 slots"})
+    not_found = RPCException({"code": -32002, "message": "Transaction simulation failed: Blockhash not found"})
+    kind, delay = next_step(behind, 0, 3)
+    assert kind == TRANSIENT and delay > 0
+    assert next_step(behind, 2, 3) == (TRANSIENT, 0)
+    assert next_step(_http_error(403), 0, 3) == (PERMANENT, 0)
+    assert next_step(BlockhashExpired("x"), 0, 3) == (EXPIRED, 0)
+    assert unproven_expiry(not_found) and not unproven_expiry(BlockhashExpired("x"))
+    assert next_step(not_found, 0, 3, expiry_proven=True) == (EXPIRED, 0)
+    assert next_step(not_found, 0, 3, expiry_proven=False)[0] == TRANSIENT
+
+
+def _counter(name, api_endpoint, operation="topup"):
+    return metrics.snapshot()["counters"].get((name, (("endpoint", api_endpoint), ("operation", operation))), 0)
+
+
+def test_dropped_transactions_are_rebroadcast():
+    source = Keypair()
+    with FakeValidator(drop_rate=0.7, seed=3, confirmation_delay=0, finalization_delay=0) as validator:
+        api_endpoint = validator.endpoint
+        tx = _topup(source, str(Keypair().public_key), 1000)
+        execute(api_endpoint, tx, [source], skip_confirmation=False, max_timeout=10, rebroadcast_interval=0.02, operation="topup")
+        assert len(validator.signatures) == 1
+        assert validator.requests["getRecentBlockhash"] == 1
+        assert validator.requests["sendTransaction"] > 1
+    assert _counter(REBROADCASTS, api_endpoint) == validator.requests["sendTransaction"] - 1
+
+
+def test_identical_transactions_get_distinct_blockhashes():
+    source, to = Keypair(), str(Keypair().public_key)
+    with FakeValidator(confirmation_delay=0, finalization_delay=0) as validator:
+        client = Client(validator.endpoint)
+        blockhashes = BlockhashProvider(client, refresh_interval=60)
+        try:
+            for _ in range(2):
+                # Same payer, recipient and amount: only the blockhash can tell them apart
+                execute(validator.endpoint, _topup(source, to, 1000), [source], skip_confirmation=False, client=client, blockhashes=blockhashes, rebroadcast_interval=0.02)
+        finally:
+            blockhashes.close()
+        assert len(validator.signatures) == 2
+        assert validator.requests["getRecentBlockhash"] == 2
+
+
+class _LaggingValidator(FakeValidator):
+    """ Applies every transaction, but answers the first send with a transient error and the second with "Blockhash not found". """
+
+    def handle(self, request):
+        status, resp = super().handle(request)
+        if request.get("method") == "sendTransaction" and self.requests["sendTransaction"] <= 2:
+            if self.requests["sendTransaction"] == 1:
+                resp = {"jsonrpc": "2.0", "error": NODE_BEHIND, "id": request.get("id")}
+            else:
+                resp = {"jsonrpc": "2.0", "error": {"code": -32002, "message": "Transaction simulation failed: Blockhash not found"}, "id": request.get("id")}
+        return status, resp
+
+
+def test_landed_transactions_are_not_signed_again(monkeypatch):
+    monkeypatch.setattr(utils.submission, "backoff", lambda attempt: 0)
+    source = Keypair()
+    with _LaggingValidator(confirmation_delay=0, finalization_delay=0) as validator:
+        tx = _topup(source, str(Keypair().public_key), 1000)
+        execute(validator.endpoint, tx, [source], skip_confirmation=False, rebroadcast_interval=0.02, operation="topup")
+        # The first send landed, so "Blockhash not found" must not lead to a second, differently signed copy
+        assert len(validator.signatures) == 1
+        assert validator.requests["getRecentBlockhash"] == 1
+        assert validator.requests["sendTransaction"] == 3
+
+
+def test_resigns_only_after_blockhash_expires(monkeypatch):
+    source = Keypair()
+    # The estimate runs out long before the validator expires the blockhash
+    monkeypatch.setattr(utils.execution_engine, "BLOCKHASH_VALIDITY", 0.05)
+    with FakeValidator(drop_rate=1, blockhash_validity=0.3) as validator:
+        api_endpoint = validator.endpoint
+        tx = _topup(source, str(Keypair().public_key), 1000)
+        started = time.monotonic()
+        with pytest.raises(BlockhashExpired):
+            execute(api_endpoint, tx, [source], max_retries=2, skip_confirmation=False, rebroadcast_interval=0.02, operation="topup")
+        assert time.monotonic() - started >= 0.6
+        assert validator.requests["getRecentBlockhash"] == 2
+        assert validator.requests["getFeeCalculatorForBlockhash"] > 2
+        assert not validator.signatures
+    assert _counter(EXPIRATIONS, api_endpoint) == 2
+    assert _counter(FAILURES, api_endpoint) == 1
+
+
+def test_confirmation_timeouts_are_not_retried():
+    source = Keypair()
+    with FakeValidator(drop_rate=1) as validator:
+        tx = _topup(source, str(Keypair().public_key), 1000)
+        assert execute(validator.endpoint, tx, [source], skip_confirmation=False, max_timeout=0.05, rebroadcast_interval=0.02)["result"]
+        with pytest.raises(ConfirmationTimeout):
+            execute(validator.endpoint, tx, [source], skip_confirmation=False, max_timeout=0.05, rebroadcast_interval=0.02, raise_on_timeout=True)
+        assert validator.requests["getRecentBlockhash"] == 2
+
+
+def test_failed_instructions_are_not_retried():
+    source, owner = Keypair(), Keypair()
+    with FakeValidator(confirmation_delay=0, finalization_delay=0) as validator:
+        api_endpoint = validator.endpoint
+        # Neither the mint nor the owner's token account exist
+        tx = _send(source, Keypair().public_key, owner.public_key, Keypair().public_key, 1)
+        with pytest.raises(TransactionFailed) as failure:
+            execute(api_endpoint, tx, [source, owner], skip_confirmation=False, rebroadcast_interval=0.02, operation="send")
+        assert failure.value.err == {"InstructionError": [0, "InvalidAccountData"]}
+        assert classify_error(failure.value) == PERMANENT
+        assert validator.requests["getRecentBlockhash"] == 1
+    assert _counter(FAILURES, api_endpoint, operation="send") == 1
+    assert _counter(RETRIES, api_endpoint, operation="send") == 0
+
+
+class _RejectingClient():
+    """ Accepts blockhash requests and rejects every transaction. """
+
+    def __init__(self):
+        self.sends = 0
+
+    def get_recent_blockhash(self, commitment=None):
+        return {"result": {"context": {"slot": 1}, "value": {"blockhash": str(PublicKey(3))}}}
+
+    def send_raw_transaction(self, raw, opts=None):
+        self.sends += 1
+        raise RPCException({"code": -32003, "message": "Transaction signature verification failure"})
+
+
+class _FlakyClient(_RejectingClient):
+    """ Times out on the first send, then accepts. """
+
+    def __init__(self):
+        super().__init__()
+        self.sent = []
+
+    def send_raw_transaction(self, raw, opts=None):
+        self.sends += 1
+        self.sent.append(raw)
+        if self.sends == 1:
+            raise requests.Timeout()
+        return {"result": "ok"}
+
+
+def test_transient_errors_resend_the_same_transaction(monkeypatch):
+    monkeypatch.setattr(utils.submission, "backoff", lambda attempt: 0)
+    source, client = Keypair(), _FlakyClient()
+    execute("http://flaky", _topup(source, str(Keypair().public_key), 1000), [source], client=client, operation="topup")
+    utils.execution_engine.rebroadcaster.clear()
+    assert client.sends == 2
+    assert client.sent[0] == client.sent[1]
+
+
+def test_permanent_errors_are_not_retried():
+    source, client = Keypair(), _RejectingClient()
+    with pytest.raises(RPCException):
+        execute("http://rejecting", _topup(source, str(Keypair().public_key), 1000), [source], max_retries=3, client=client, operation="topup")
+    assert client.sends == 1
+    assert _counter(RETRIES, "http://rejecting") == 0
+
+
+def test_background_rebroadcast(monkeypatch):
+    source = Keypair()
+    monkeypatch.setattr(utils.execution_engine, "rebroadcaster", Rebroadcaster(interval=0.02))
+    with FakeValidator(drop_rate=1) as validator:
+        tx = _topup(source, str(Keypair().public_key), 1000)
+        execute(validator.endpoint, tx, [source], client=Client(validator.endpoint))
+        assert not validator.signatures
+        validator.drop_rate = 0
+        for _ in range(100):
+            if validator.signatures:
+                break
+            time.sleep(0.02)
+        assert len(validator.signatures) == 1
+        time.sleep(0.1)
+        assert utils.execution_engine.rebroadcaster.pending() == 0
@@ -0,0 +1,35 @@
+import json
+from solana.keypair import Keypair
+import api.metaplex_api
+from api.metaplex_api import MetaplexAPI
+from metaplex.transactions import topup_many
+
+
+from testing.helpers import api_config
+def test_recipients_are_packed_in_order():
+    sender = Keypair()
+    recipients = [str(Keypair().public_key) for _ in range(50)]
+    batches = topup_many("http://localhost:8899", sender, recipients, amount=1000)
+    assert [len(batch) for _, _, batch in batches] == [21, 21, 8]
+    assert [to for _, _, batch in batches for to in batch] == recipients
+    for tx, signers, batch in batches:
+        assert signers == [sender]
+        assert [str(ix.keys[1].pubkey) for ix in tx.instructions] == batch
+
+
+def test_failed_batch_only_fails_its_recipients(monkeypatch):
+    def execute(api_endpoint, tx, signers, **kwargs):
+        if len(tx.instructions) < 21:
+            raise Exception("Blockhash not found")
+        return {"jsonrpc": "2.0", "result": f"sig{len(tx.instructions)}", "id": 1}
+    monkeypatch.setattr(api.metaplex_api, "execute", execute)
+    metaplex_api = MetaplexAPI(api_config())
+    try:
+        recipients = [str(Keypair().public_key) for _ in range(30)]
+        resp = json.loads(metaplex_api.topup_many("http://localhost:8899", recipients, amount=1000))
+    finally:
+        metaplex_api.clients.close()
+    assert resp["status"] == 200
+    assert [result["to"] for result in resp["results"]] == recipients
+    assert resp["results"][:21] == [{"status": 200, "result": "sig21", "to": to} for to in recipients[:21]]
+    assert resp["results"][21:] == [{"status": 400, "to": to} for to in recipients[21:]]
@@ -0,0 +1,54 @@
+import json
+from solana.blockhash import Blockhash
+from solana.keypair import Keypair
+from solana.publickey import PublicKey
+from solana.transaction import PACKET_DATA_SIZE
+from metaplex.metadata import create_metadata_instruction_data, METADATA_PROGRAM_ID
+from metaplex.pda import get_associated_token_address
+from api.metaplex_api import MetaplexAPI
+from metaplex.transactions import _create_and_mint, mint, send
+from testing.fake_validator import FakeValidator
+from testing.helpers import api_config
+
+LINK = "https://arweave.net/" + "x" * 43
+
+
+def test_create_metadata_defaults_to_placeholder_uri():
+    creators = [str(Keypair().public_key)]
+    assert create_metadata_instruction_data("name", "SYM", 500, creators) == create_metadata_instruction_data("name", "SYM", 500, creators, uri=" " * 64)
+
+
+def test_create_and_mint_is_one_transaction():
+    source, mint_account, user = Keypair(), Keypair(), Keypair().public_key
+    tx = _create_and_mint(source, mint_account, user, "name", "SYM", 500, LINK, 1, 1461600)
+    assert len(tx.instructions) == 6
+    create_metadata_ix = tx.instructions[2]
+    assert create_metadata_ix.program_id == METADATA_PROGRAM_ID
+    assert LINK.encode() in create_metadata_ix.data
+    assert tx.instructions[3].keys[1].pubkey == get_associated_token_address(user, mint_account.public_key)
+    tx.recent_blockhash = Blockhash(str(PublicKey(3)))
+    tx.sign(source, mint_account)
+    assert len(tx.serialize()) <= PACKET_DATA_SIZE
+
+
+def test_builders_read_accounts_in_one_round_trip():
+    source, holder = Keypair(), Keypair()
+    cfg = api_config(source)
+    with FakeValidator(confirmation_delay=0, finalization_delay=0) as validator:
+        api_endpoint = validator.endpoint
+        api = MetaplexAPI(cfg)
+        client = api.clients.get(api_endpoint)
+        try:
+            contract = json.loads(api.deploy(api_endpoint, "name", "SYM", 0))["contract"]
+            validator.requests.clear()
+            tx, _ = mint(api_endpoint, api.keypair, contract, str(holder.public_key), LINK, client=client)
+            assert validator.requests == {"getMultipleAccounts": 1}
+            # The holder's PDA does not exist yet, so it is created
+            assert len(tx.instructions) == 4
+            assert json.loads(api.mint(api_endpoint, contract, str(holder.public_key), LINK))["status"] == 200
+            validator.requests.clear()
+            tx, _ = send(api_endpoint, api.keypair, contract, str(holder.public_key), str(Keypair().public_key), list(holder.seed), client=client)
+            assert validator.requests == {"getMultipleAccounts": 1}
+            assert len(tx.instructions) == 2
+        finally:
+            api.clients.close()
@@ -0,0 +1,137 @@
+import asyncio
+import json
+import threading
+import time
+import websockets
+from utils.websocket_tracker import WebsocketConfirmationTracker, websocket_endpoint
+
+
+class _FakeSignatureServer():
+    """
+    Answers signatureSubscribe and notifies shortly after (unless `notify` is false), or drops the socket when
+    `drop` is set. Records signatureUnsubscribe requests.
+    """
+
+    def __init__(self, drop=False, notify=True):
+        self.drop = drop
+        self.notify = notify
+        self.subscriptions = []
+        self.unsubscriptions = []
+        self.loop = asyncio.new_event_loop()
+        started = threading.Event()
+        threading.Thread(target=self._serve, args=(started,), daemon=True).start()
+        started.wait()
+
+    def _serve(self, started):
+        asyncio.set_event_loop(self.loop)
+        self.server = self.loop.run_until_complete(websockets.serve(self._handler, "127.0.0.1", 0))
+        self.port = self.server.sockets[0].getsockname()[1]
+        started.set()
+        self.loop.run_forever()
+
+    async def _handler(self, ws, path):
+        async for raw in ws:
+            request = json.loads(raw)
+            if self.drop:
+                await ws.close()
+                return
+            if request["method"] == "signatureUnsubscribe":
+                self.unsubscriptions.extend(request["params"])
+                await ws.send(json.dumps({"jsonrpc": "2.0", "result": True, "id": request["id"]}))
+                continue
+            subscription = len(self.subscriptions) + 100
+            self.subscriptions.append(request["params"])
+            await ws.send(json.dumps({"jsonrpc": "2.0", "result": subscription, "id": request["id"]}))
+            if not self.notify:
+                continue
+            await asyncio.sleep(0.05)
+            await ws.send(json.dumps({
+                "jsonrpc": "2.0",
+                "method": "signatureNotification",
+                "params": {"result": {"context": {"slot": 5}, "value": {"err": None}}, "subscription": subscription},
+            }))
+
+    def close(self):
+        async def _close():
+            self.server.close()
+            await self.server.wait_closed()
+        asyncio.run_coroutine_threadsafe(_close(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+class _PollingFallback():
+
+    def __init__(self):
+        self.tracked = []
+
+    def track(self, signature, target=20, finalized=True):
+        from concurrent.futures import Future
+        self.tracked.append(signature)
+        future = Future()
+        future.set_result({"slot": 6, "confirmations": None, "err": None, "confirmationStatus": "finalized"})
+        return future
+
+    def close(self):
+        pass
+
+
+def test_websocket_endpoint():
+    assert websocket_endpoint("https://api.devnet.solana.com/") == "wss://api.devnet.solana.com/"
+    assert websocket_endpoint("http://127.0.0.1:8899") == "ws://127.0.0.1:8900"
+
+
+def test_signature_notifications_resolve_waiters():
+    server = _FakeSignatureServer()
+    tracker = WebsocketConfirmationTracker(f"ws://127.0.0.1:{server.port}", fallback=_PollingFallback())
+    try:
+        futures = [tracker.track(f"sig{n}", finalized=n % 2 == 0) for n in range(10)]
+        statuses = [future.result(timeout=5) for future in futures]
+        assert [status["confirmationStatus"] for status in statuses] == ["finalized", "confirmed"] * 5
+        assert sorted(params[0] for params in server.subscriptions) == sorted(f"sig{n}" for n in range(10))
+        assert tracker.notifications == 10
+        assert tracker.fallbacks == 0
+    finally:
+        tracker.close()
+        server.close()
+
+
+def test_timed_out_waiters_are_unsubscribed():
+    server = _FakeSignatureServer(notify=False)
+    tracker = WebsocketConfirmationTracker(f"ws://127.0.0.1:{server.port}", fallback=_PollingFallback())
+    try:
+        for _ in range(100):
+            if tracker.connected():
+                break
+            time.sleep(0.01)
+        kept = tracker.track("kept")
+        assert tracker.wait("sig", max_timeout=0.2) is None
+        for _ in range(100):
+            if server.unsubscriptions:
+                break
+            time.sleep(0.01)
+        assert server.unsubscriptions == [100 + [params[0] for params in server.subscriptions].index("sig")]
+        assert tracker.pending() == 1
+        kept.cancel()
+        for _ in range(100):
+            if tracker.pending() == 0 and len(server.unsubscriptions) == 2:
+                break
+            time.sleep(0.01)
+        assert tracker.pending() == 0
+        assert sorted(server.unsubscriptions) == [100, 101]
+        assert tracker.fallbacks == 0
+    finally:
+        tracker.close()
+        server.close()
+
+
+def test_dropped_socket_falls_back_to_polling():
+    server = _FakeSignatureServer(drop=True)
+    fallback = _PollingFallback()
+    tracker = WebsocketConfirmationTracker(f"ws://127.0.0.1:{server.port}", fallback=fallback, reconnect_interval=0.05)
+    try:
+        status = tracker.wait("sig", max_timeout=5)
+        assert status["slot"] == 6
+        assert fallback.tracked == ["sig"]
+    finally:
+        tracker.close()
+        server.close()
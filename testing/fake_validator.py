@@ -0,0 +1,393 @@
+import base64
+import itertools
+import json
+import random
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import base58
+from solana.publickey import PublicKey
+from solana.transaction import Transaction
+from spl.token._layouts import ACCOUNT_LAYOUT, MINT_LAYOUT
+from metaplex.decoder import decode_metadata
+from metaplex.metadata import (
+    ASSOCIATED_TOKEN_ACCOUNT_PROGRAM_ID,
+    MAX_METADATA_LEN,
+    MAX_NAME_LENGTH,
+    MAX_SYMBOL_LENGTH,
+    MAX_URI_LENGTH,
+    METADATA_PROGRAM_ID,
+    SYSTEM_PROGRAM_ID,
+    TOKEN_PROGRAM_ID,
+    InstructionType,
+)
+
+SLOT_TIME = 0.4
+# A blockhash is accepted for 150 slots
+BLOCKHASH_VALIDITY = 150 * SLOT_TIME
+# Solana charges 3480 lamports per byte-year and exempts two years, with 128 bytes of account overhead
+RENT_PER_BYTE = 3480 * 2
+ACCOUNT_STORAGE_OVERHEAD = 128
+NODE_BEHIND = {"code": -32005, "message": "Node is behind by 42 slots"}
+# spl-token's error code for moving more tokens than an account holds
+INSUFFICIENT_FUNDS = {"Custom": 1}
+# The system program's error code for creating an account that exists
+ACCOUNT_ALREADY_IN_USE = {"Custom": 0}
+METHOD_NOT_FOUND = {"code": -32601, "message": "Method not found"}
+
+# System and token program instruction indices the fake understands
+_CREATE_ACCOUNT = 0
+_INITIALIZE_MINT = 0
+_TRANSFER = 3
+_MINT_TO = 7
+_BURN = 8
+_CREATE_MASTER_EDITION = 10
+_U64 = struct.Struct("<Q")
+
+
+def _token_account(mint, owner, amount=0):
+    return ACCOUNT_LAYOUT.build(dict(
+        mint=bytes(mint),
+        owner=bytes(owner),
+        amount=amount,
+        delegate_option=0,
+        delegate=bytes(32),
+        state=1,
+        is_native_option=0,
+        is_native=0,
+        delegated_amount=0,
+        close_authority_option=0,
+        close_authority=bytes(32),
+    ))
+
+
+def _mint_account(mint_authority, freeze_authority, decimals, supply=0):
+    return MINT_LAYOUT.build(dict(
+        mint_authority_option=1,
+        mint_authority=bytes(mint_authority),
+        supply=supply,
+        decimals=decimals,
+        is_initialized=1,
+        freeze_authority_option=1,
+        freeze_authority=bytes(freeze_authority),
+    ))
+
+
+def _metadata_account(update_authority, mint, data, primary_sale_happened, is_mutable):
+    """ Metadata account as the program writes it: strings padded to their maximum length, account padded to MAX_METADATA_LEN. """
+    fields = []
+    i = 0
+    for max_length in (MAX_NAME_LENGTH, MAX_SYMBOL_LENGTH, MAX_URI_LENGTH):
+        length, = struct.unpack_from("<I", data, i)
+        fields.append(struct.pack("<I", max_length) + data[i+4:i+4+length].ljust(max_length, b"\0"))
+        i += 4 + length
+    account = bytes([4]) + update_authority + mint + b"".join(fields) + data[i:] + bytes([primary_sale_happened, is_mutable])
+    return account.ljust(MAX_METADATA_LEN, b"\0")
+
+
+class InstructionError(Exception):
+    """ An instruction the fake refuses to apply, with the error the runtime would report for it. """
+
+    def __init__(self, error):
+        super().__init__(error)
+        self.error = error
+
+
+class FakeValidator():
+    """
+    In-process stand-in for a Solana JSON-RPC node, for load tests and offline end-to-end tests. It implements the
+    methods this package calls: getAccountInfo, getMultipleAccounts, getProgramAccounts (with memcmp and dataSize
+    filters), getMinimumBalanceForRentExemption, getRecentBlockhash, getFeeCalculatorForBlockhash, sendTransaction
+    and getSignatureStatuses.
+
+    Sent transactions are applied immediately, without checking signatures or fees. A transaction with a failing
+    instruction (for example on a missing account, or moving more tokens than an account holds) is rolled back and
+    reports the failure in the `err` of its status, like a transaction sent with skip_preflight. Transactions with a blockhash
+    older than `blockhash_validity` seconds, and a `drop_rate` fraction of all others, are accepted but never
+    applied, like transactions dropped by a congested leader. The fake models the accounts `deploy`, `mint`, `send`
+    and `burn` touch: mints, token accounts and metadata. Each request waits `latency` seconds (a number or a
+    (min, max) range), and fails with a JSON-RPC error or an HTTP 429 with probability `error_rate` and
+    `rate_limit_rate`. Signatures report "processed" until `confirmation_delay` has passed and "finalized" after
+    `finalization_delay`.
+
+    A fake started with `replica_of=other` serves the same ledger as `other` (accounts, signatures and blockhashes)
+    with its own latency and failure rates, like several RPC nodes of one cluster.
+    """
+
+    def __init__(self, latency=0, error_rate=0, rate_limit_rate=0, confirmation_delay=SLOT_TIME, finalization_delay=2*SLOT_TIME, seed=None, drop_rate=0, blockhash_validity=BLOCKHASH_VALIDITY, replica_of=None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.drop_rate = drop_rate
+        self.blockhash_validity = blockhash_validity
+        self.confirmation_delay = confirmation_delay
+        self.finalization_delay = finalization_delay
+        self.requests = {}
+        self._journal = {}
+        self._random = random.Random(seed)
+        self._server = None
+        if replica_of is not None:
+            self.accounts = replica_of.accounts
+            self.signatures = replica_of.signatures
+            self.blockhashes = replica_of.blockhashes
+            self._blockhashes = replica_of._blockhashes
+            self._started = replica_of._started
+            self._lock = replica_of._lock
+        else:
+            self.accounts = {}
+            self.signatures = {}
+            self.blockhashes = {}
+            self._blockhashes = itertools.count(1)
+            self._started = time.monotonic()
+            self._lock = threading.Lock()
+
+    @property
+    def endpoint(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self, host="127.0.0.1", port=0):
+        validator = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are written separately, Nagle would hold the body back on keep-alive connections
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                status, response = validator.handle(request)
+                body = json.dumps(response).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="fake-validator", daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, _exc_type, _exc, _tb):
+        self.stop()
+
+    def slot(self):
+        return int((time.monotonic() - self._started) / SLOT_TIME)
+
+    def _sleep(self):
+        latency = self.latency
+        if isinstance(latency, (tuple, list)):
+            with self._lock:
+                latency = self._random.uniform(*latency)
+        if latency:
+            time.sleep(latency)
+
+    def handle(self, request):
+        """ Returns (HTTP status, JSON response) for one JSON-RPC request. """
+        self._sleep()
+        method = request.get("method")
+        with self._lock:
+            self.requests[method] = self.requests.get(method, 0) + 1
+            roll = self._random.random()
+        if roll < self.rate_limit_rate:
+            return 429, {"jsonrpc": "2.0", "error": {"code": 429, "message": "Too many requests"}, "id": request.get("id")}
+        if roll < self.rate_limit_rate + self.error_rate:
+            return 200, {"jsonrpc": "2.0", "error": NODE_BEHIND, "id": request.get("id")}
+        handler = getattr(self, "_" + method, None) if method else None
+        if handler is None:
+            return 200, {"jsonrpc": "2.0", "error": METHOD_NOT_FOUND, "id": request.get("id")}
+        with self._lock:
+            result = handler(*request.get("params", []))
+        return 200, {"jsonrpc": "2.0", "result": result, "id": request.get("id")}
+
+    # JSON-RPC methods, called with the lock held
+
+    def _context(self, value):
+        return {"context": {"slot": self.slot()}, "value": value}
+
+    def _account_info(self, pubkey):
+        account = self.accounts.get(pubkey)
+        if account is None:
+            return None
+        owner, data = account
+        return {
+            "data": [base64.b64encode(data).decode("ascii"), "base64"],
+            "executable": False,
+            "lamports": (len(data) + ACCOUNT_STORAGE_OVERHEAD) * RENT_PER_BYTE,
+            "owner": owner,
+            "rentEpoch": 0,
+        }
+
+    def _getAccountInfo(self, pubkey, config=None):
+        return self._context(self._account_info(pubkey))
+
+    def _getMultipleAccounts(self, pubkeys, config=None):
+        return self._context([self._account_info(pubkey) for pubkey in pubkeys])
+
+    def _getProgramAccounts(self, program_id, config=None):
+        filters = (config or {}).get("filters", [])
+        accounts = []
+        for pubkey, (owner, data) in self.accounts.items():
+            if owner != program_id:
+                continue
+            matches = True
+            for f in filters:
+                if "dataSize" in f:
+                    matches = matches and len(data) == f["dataSize"]
+                else:
+                    offset, expected = f["memcmp"]["offset"], base58.b58decode(f["memcmp"]["bytes"])
+                    matches = matches and data[offset:offset+len(expected)] == expected
+            if matches:
+                accounts.append({"pubkey": pubkey, "account": self._account_info(pubkey)})
+        return accounts
+
+    def _getMinimumBalanceForRentExemption(self, size, config=None):
+        return (size + ACCOUNT_STORAGE_OVERHEAD) * RENT_PER_BYTE
+
+    def _getRecentBlockhash(self, config=None):
+        blockhash = base58.b58encode(next(self._blockhashes).to_bytes(32, "big")).decode("ascii")
+        self.blockhashes[blockhash] = time.monotonic()
+        return self._context({"blockhash": blockhash, "feeCalculator": {"lamportsPerSignature": 5000}})
+
+    def _blockhash_valid(self, blockhash):
+        issued_at = self.blockhashes.get(blockhash)
+        return issued_at is not None and time.monotonic() - issued_at < self.blockhash_validity
+
+    def _getFeeCalculatorForBlockhash(self, blockhash, config=None):
+        if not self._blockhash_valid(blockhash):
+            return self._context(None)
+        return self._context({"feeCalculator": {"lamportsPerSignature": 5000}})
+
+    def _sendTransaction(self, raw, config=None):
+        tx = Transaction.deserialize(base64.b64decode(raw))
+        signature = base58.b58encode(tx.signatures[0].signature).decode("ascii")
+        # Like a congested leader, accept the transaction and then drop it
+        if self._random.random() < self.drop_rate or not self._blockhash_valid(str(tx.recent_blockhash)):
+            return signature
+        if signature not in self.signatures:
+            self.signatures[signature] = (time.monotonic(), self.slot(), self._execute(tx))
+        return signature
+
+    def _execute(self, tx):
+        """ Apply every instruction of `tx`, or none of them. Returns the `err` of the transaction's status. """
+        # Previous state of every account written so far, None for accounts that did not exist
+        self._journal = {}
+        try:
+            for index, ix in enumerate(tx.instructions):
+                try:
+                    self._apply(ix)
+                except InstructionError as e:
+                    return {"InstructionError": [index, e.error]}
+                except (KeyError, IndexError, ValueError, struct.error):
+                    return {"InstructionError": [index, "InvalidAccountData"]}
+            self._journal = {}
+            return None
+        finally:
+            for pubkey, account in self._journal.items():
+                if account is None:
+                    self.accounts.pop(pubkey, None)
+                else:
+                    self.accounts[pubkey] = account
+            self._journal = {}
+
+    def _getSignatureStatuses(self, signatures, config=None):
+        now = time.monotonic()
+        statuses = []
+        for signature in signatures:
+            sent = self.signatures.get(signature)
+            if sent is None:
+                statuses.append(None)
+                continue
+            sent_at, slot, err = sent
+            elapsed = now - sent_at
+            if elapsed >= self.finalization_delay:
+                status = {"confirmations": None, "confirmationStatus": "finalized"}
+            elif elapsed >= self.confirmation_delay:
+                status = {"confirmations": int((elapsed - self.confirmation_delay) / SLOT_TIME) + 1, "confirmationStatus": "confirmed"}
+            else:
+                status = {"confirmations": 0, "confirmationStatus": "processed"}
+            statuses.append(dict(status, slot=slot, err=err, status={"Ok": None} if err is None else {"Err": err}))
+        return self._context(statuses)
+
+    # Account state
+
+    def _apply(self, ix):
+        keys = [str(meta.pubkey) for meta in ix.keys]
+        data = ix.data
+        if ix.program_id == SYSTEM_PROGRAM_ID:
+            if struct.unpack_from("<I", data)[0] == _CREATE_ACCOUNT:
+                space, = _U64.unpack_from(data, 12)
+                if keys[1] in self.accounts:
+                    raise InstructionError(ACCOUNT_ALREADY_IN_USE)
+                self._store(keys[1], (str(PublicKey(data[20:52])), bytes(space)))
+        elif ix.program_id == TOKEN_PROGRAM_ID:
+            self._apply_token(keys, data)
+        elif ix.program_id == ASSOCIATED_TOKEN_ACCOUNT_PROGRAM_ID:
+            # payer, associated token account, wallet, mint
+            if keys[1] in self.accounts:
+                raise InstructionError(ACCOUNT_ALREADY_IN_USE)
+            self._store(keys[1], (str(TOKEN_PROGRAM_ID), _token_account(PublicKey(keys[3]), PublicKey(keys[2]))))
+        elif ix.program_id == METADATA_PROGRAM_ID:
+            self._apply_metadata(keys, data)
+
+    def _apply_token(self, keys, data):
+        if data[0] == _INITIALIZE_MINT:
+            self._store(keys[0], (str(TOKEN_PROGRAM_ID), _mint_account(data[2:34], data[35:67], data[1])))
+        elif data[0] in (_MINT_TO, _BURN, _TRANSFER):
+            amount, = _U64.unpack_from(data, 1)
+            if data[0] == _MINT_TO:
+                # mint, destination, authority
+                self._add_supply(keys[0], amount)
+                self._add_amount(keys[1], amount)
+            elif data[0] == _BURN:
+                # account, mint, owner
+                self._add_amount(keys[0], -amount)
+                self._add_supply(keys[1], -amount)
+            else:
+                # source, destination, owner
+                self._add_amount(keys[0], -amount)
+                self._add_amount(keys[1], amount)
+
+    def _store(self, pubkey, account):
+        self._journal.setdefault(pubkey, self.accounts.get(pubkey))
+        self.accounts[pubkey] = account
+
+    def _add_amount(self, pubkey, amount):
+        owner, data = self.accounts[pubkey]
+        account = ACCOUNT_LAYOUT.parse(data)
+        if account.amount + amount < 0:
+            raise InstructionError(INSUFFICIENT_FUNDS)
+        self._store(pubkey, (owner, _token_account(account.mint, account.owner, account.amount + amount)))
+
+    def _add_supply(self, pubkey, amount):
+        owner, data = self.accounts[pubkey]
+        mint = MINT_LAYOUT.parse(data)
+        self._store(pubkey, (owner, _mint_account(mint.mint_authority, mint.freeze_authority, mint.decimals, mint.supply + amount)))
+
+    def _apply_metadata(self, keys, data):
+        if data[0] == InstructionType.CREATE_METADATA:
+            # metadata, mint, mint authority, payer, update authority; the data is followed by is_mutable
+            metadata = _metadata_account(bytes(PublicKey(keys[4])), bytes(PublicKey(keys[1])), data[1:-1], 0, data[-1])
+            self._store(keys[0], (str(METADATA_PROGRAM_ID), metadata))
+        elif data[0] == InstructionType.UPDATE_METADATA and data[1] == 1:
+            # Some(data), followed by no new update authority and no primary sale flag
+            _, metadata = self.accounts[keys[0]]
+            record = decode_metadata(metadata)
+            metadata = _metadata_account(metadata[1:33], metadata[33:65], data[2:-2], record.primary_sale_happened, record.is_mutable)
+            self._store(keys[0], (str(METADATA_PROGRAM_ID), metadata))
+        elif data[0] == _CREATE_MASTER_EDITION:
+            self._store(keys[0], (str(METADATA_PROGRAM_ID), bytes([6]) + data[1:]))
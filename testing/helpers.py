@@ -0,0 +1,24 @@
+import base64
+import base58
+from cryptography.fernet import Fernet
+from solana.keypair import Keypair
+from solana.publickey import PublicKey
+from spl.token._layouts import ACCOUNT_LAYOUT
+from metaplex.pda import get_associated_token_address
+
+
+def api_config(keypair=None):
+    """ `MetaplexAPI` config paying with `keypair` (a new one by default), with a fresh decryption key. """
+    if keypair is None:
+        keypair = Keypair()
+    return {
+        "PRIVATE_KEY": base58.b58encode(keypair.seed).decode("ascii"),
+        "PUBLIC_KEY": str(keypair.public_key),
+        "DECRYPTION_KEY": Fernet.generate_key().decode("ascii"),
+    }
+
+
+def token_amount(client, owner, contract):
+    """ Tokens of `contract` held in the associated token account of `owner`. """
+    info = client.get_account_info(get_associated_token_address(PublicKey(owner), PublicKey(contract)))["result"]["value"]
+    return ACCOUNT_LAYOUT.parse(base64.b64decode(info["data"][0])).amount
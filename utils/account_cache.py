@@ -0,0 +1,84 @@
+import threading
+import time
+from cachetools import LRUCache
+from metaplex.metadata import ASSOCIATED_TOKEN_ACCOUNT_PROGRAM_ID
+from metaplex.pda import get_associated_token_address
+
+ACCOUNT_CACHE_SIZE = 65536
+# AccountState of spl-token, 0 (uninitialized) stands for a missing account
+ACCOUNT_INITIALIZED = 1
+# A missing account can be created by anyone at any time, so "does not exist" is only trusted briefly
+NEGATIVE_TTL = 2
+# Owners can close their token accounts at any time, so "exists" is not trusted forever either
+POSITIVE_TTL = 600
+
+
+class AccountStateCache():
+    """
+    Bounded LRU of associated token account states keyed by endpoint and account address, so `mint`, `send` and
+    `burn` can skip reading accounts they already know about. A state of 0 means the account does not exist and
+    expires after `negative_ttl` seconds, other states expire after `positive_ttl` seconds.
+
+    `execute` records the accounts created by a transaction once it confirms without error, and evicts every
+    account of a transaction that failed, since the failure may come from a stale entry.
+    """
+
+    def __init__(self, maxsize=ACCOUNT_CACHE_SIZE, negative_ttl=NEGATIVE_TTL, positive_ttl=POSITIVE_TTL):
+        self.negative_ttl = negative_ttl
+        self.positive_ttl = positive_ttl
+        # key -> (state, expires_at)
+        self._states = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(api_endpoint, owner, mint):
+        return api_endpoint, str(get_associated_token_address(owner, mint))
+
+    def get(self, api_endpoint, owner, mint):
+        """ The cached state of the PDA of `owner` for `mint`, or None on a miss. """
+        key = self._key(api_endpoint, owner, mint)
+        with self._lock:
+            entry = self._states.get(key)
+            if entry is not None and entry[1] <= time.monotonic():
+                del self._states[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[0]
+
+    def set(self, api_endpoint, owner, mint, state):
+        expires_at = time.monotonic() + (self.negative_ttl if state == 0 else self.positive_ttl)
+        with self._lock:
+            self._states[self._key(api_endpoint, owner, mint)] = (state, expires_at)
+
+    def record_transaction(self, api_endpoint, tx):
+        """ Mark the associated token accounts created by `tx`, confirmed without error, as initialized. """
+        for ix in tx.instructions:
+            if ix.program_id == ASSOCIATED_TOKEN_ACCOUNT_PROGRAM_ID:
+                # payer, associated token account, wallet, mint
+                self.set(api_endpoint, ix.keys[2].pubkey, ix.keys[3].pubkey, ACCOUNT_INITIALIZED)
+
+    def evict_transaction(self, api_endpoint, tx):
+        """ Forget every account `tx` touches, after it failed. """
+        with self._lock:
+            for ix in tx.instructions:
+                for meta in ix.keys:
+                    self._states.pop((api_endpoint, str(meta.pubkey)), None)
+
+    def evict(self, api_endpoint, owner, mint):
+        with self._lock:
+            self._states.pop(self._key(api_endpoint, owner, mint), None)
+
+    def clear(self):
+        with self._lock:
+            self._states.clear()
+
+    def __len__(self):
+        return len(self._states)
+
+
+account_cache = AccountStateCache()
@@ -0,0 +1,210 @@
+import asyncio
+import logging
+import time
+from solana.blockhash import Blockhash
+from solana.rpc.async_api import AsyncClient
+from solana.rpc.commitment import Finalized, Processed
+from solana.rpc.core import RPCException
+from solana.rpc.types import TxOpts
+from utils.account_cache import account_cache
+from utils.blockhash_provider import SLOT_TIME
+from utils.confirmation_tracker import is_confirmed
+from utils.metrics import metrics, CONFIRM_TIMEOUTS, EXPIRATIONS, FAILURES, REBROADCASTS, RETRIES
+from utils.signing import unique_signers
+from utils.submission import (
+    BLOCKHASH_VALIDITY,
+    MAX_BLOCKHASH_WAITS,
+    EXPIRED,
+    PERMANENT,
+    REBROADCAST_INTERVAL,
+    BlockhashExpired,
+    ConfirmationTimeout,
+    TransactionFailed,
+    classify_error,
+    next_step,
+    sent_signatures,
+    signature_of,
+    unproven_expiry,
+)
+
+logger = logging.getLogger(__name__)
+
+# Background rebroadcasts of transactions sent with skip_confirmation, referenced until they finish
+_rebroadcasts = set()
+
+async def _blockhash(client, exclude=None):
+    for _ in range(MAX_BLOCKHASH_WAITS):
+        resp = await client.get_recent_blockhash(Finalized)
+        if 'error' in resp:
+            raise RPCException(resp['error'])
+        blockhash = Blockhash(resp["result"]["value"]["blockhash"])
+        if blockhash != exclude:
+            return blockhash, time.monotonic() + BLOCKHASH_VALIDITY
+        await asyncio.sleep(SLOT_TIME)
+    raise Exception(f"No blockhash newer than {exclude}")
+
+async def _status(client, signature):
+    resp = await client.get_signature_statuses([signature])
+    if 'error' in resp:
+        raise RPCException(resp['error'])
+    return resp["result"]["value"][0]
+
+async def _blockhash_expired(client, blockhash):
+    resp = await client.get_fee_calculator_for_blockhash(blockhash, Processed)
+    if 'error' in resp:
+        raise RPCException(resp['error'])
+    return resp["result"]["value"] is None
+
+async def _proven_expired(client, signature, blockhash):
+    """
+    Whether `signature` has not landed and `blockhash` has expired, the same proof `_confirm` waits for. A node
+    lagging behind the cluster also reports a blockhash it has not seen yet as not found.
+    """
+    try:
+        return await _status(client, signature) is None and await _blockhash_expired(client, blockhash)
+    except Exception as e:
+        logger.debug("Failed to check whether %s expired: %s", signature, e)
+        return False
+
+async def _resend(client, raw, signature, operation, api_endpoint):
+    """ Send `raw` again. Returns False if sending it again cannot help. """
+    try:
+        await client.send_raw_transaction(raw, opts=TxOpts(skip_preflight=True))
+        metrics.count(REBROADCASTS, operation=operation, endpoint=api_endpoint)
+        return True
+    except Exception as e:
+        logger.debug("Failed to rebroadcast %s: %s", signature, e)
+        return classify_error(e) != PERMANENT
+
+async def _rebroadcast(client, raw, signature, expires_at, interval, operation, api_endpoint):
+    """ Coroutine version of `utils.submission.Rebroadcaster`, for one transaction. """
+    while True:
+        await asyncio.sleep(interval)
+        if time.monotonic() >= expires_at:
+            return
+        try:
+            if await _status(client, signature) is not None:
+                return
+        except Exception as e:
+            logger.debug("Failed to poll %s: %s", signature, e)
+        if not await _resend(client, raw, signature, operation, api_endpoint):
+            return
+
+async def _confirm(client, raw, signature, blockhash, expires_at, max_timeout, target, finalized, rebroadcast_interval, operation, api_endpoint):
+    """ Coroutine version of `utils.execution_engine._confirm`, polling instead of using a tracker. """
+    deadline = time.monotonic() + max_timeout
+    resend = True
+    while True:
+        wait = min(rebroadcast_interval, deadline - time.monotonic())
+        if wait <= 0:
+            return None
+        await asyncio.sleep(wait)
+        try:
+            status = await _status(client, signature)
+        except Exception as e:
+            logger.debug("Failed to poll %s: %s", signature, e)
+            continue
+        if is_confirmed(status, target, finalized):
+            return status
+        resend = resend and status is None
+        if not resend:
+            continue
+        if time.monotonic() >= expires_at:
+            # Only sign again once it is certain this signature has not landed and never will
+            try:
+                expired = await _blockhash_expired(client, blockhash)
+            except Exception as e:
+                logger.debug("Failed to check blockhash %s: %s", blockhash, e)
+                continue
+            if expired:
+                raise BlockhashExpired(signature)
+        resend = await _resend(client, raw, signature, operation, api_endpoint)
+
+async def execute(api_endpoint, tx, signers, max_retries=3, skip_confirmation=True, max_timeout=60, target=20, finalized=True, client=None, operation=None, rebroadcast_interval=REBROADCAST_INTERVAL, raise_on_timeout=False):
+    """ Coroutine version of `utils.execution_engine.execute`. Pass `client` to reuse an open AsyncClient. """
+    if client is None:
+        async with AsyncClient(api_endpoint) as client:
+            # The client is closed on return, so nothing can be rebroadcast in the background
+            return await execute(api_endpoint, tx, signers, max_retries, skip_confirmation, max_timeout, target, finalized, client=client, operation=operation, rebroadcast_interval=rebroadcast_interval if not skip_confirmation else None, raise_on_timeout=raise_on_timeout)
+    signers = unique_signers(signers)
+    error = None
+    # Kept across transient errors: a send that timed out may still land, so the same transaction is sent again
+    signed = None
+    for attempt in range(max_retries):
+        try:
+            used = None
+            while signed is None:
+                with metrics.stage("blockhash", operation, api_endpoint):
+                    tx.recent_blockhash, expires_at = await _blockhash(client, exclude=used)
+                with metrics.stage("sign", operation, api_endpoint):
+                    tx.sign(*signers)
+                    raw = tx.serialize()
+                # An identical transaction was already sent with this blockhash and this one would be dropped
+                if sent_signatures.claim(signature_of(tx)):
+                    signed = raw, signature_of(tx), expires_at
+                used = tx.recent_blockhash
+            raw, signature, expires_at = signed
+            with metrics.stage("send", operation, api_endpoint):
+                result = await client.send_raw_transaction(raw, opts=TxOpts(skip_preflight=True))
+            logger.debug("%s sent: %s", operation or "transaction", result)
+            if skip_confirmation:
+                if rebroadcast_interval is not None:
+                    task = asyncio.ensure_future(_rebroadcast(client, raw, signature, expires_at, rebroadcast_interval, operation, api_endpoint))
+                    _rebroadcasts.add(task)
+                    task.add_done_callback(_rebroadcasts.discard)
+                return result
+            with metrics.stage("confirm", operation, api_endpoint):
+                status = await _confirm(client, raw, signature, tx.recent_blockhash, expires_at, max_timeout, target, finalized, rebroadcast_interval, operation, api_endpoint)
+            if status is None:
+                metrics.count(CONFIRM_TIMEOUTS, operation=operation, endpoint=api_endpoint)
+                if raise_on_timeout:
+                    raise ConfirmationTimeout(signature, result)
+            elif status.get("err") is not None:
+                # Sent without preflight, so a failing instruction only shows up here
+                raise TransactionFailed(signature, status["err"])
+            else:
+                # Token accounts created by this transaction now exist
+                account_cache.record_transaction(api_endpoint, tx)
+            return result
+        except Exception as e:
+            if signed is not None:
+                # The failure may come from a stale cached account, e.g. one its owner closed
+                account_cache.evict_transaction(api_endpoint, tx)
+            expiry_proven = None
+            if signed is not None and unproven_expiry(e):
+                # Signing again while the sent transaction may still land could land it twice
+                expiry_proven = await _proven_expired(client, signed[1], tx.recent_blockhash)
+            kind, delay = next_step(e, attempt, max_retries, expiry_proven)
+            if kind == PERMANENT:
+                logger.warning("Failed %s: %s", operation or "transaction", e)
+                metrics.count(FAILURES, operation=operation, endpoint=api_endpoint)
+                raise
+            logger.warning("Failed attempt %d of %s: %s", attempt, operation or "transaction", e)
+            metrics.count(EXPIRATIONS if kind == EXPIRED else RETRIES, operation=operation, endpoint=api_endpoint)
+            if kind == EXPIRED:
+                signed = None
+            error = e
+            if delay:
+                await asyncio.sleep(delay)
+    metrics.count(FAILURES, operation=operation, endpoint=api_endpoint)
+    raise error
+
+async def await_confirmation(client, signatures, max_timeout=60, target=20, finalized=True):
+    elapsed = 0
+    while elapsed < max_timeout:
+        sleep_time = 1
+        await asyncio.sleep(sleep_time)
+        elapsed += sleep_time
+        resp = await client.get_signature_statuses(signatures)
+        if resp["result"]["value"][0] is not None:
+            confirmations = resp["result"]["value"][0]["confirmations"]
+            is_finalized = resp["result"]["value"][0]["confirmationStatus"] == "finalized"
+        else:
+            continue
+        if not finalized:
+            if confirmations >= target or is_finalized:
+                logger.debug("Took %d seconds to confirm transaction", elapsed)
+                return resp["result"]["value"][0]
+        elif is_finalized:
+            logger.debug("Took %d seconds to confirm transaction", elapsed)
+            return resp["result"]["value"][0]
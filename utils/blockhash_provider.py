@@ -0,0 +1,90 @@
+import logging
+import threading
+import time
+from solana.blockhash import Blockhash
+from solana.rpc.commitment import Finalized
+from solana.rpc.core import RPCException
+
+logger = logging.getLogger(__name__)
+
+# A transaction is accepted while its blockhash is among the last 150 blocks
+MAX_BLOCKHASH_AGE_SLOTS = 150
+# A finalized blockhash is already about 32 slots old when it is returned
+FINALIZED_LAG_SLOTS = 32
+SLOT_TIME = 0.4
+REFRESH_INTERVAL = 10
+MIN_REMAINING_SLOTS = 50
+
+
+class BlockhashProvider():
+    """
+    Keeps a recent blockhash for one endpoint, refreshed by a background thread every `refresh_interval` seconds.
+    `get()` hands out the cached blockhash while it is estimated to stay valid for at least `min_remaining_slots`
+    more slots, and only fetches inline when it is not. Every caller gets the same blockhash, so `execute` signs a
+    transaction identical to one it already sent again with a newer blockhash (see `utils.submission.SentSignatures`).
+    """
+
+    def __init__(self, client, refresh_interval=REFRESH_INTERVAL, min_remaining_slots=MIN_REMAINING_SLOTS, commitment=Finalized):
+        self.client = client
+        self.refresh_interval = refresh_interval
+        self.min_remaining_slots = min_remaining_slots
+        self.commitment = commitment
+        self.fetches = 0
+        self._blockhash = None
+        self._slot = None
+        self._fetched_at = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def remaining_slots(self):
+        if self._fetched_at is None:
+            return 0
+        age = (time.monotonic() - self._fetched_at) / SLOT_TIME
+        if self.commitment == Finalized:
+            age += FINALIZED_LAG_SLOTS
+        return MAX_BLOCKHASH_AGE_SLOTS - age
+
+    def valid_for(self):
+        """ Seconds the current blockhash is estimated to stay valid. """
+        return max(self.remaining_slots(), 0) * SLOT_TIME
+
+    def refresh(self):
+        resp = self.client.get_recent_blockhash(self.commitment)
+        if 'error' in resp:
+            raise RPCException(resp['error'])
+        blockhash = Blockhash(resp["result"]["value"]["blockhash"])
+        with self._lock:
+            self._blockhash = blockhash
+            self._slot = resp["result"]["context"]["slot"]
+            self._fetched_at = time.monotonic()
+            self.fetches += 1
+        return blockhash
+
+    def get(self):
+        if self._thread is None:
+            self.start()
+        # Concurrent callers may both refresh here, which is harmless
+        if self.remaining_slots() < self.min_remaining_slots:
+            return self.refresh()
+        return self._blockhash
+
+    def invalidate(self):
+        with self._lock:
+            self._fetched_at = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="blockhash-provider", daemon=True)
+                self._thread.start()
+
+    def close(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.warning("Failed to refresh blockhash: %s", e)
@@ -0,0 +1,126 @@
+import base64
+import binascii
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from cryptography.fernet import Fernet, InvalidToken
+
+DECRYPTED_KEY_TTL = 60
+DECRYPTED_KEY_CACHE_SIZE = 1024
+
+
+def _token_timestamp(token):
+    """ Creation time written in the (unverified) token header. Only read for tokens that already decrypted once. """
+    if isinstance(token, str):
+        token = token.encode("ascii")
+    try:
+        data = base64.urlsafe_b64decode(token)
+    except (TypeError, binascii.Error):
+        raise InvalidToken
+    return int.from_bytes(data[1:9], byteorder="big")
+
+
+def _zero(buffer):
+    for i in range(len(buffer)):
+        buffer[i] = 0
+
+
+class CachingFernet(Fernet):
+    """
+    Fernet that remembers decrypted tokens for `cache_ttl` seconds, up to `maxsize` of them, so repeated requests
+    with the same encrypted key skip HMAC verification and AES decryption.
+
+    Plaintexts are held in bytearrays that are zeroed when they expire, are evicted or the cache is cleared. Only
+    the cached copy is zeroed: `decrypt` returns `bytes` like `Fernet` does, and Python cannot wipe those or the
+    keypairs built from them, which live until the request that asked for them is done. This is the only place
+    decrypted keys are kept between requests, as `send` and `burn` expand them into keypairs per call and keep them
+    out of `keypair_cache`.
+
+    The `ttl` argument of `decrypt` keeps its Fernet meaning and is checked against the token's own timestamp on
+    every call, cached or not.
+    """
+
+    def __init__(self, key, cache_ttl=DECRYPTED_KEY_TTL, maxsize=DECRYPTED_KEY_CACHE_SIZE):
+        super().__init__(key)
+        self.cache_ttl = cache_ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        # sha256(token) -> (expires_at, token timestamp, plaintext), oldest first
+        self._plaintexts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, token):
+        if isinstance(token, str):
+            token = token.encode("ascii")
+        return hashlib.sha256(token).digest()
+
+    def _expire(self, now):
+        while self._plaintexts:
+            key, (expires_at, _, plaintext) = next(iter(self._plaintexts.items()))
+            if expires_at > now and len(self._plaintexts) <= self.maxsize:
+                return
+            del self._plaintexts[key]
+            _zero(plaintext)
+
+    def _lookup(self, key, ttl):
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry = self._plaintexts.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            _, timestamp, plaintext = entry
+            plaintext = bytes(plaintext)
+        if ttl is not None and timestamp + ttl < int(time.time()):
+            raise InvalidToken
+        return plaintext
+
+    def _store(self, key, token, plaintext):
+        entry = (time.monotonic() + self.cache_ttl, _token_timestamp(token), bytearray(plaintext))
+        with self._lock:
+            previous = self._plaintexts.pop(key, None)
+            if previous is not None:
+                _zero(previous[2])
+            self._plaintexts[key] = entry
+            self._expire(time.monotonic())
+
+    def decrypt(self, token, ttl=None):
+        key = self._key(token)
+        plaintext = self._lookup(key, ttl)
+        if plaintext is None:
+            plaintext = super().decrypt(token, ttl)
+            self._store(key, token, plaintext)
+        return plaintext
+
+    def decrypt_many(self, tokens, ttl=None):
+        """ Decrypt a batch of tokens, each distinct token at most once. Invalid or expired tokens give None. """
+        plaintexts = {}
+        results = []
+        for token in tokens:
+            key = self._key(token)
+            if key not in plaintexts:
+                try:
+                    plaintexts[key] = self.decrypt(token, ttl)
+                except InvalidToken:
+                    plaintexts[key] = None
+            results.append(plaintexts[key])
+        return results
+
+    def evict(self, token):
+        with self._lock:
+            entry = self._plaintexts.pop(self._key(token), None)
+        if entry is not None:
+            _zero(entry[2])
+
+    def clear(self):
+        with self._lock:
+            entries, self._plaintexts = self._plaintexts, OrderedDict()
+        for _, _, plaintext in entries.values():
+            _zero(plaintext)
+
+    def __len__(self):
+        return len(self._plaintexts)
@@ -0,0 +1,125 @@
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from solana.rpc.api import Client
+from solana.rpc.providers.base import BaseProvider
+from solana.rpc.providers.http import HTTPProvider
+from utils.blockhash_provider import BlockhashProvider
+from utils.confirmation_tracker import ConfirmationTracker
+from utils.metrics import metrics, RPC_ERRORS, RPC_SECONDS
+from utils.websocket_tracker import WebsocketConfirmationTracker, websocket_endpoint
+
+DEFAULT_POOL_SIZE = 10
+# (connect, read) timeouts in seconds, as accepted by `requests`
+DEFAULT_TIMEOUT = (3.05, 30)
+
+
+class PooledHTTPProvider(HTTPProvider):
+    """
+    HTTPProvider that sends every request through one keep-alive `requests.Session`,
+    instead of opening a new connection (and TLS handshake) per call. Each request is timed per method and endpoint.
+    """
+
+    def __init__(self, endpoint, pool_size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT):
+        super().__init__(endpoint)
+        self.timeout = timeout
+        self.adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session = requests.Session()
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+        self._lock = threading.Lock()
+        self.requests = 0
+
+    def make_request(self, method, *params):
+        request_kwargs = self._before_request(method=method, params=params, is_async=False)
+        try:
+            with metrics.timer(RPC_SECONDS, method=method, endpoint=self.endpoint_uri):
+                raw_response = self.session.post(timeout=self.timeout, **request_kwargs)
+                with self._lock:
+                    self.requests += 1
+                return self._after_request(raw_response=raw_response, method=method)
+        except Exception:
+            metrics.count(RPC_ERRORS, method=method, endpoint=self.endpoint_uri)
+            raise
+
+    def stats(self):
+        pools = self.adapter.poolmanager.pools
+        connections = sum(pools[key].num_connections for key in pools.keys())
+        return {
+            "requests": self.requests,
+            "connections": connections,
+            "reused": max(self.requests - connections, 0),
+        }
+
+    def close(self):
+        self.session.close()
+
+
+class ClientRegistry():
+    """
+    One pooled `Client` per RPC endpoint. `MetaplexAPI` owns a registry and hands its clients to the
+    transaction builders and the execution engine, so every call to an endpoint reuses the same connections.
+    The registry also owns one confirmation tracker and one blockhash provider per endpoint, shared by every caller. With
+    `confirmation="websocket"` it listens for signatureSubscribe notifications and falls back to polling.
+
+    An endpoint can also be a provider such as `utils.endpoint_pool.EndpointPool`, which is then used as is.
+    """
+
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT, confirmation="poll"):
+        assert(confirmation in ("poll", "websocket"))
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.confirmation = confirmation
+        self._clients = {}
+        self._trackers = {}
+        self._blockhashes = {}
+        self._lock = threading.Lock()
+
+    def get(self, api_endpoint):
+        with self._lock:
+            client = self._clients.get(api_endpoint)
+            if client is None:
+                client = Client(str(api_endpoint))
+                if isinstance(api_endpoint, BaseProvider):
+                    client._provider = api_endpoint
+                else:
+                    client._provider = PooledHTTPProvider(api_endpoint, pool_size=self.pool_size, timeout=self.timeout)
+                self._clients[api_endpoint] = client
+            return client
+
+    def tracker(self, api_endpoint):
+        client = self.get(api_endpoint)
+        with self._lock:
+            tracker = self._trackers.get(api_endpoint)
+            if tracker is None:
+                tracker = ConfirmationTracker(client)
+                if self.confirmation == "websocket":
+                    tracker = WebsocketConfirmationTracker(websocket_endpoint(client._provider.endpoint_uri), fallback=tracker)
+                self._trackers[api_endpoint] = tracker
+            return tracker
+
+    def blockhashes(self, api_endpoint):
+        client = self.get(api_endpoint)
+        with self._lock:
+            provider = self._blockhashes.get(api_endpoint)
+            if provider is None:
+                provider = BlockhashProvider(client)
+                self._blockhashes[api_endpoint] = provider
+            return provider
+
+    def stats(self):
+        """ Connection reuse counters per endpoint. """
+        with self._lock:
+            return {endpoint: client._provider.stats() for endpoint, client in self._clients.items()}
+
+    def close(self):
+        with self._lock:
+            clients, self._clients = self._clients, {}
+            trackers, self._trackers = self._trackers, {}
+            providers, self._blockhashes = self._blockhashes, {}
+        for tracker in trackers.values():
+            tracker.close()
+        for provider in providers.values():
+            provider.close()
+        for client in clients.values():
+            client._provider.close()
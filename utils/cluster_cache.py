@@ -0,0 +1,65 @@
+import threading
+from cachetools import TTLCache
+from solana.rpc.core import RPCException
+from spl.token._layouts import MINT_LAYOUT, ACCOUNT_LAYOUT
+
+CLUSTER_CACHE_TTL = 3600
+CLUSTER_CACHE_SIZE = 1024
+# The account sizes this package pays rent for: mints in `deploy` and token accounts in `topup`
+WARMUP_SIZES = (MINT_LAYOUT.sizeof(), ACCOUNT_LAYOUT.sizeof())
+
+
+class ClusterCache():
+    """
+    Caches slow-changing cluster values for `ttl` seconds. Rent-exemption minimums are keyed by (endpoint, account size),
+    so `deploy` and the default `topup` stop paying a blocking RPC call for a value that is effectively constant.
+    """
+
+    def __init__(self, ttl=CLUSTER_CACHE_TTL, maxsize=CLUSTER_CACHE_SIZE):
+        self._rent = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, key):
+        with self._lock:
+            lamports = self._rent.get(key)
+            if lamports is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return lamports
+
+    def _store(self, key, resp):
+        if 'error' in resp:
+            raise RPCException(resp['error'])
+        lamports = resp["result"]
+        with self._lock:
+            self._rent[key] = lamports
+        return lamports
+
+    def minimum_balance_for_rent_exemption(self, api_endpoint, client, size):
+        key = (api_endpoint, size)
+        lamports = self._lookup(key)
+        if lamports is None:
+            lamports = self._store(key, client.get_minimum_balance_for_rent_exemption(size))
+        return lamports
+
+    async def minimum_balance_for_rent_exemption_async(self, api_endpoint, client, size):
+        """ Same as `minimum_balance_for_rent_exemption` for an AsyncClient. """
+        key = (api_endpoint, size)
+        lamports = self._lookup(key)
+        if lamports is None:
+            lamports = self._store(key, await client.get_minimum_balance_for_rent_exemption(size))
+        return lamports
+
+    def warm(self, api_endpoint, client, sizes=WARMUP_SIZES):
+        for size in sizes:
+            self.minimum_balance_for_rent_exemption(api_endpoint, client, size)
+
+    def clear(self):
+        with self._lock:
+            self._rent.clear()
+
+
+cluster_cache = ClusterCache()
@@ -0,0 +1,141 @@
+import logging
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+import base58
+
+logger = logging.getLogger(__name__)
+
+# getSignatureStatuses accepts at most 256 signatures per request
+MAX_SIGNATURES_PER_REQUEST = 256
+MIN_POLL_INTERVAL = 0.2
+MAX_POLL_INTERVAL = 2.0
+
+
+def is_confirmed(status, target=20, finalized=True):
+    """ Same rule as `await_confirmation`: finalized, or `target` confirmations when `finalized` is False. """
+    if status is None:
+        return False
+    is_finalized = status["confirmationStatus"] == "finalized"
+    if finalized:
+        return is_finalized
+    return is_finalized or (status["confirmations"] or 0) >= target
+
+
+class ConfirmationTracker():
+    """
+    Tracks every in-flight signature for one endpoint and polls them together, up to 256 signatures per
+    getSignatureStatuses call. `track` returns a Future that resolves with the signature status once it
+    reaches the requested commitment.
+
+    The poll interval starts at `min_interval`, resets whenever a signature is added or resolved, and backs
+    off towards `max_interval` while nothing changes.
+    """
+
+    def __init__(self, client, min_interval=MIN_POLL_INTERVAL, max_interval=MAX_POLL_INTERVAL):
+        self.client = client
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min_interval
+        self.polls = 0
+        self._pending = {}
+        self._condition = threading.Condition()
+        self._thread = None
+        self._closed = False
+
+    def track(self, signature, target=20, finalized=True, callback=None):
+        """
+        Start tracking a signature (base58 str or raw bytes).
+        `callback(signature, status)` is called from the tracker thread when it confirms.
+        """
+        if isinstance(signature, bytes):
+            signature = base58.b58encode(signature).decode("ascii")
+        future = Future()
+        if callback is not None:
+            future.add_done_callback(lambda f: f.cancelled() or f.exception() or callback(signature, f.result()))
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("tracker is closed")
+            was_idle = not self._pending
+            self._pending.setdefault(signature, []).append((future, target, finalized))
+            self.interval = self.min_interval
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="confirmation-tracker", daemon=True)
+                self._thread.start()
+            # Only wake an idle poller, new signatures otherwise wait for the next tick
+            if was_idle:
+                self._condition.notify()
+        return future
+
+    def wait(self, signature, max_timeout=60, target=20, finalized=True):
+        """ Block until the signature confirms. Returns the status, or None if `max_timeout` elapsed first. """
+        future = self.track(signature, target=target, finalized=finalized)
+        try:
+            return future.result(timeout=max_timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            return None
+
+    def pending(self):
+        with self._condition:
+            return len(self._pending)
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            pending, self._pending = self._pending, {}
+            self._condition.notify()
+        for waiters in pending.values():
+            for future, _, _ in waiters:
+                future.cancel()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return
+                self._condition.wait(timeout=self.interval)
+                signatures = list(self._pending)
+            resolved = 0
+            for i in range(0, len(signatures), MAX_SIGNATURES_PER_REQUEST):
+                chunk = signatures[i:i+MAX_SIGNATURES_PER_REQUEST]
+                try:
+                    resp = self.client.get_signature_statuses(chunk)
+                    statuses = resp["result"]["value"]
+                except Exception as e:
+                    logger.warning("Failed to poll signature statuses: %s", e)
+                    continue
+                self.polls += 1
+                resolved += self._resolve(chunk, statuses)
+            with self._condition:
+                if resolved:
+                    self.interval = self.min_interval
+                else:
+                    self.interval = min(self.interval * 2, self.max_interval)
+
+    def _resolve(self, signatures, statuses):
+        done = []
+        with self._condition:
+            for signature, status in zip(signatures, statuses):
+                waiters = self._pending.get(signature)
+                if not waiters:
+                    continue
+                remaining = []
+                for waiter in waiters:
+                    future, target, finalized = waiter
+                    if future.cancelled():
+                        continue
+                    if is_confirmed(status, target, finalized):
+                        if future.set_running_or_notify_cancel():
+                            done.append((future, status))
+                    else:
+                        remaining.append(waiter)
+                if remaining:
+                    self._pending[signature] = remaining
+                else:
+                    del self._pending[signature]
+        # Resolve outside of the lock, done callbacks may track new signatures
+        for future, status in done:
+            future.set_result(status)
+        return len(done)
@@ -0,0 +1,254 @@
+import logging
+import statistics
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from solana.rpc.core import RPCException
+from solana.rpc.providers.base import BaseProvider
+from utils.client_registry import DEFAULT_POOL_SIZE, DEFAULT_TIMEOUT, PooledHTTPProvider
+from utils.metrics import metrics, HEDGES
+from utils.submission import TRANSIENT, classify_error
+
+logger = logging.getLogger(__name__)
+
+# Requests remembered per node for its latency percentiles and error rate
+LATENCY_WINDOW = 64
+# Samples needed before a node can be hedged or marked down
+MIN_SAMPLES = 5
+MAX_ERROR_RATE = 0.5
+# Seconds a node marked down gets no traffic, after which it is probed again
+COOLDOWN = 10.0
+SEND_FANOUT = 3
+# A lagging node has not seen recent blockhashes yet, so a blockhash only counts as expired once every node says
+# so. `execute` signs a transaction again when it does, and a wrong answer could land a transfer twice.
+QUORUM_METHODS = ("getFeeCalculatorForBlockhash",)
+
+
+class _Node():
+    """ Rolling latency and error samples of one endpoint. Guarded by the pool's lock. """
+
+    def __init__(self, provider, window):
+        self.provider = provider
+        self.latencies = deque(maxlen=window)
+        self.errors = deque(maxlen=window)
+        self.down_until = 0
+
+    def error_rate(self):
+        return sum(self.errors) / len(self.errors) if self.errors else 0
+
+    def latency(self):
+        return statistics.median(self.latencies) if self.latencies else 0
+
+    def percentile(self, q):
+        latencies = sorted(self.latencies)
+        return latencies[min(int(q * len(latencies)), len(latencies) - 1)]
+
+
+class EndpointPool(BaseProvider):
+    """
+    RPC provider spreading requests over several endpoints of one cluster. It can be passed to `MetaplexAPI`
+    methods wherever an `api_endpoint` is accepted, and `ClientRegistry` uses it as the provider of that client.
+
+    Reads go to the healthy node with the lowest median latency over its last `window` requests, and fail over to
+    the next node on network errors and transient JSON-RPC errors. With `hedge_percentile`, a read that takes
+    longer than that percentile of the node's latencies is also sent to the runner-up, and the first answer wins.
+    sendTransaction goes to the `fanout` best nodes at once, so the transaction reaches a leader sooner. A node
+    failing more than `max_error_rate` of its requests is skipped for `cooldown` seconds.
+    """
+
+    def __init__(self, endpoints, hedge_percentile=None, fanout=SEND_FANOUT, window=LATENCY_WINDOW, max_error_rate=MAX_ERROR_RATE, cooldown=COOLDOWN, pool_size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT):
+        assert(endpoints)
+        self.endpoints = list(endpoints)
+        self.hedge_percentile = hedge_percentile
+        self.fanout = fanout
+        self.max_error_rate = max_error_rate
+        self.cooldown = cooldown
+        self._nodes = [_Node(PooledHTTPProvider(endpoint, pool_size=pool_size, timeout=timeout), window) for endpoint in self.endpoints]
+        self._workers = pool_size * len(self._nodes)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def __str__(self):
+        return ",".join(self.endpoints)
+
+    @property
+    def endpoint_uri(self):
+        """ Endpoint of the node reads currently go to. """
+        return self._ranked()[0].provider.endpoint_uri
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="endpoint-pool")
+            return self._executor
+
+    def _ranked(self):
+        """ Healthy nodes fastest first (nodes without samples first of all), then the nodes marked down. """
+        now = time.monotonic()
+        with self._lock:
+            healthy = sorted((node for node in self._nodes if node.down_until <= now), key=lambda node: node.latency() * (1 + node.error_rate()))
+            down = sorted((node for node in self._nodes if node.down_until > now), key=lambda node: node.down_until)
+        return healthy + down
+
+    def _record(self, node, seconds, failed):
+        with self._lock:
+            node.errors.append(failed)
+            if not failed:
+                node.latencies.append(seconds)
+            if len(node.errors) >= MIN_SAMPLES and node.error_rate() > self.max_error_rate:
+                logger.warning("Marking %s down for %s seconds", node.provider.endpoint_uri, self.cooldown)
+                node.down_until = time.monotonic() + self.cooldown
+                # Judged afresh once the cooldown is over
+                node.errors.clear()
+                node.latencies.clear()
+
+    @staticmethod
+    def _failed(resp):
+        """ Whether a response is the node's fault, as opposed to an error any node would return. """
+        return "error" in resp and classify_error(RPCException(resp["error"])) == TRANSIENT
+
+    def _call(self, node, method, params):
+        started = time.monotonic()
+        try:
+            resp = node.provider.make_request(method, *params)
+        except Exception:
+            self._record(node, time.monotonic() - started, True)
+            raise
+        self._record(node, time.monotonic() - started, self._failed(resp))
+        return resp
+
+    def _hedge_after(self, node):
+        if self.hedge_percentile is None:
+            return None
+        with self._lock:
+            if len(node.latencies) < MIN_SAMPLES:
+                return None
+            return node.percentile(self.hedge_percentile)
+
+    def make_request(self, method, *params):
+        if method == "sendTransaction":
+            return self._fan_out(method, params)
+        if method in QUORUM_METHODS:
+            return self._quorum(method, params)
+        return self._read(method, params)
+
+    def _read(self, method, params):
+        nodes = self._ranked()
+        hedge_after = self._hedge_after(nodes[0]) if len(nodes) > 1 else None
+        if hedge_after is None:
+            # Failover only, on the calling thread
+            error = failed = None
+            for node in nodes:
+                try:
+                    resp = self._call(node, method, params)
+                except Exception as e:
+                    error = error or e
+                    continue
+                if not self._failed(resp):
+                    return resp
+                failed = failed or resp
+            if failed is not None:
+                return failed
+            raise error
+        return self._hedged(nodes, method, params, hedge_after)
+
+    def _hedged(self, nodes, method, params, hedge_after):
+        executor = self._pool()
+        candidates = iter(nodes)
+        pending = set()
+        hedged = False
+
+        def launch():
+            node = next(candidates, None)
+            if node is not None:
+                pending.add(executor.submit(self._call, node, method, params))
+
+        launch()
+        error = failed = None
+        while pending:
+            done, _ = wait(pending, timeout=None if hedged else hedge_after, return_when=FIRST_COMPLETED)
+            if not done:
+                hedged = True
+                metrics.count(HEDGES, method=method, endpoint=str(self))
+                launch()
+                continue
+            for future in done:
+                pending.discard(future)
+                try:
+                    resp = future.result()
+                except Exception as e:
+                    error = error or e
+                    launch()
+                    continue
+                if not self._failed(resp):
+                    return resp
+                failed = failed or resp
+                launch()
+        if failed is not None:
+            return failed
+        raise error
+
+    def _fan_out(self, method, params):
+        """ Send to the `fanout` best nodes and return the first acceptance, or else the first rejection. """
+        futures = [self._pool().submit(self._call, node, method, params) for node in self._ranked()[:self.fanout]]
+        error = rejected = None
+        for future in as_completed(futures):
+            try:
+                resp = future.result()
+            except Exception as e:
+                error = error or e
+                continue
+            if "error" not in resp:
+                return resp
+            rejected = rejected or resp
+        if rejected is not None:
+            return rejected
+        raise error
+
+    def _quorum(self, method, params):
+        """ Ask every healthy node, returning a null value only if they all answered null. """
+        now = time.monotonic()
+        nodes = [node for node in self._ranked() if node.down_until <= now] or self._ranked()
+        futures = [self._pool().submit(self._call, node, method, params) for node in nodes]
+        resp = None
+        for future in as_completed(futures):
+            resp = future.result()
+            if "error" in resp:
+                return resp
+            if resp["result"]["value"] is not None:
+                return resp
+        return resp
+
+    def health(self):
+        """ Median latency, error rate and state of every endpoint. """
+        now = time.monotonic()
+        with self._lock:
+            return {
+                node.provider.endpoint_uri: {
+                    "latency": node.latency(),
+                    "error_rate": node.error_rate(),
+                    "samples": len(node.errors),
+                    "down": node.down_until > now,
+                }
+                for node in self._nodes
+            }
+
+    def stats(self):
+        """ Connection reuse counters summed over every endpoint. """
+        totals = {"requests": 0, "connections": 0, "reused": 0}
+        for node in self._nodes:
+            for key, value in node.provider.stats().items():
+                totals[key] += value
+        return totals
+
+    def is_connected(self):
+        return any(node.provider.is_connected() for node in self._nodes)
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+        for node in self._nodes:
+            node.provider.close()
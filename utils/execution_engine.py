@@ -1,23 +1,207 @@
+import logging
 import time
-from solana.keypair import Keypair 
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from solana.blockhash import Blockhash
 from solana.rpc.api import Client
-from solana.rpc.types import TxOpts 
+from solana.rpc.commitment import Finalized, Processed
+from solana.rpc.core import RPCException
+from utils.account_cache import account_cache
+from utils.blockhash_provider import SLOT_TIME
+from utils.confirmation_tracker import is_confirmed
+from utils.metrics import metrics, CONFIRM_TIMEOUTS, EXPIRATIONS, FAILURES, REBROADCASTS, RETRIES
+from utils.signing import unique_signers
+from utils.submission import (
+    BLOCKHASH_VALIDITY,
+    MAX_BLOCKHASH_WAITS,
+    EXPIRED,
+    PERMANENT,
+    REBROADCAST_INTERVAL,
+    BlockhashExpired,
+    ConfirmationTimeout,
+    TransactionFailed,
+    classify_error,
+    next_step,
+    rebroadcaster,
+    send_raw,
+    sent_signatures,
+    signature_of,
+    unproven_expiry,
+)
 
-def execute(api_endpoint, tx, signers, max_retries=3, skip_confirmation=True, max_timeout=60, target=20, finalized=True):
-    client = Client(api_endpoint)
-    signers = list(map(Keypair, set(map(lambda s: s.seed, signers))))
+logger = logging.getLogger(__name__)
+
+def _blockhash(client, blockhashes, exclude=None):
+    """ A recent blockhash other than `exclude`, and the monotonic time it is estimated to expire at. """
+    for _ in range(MAX_BLOCKHASH_WAITS):
+        if blockhashes is not None:
+            if exclude is not None:
+                blockhashes.invalidate()
+            blockhash, valid_for = blockhashes.get(), blockhashes.valid_for()
+        else:
+            resp = client.get_recent_blockhash(Finalized)
+            if 'error' in resp:
+                raise RPCException(resp['error'])
+            blockhash, valid_for = Blockhash(resp["result"]["value"]["blockhash"]), BLOCKHASH_VALIDITY
+        if blockhash != exclude:
+            return blockhash, time.monotonic() + valid_for
+        time.sleep(SLOT_TIME)
+    raise Exception(f"No blockhash newer than {exclude}")
+
+def _status(client, signature):
+    resp = client.get_signature_statuses([signature])
+    if 'error' in resp:
+        raise RPCException(resp['error'])
+    return resp["result"]["value"][0]
+
+def _blockhash_expired(client, blockhash):
+    resp = client.get_fee_calculator_for_blockhash(blockhash, Processed)
+    if 'error' in resp:
+        raise RPCException(resp['error'])
+    return resp["result"]["value"] is None
+
+def _proven_expired(client, signature, blockhash):
+    """
+    Whether `signature` has not landed and `blockhash` has expired, the same proof `_confirm` waits for. A node
+    lagging behind the cluster also reports a blockhash it has not seen yet as not found.
+    """
+    try:
+        return _status(client, signature) is None and _blockhash_expired(client, blockhash)
+    except Exception as e:
+        logger.debug("Failed to check whether %s expired: %s", signature, e)
+        return False
+
+def _confirm(client, tracker, raw, signature, blockhash, expires_at, max_timeout, target, finalized, rebroadcast_interval, operation, api_endpoint):
+    """
+    Wait for `signature` to confirm, sending `raw` again every `rebroadcast_interval` seconds until it lands.
+    Returns the status, None after `max_timeout`, or raises BlockhashExpired once `blockhash` has expired without
+    the transaction landing.
+    """
+    deadline = time.monotonic() + max_timeout
+    future = tracker.track(signature, target=target, finalized=finalized) if tracker is not None else None
+    # Cleared once the transaction has landed, or sending it again cannot help
+    resend = True
+    try:
+        while True:
+            wait = min(rebroadcast_interval, deadline - time.monotonic())
+            if wait <= 0:
+                return None
+            if future is not None:
+                try:
+                    return future.result(timeout=wait)
+                except FutureTimeoutError:
+                    pass
+            else:
+                time.sleep(wait)
+                try:
+                    status = _status(client, signature)
+                except Exception as e:
+                    logger.debug("Failed to poll %s: %s", signature, e)
+                    continue
+                if is_confirmed(status, target, finalized):
+                    return status
+                resend = resend and status is None
+            if not resend:
+                continue
+            if time.monotonic() >= expires_at:
+                # Only sign again once it is certain this signature has not landed and never will.
+                # Until then `expires_at` was just an early estimate, so keep sending.
+                try:
+                    status = _status(client, signature)
+                    expired = status is None and _blockhash_expired(client, blockhash)
+                except Exception as e:
+                    logger.debug("Failed to poll %s: %s", signature, e)
+                    continue
+                if expired:
+                    raise BlockhashExpired(signature)
+                if status is not None:
+                    resend = False
+                    continue
+            try:
+                send_raw(client, raw)
+                metrics.count(REBROADCASTS, operation=operation, endpoint=api_endpoint)
+            except Exception as e:
+                logger.debug("Failed to rebroadcast %s: %s", signature, e)
+                resend = classify_error(e) != PERMANENT
+    finally:
+        if future is not None:
+            future.cancel()
+
+def execute(api_endpoint, tx, signers, max_retries=3, skip_confirmation=True, max_timeout=60, target=20, finalized=True, client=None, tracker=None, blockhashes=None, operation=None, rebroadcast_interval=REBROADCAST_INTERVAL, raise_on_timeout=False):
+    """
+    Sign, send and optionally confirm `tx`. The signed transaction is sent again every `rebroadcast_interval`
+    seconds until it lands, in the background when `skip_confirmation` is set, and is only signed again with a
+    fresh blockhash once the old one has expired. Transient RPC errors are retried after a jittered exponential
+    backoff and permanent ones raise at once, `max_retries` bounds the failed attempts of either kind. A confirmed
+    transaction whose instruction failed raises `TransactionFailed`. A transaction that did not confirm within
+    `max_timeout` returns like a confirmed one, or raises `ConfirmationTimeout` with `raise_on_timeout`.
+
+    The blockhash, sign, send and confirm stages are timed into `utils.metrics.metrics`, labelled with
+    `operation` and `api_endpoint`.
+    """
+    if client is None:
+        client = Client(api_endpoint)
+    signers = unique_signers(signers)
+    error = None
+    # Kept across transient errors: a send that timed out may still land, so the same transaction is sent again
+    signed = None
     for attempt in range(max_retries):
         try:
-            result = client.send_transaction(tx, *signers, opts=TxOpts(skip_preflight=True))
-            print(result)
-            signatures = [x.signature for x in tx.signatures]
-            if not skip_confirmation:
-                await_confirmation(client, signatures, max_timeout, target, finalized)
+            used = None
+            while signed is None:
+                with metrics.stage("blockhash", operation, api_endpoint):
+                    # With a blockhash provider, sending is a single RPC call
+                    tx.recent_blockhash, expires_at = _blockhash(client, blockhashes, exclude=used)
+                with metrics.stage("sign", operation, api_endpoint):
+                    tx.sign(*signers)
+                    raw = tx.serialize()
+                # An identical transaction was already sent with this blockhash and this one would be dropped
+                if sent_signatures.claim(signature_of(tx)):
+                    signed = raw, signature_of(tx), expires_at
+                used = tx.recent_blockhash
+            raw, signature, expires_at = signed
+            with metrics.stage("send", operation, api_endpoint):
+                result = send_raw(client, raw)
+            logger.debug("%s sent: %s", operation or "transaction", result)
+            if skip_confirmation:
+                rebroadcaster.add(client, raw, signature, expires_at, operation=operation, endpoint=api_endpoint)
+                return result
+            with metrics.stage("confirm", operation, api_endpoint):
+                status = _confirm(client, tracker, raw, signature, tx.recent_blockhash, expires_at, max_timeout, target, finalized, rebroadcast_interval, operation, api_endpoint)
+            if status is None:
+                metrics.count(CONFIRM_TIMEOUTS, operation=operation, endpoint=api_endpoint)
+                if raise_on_timeout:
+                    raise ConfirmationTimeout(signature, result)
+            elif status.get("err") is not None:
+                # Sent without preflight, so a failing instruction only shows up here
+                raise TransactionFailed(signature, status["err"])
+            else:
+                # Token accounts created by this transaction now exist
+                account_cache.record_transaction(api_endpoint, tx)
             return result
         except Exception as e:
-            print(f"Failed attempt {attempt}: {e}")
-            continue
-    raise e
+            if signed is not None:
+                # The failure may come from a stale cached account, e.g. one its owner closed
+                account_cache.evict_transaction(api_endpoint, tx)
+            expiry_proven = None
+            if signed is not None and unproven_expiry(e):
+                # Signing again while the sent transaction may still land could land it twice
+                expiry_proven = _proven_expired(client, signed[1], tx.recent_blockhash)
+            kind, delay = next_step(e, attempt, max_retries, expiry_proven)
+            if kind == PERMANENT:
+                logger.warning("Failed %s: %s", operation or "transaction", e)
+                metrics.count(FAILURES, operation=operation, endpoint=api_endpoint)
+                raise
+            logger.warning("Failed attempt %d of %s: %s", attempt, operation or "transaction", e)
+            metrics.count(EXPIRATIONS if kind == EXPIRED else RETRIES, operation=operation, endpoint=api_endpoint)
+            if kind == EXPIRED:
+                signed = None
+                if blockhashes is not None:
+                    blockhashes.invalidate()
+            error = e
+            if delay:
+                time.sleep(delay)
+    metrics.count(FAILURES, operation=operation, endpoint=api_endpoint)
+    raise error
 
 def await_confirmation(client, signatures, max_timeout=60, target=20, finalized=True):
     elapsed = 0
@@ -33,8 +217,8 @@ def await_confirmation(client, signatures, max_timeout=60, target=20, finalized=
             continue
         if not finalized:
             if confirmations >= target or is_finalized:
-                print(f"Took {elapsed} seconds to confirm transaction")
-                return
+                logger.debug("Took %d seconds to confirm transaction", elapsed)
+                return resp["result"]["value"][0]
         elif is_finalized:
-            print(f"Took {elapsed} seconds to confirm transaction")
-            return
\ No newline at end of file
+            logger.debug("Took %d seconds to confirm transaction", elapsed)
+            return resp["result"]["value"][0]
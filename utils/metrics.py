@@ -0,0 +1,166 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Seconds, from a fast RPC read up to a slow finalization
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+STAGE_SECONDS = "metaplex_stage_seconds"
+RPC_SECONDS = "metaplex_rpc_seconds"
+RETRIES = "metaplex_retries_total"
+FAILURES = "metaplex_failures_total"
+CONFIRM_TIMEOUTS = "metaplex_confirm_timeouts_total"
+RPC_ERRORS = "metaplex_rpc_errors_total"
+REBROADCASTS = "metaplex_rebroadcasts_total"
+EXPIRATIONS = "metaplex_blockhash_expired_total"
+HEDGES = "metaplex_hedged_requests_total"
+
+_HELP = {
+    STAGE_SECONDS: "Time spent per stage (build, blockhash, sign, send, confirm) of an operation.",
+    RPC_SECONDS: "Time spent per JSON-RPC request.",
+    RETRIES: "Failed send attempts, including the last attempt of a failed operation.",
+    FAILURES: "Operations that failed after every retry.",
+    CONFIRM_TIMEOUTS: "Transactions that did not confirm within max_timeout.",
+    RPC_ERRORS: "JSON-RPC requests that raised.",
+    REBROADCASTS: "Signed transactions sent again while waiting for them to land.",
+    EXPIRATIONS: "Transactions whose blockhash expired before they landed, and were signed again.",
+    HEDGES: "Reads sent to a second node because the first was slower than usual.",
+}
+
+
+class Metrics():
+    """
+    Thread-safe registry of counters and latency histograms, labelled by stage, operation, endpoint or RPC method.
+    Recording is a dict update under a lock, cheap enough to leave on. `add_hook(hook)` forwards every sample
+    as `hook(kind, name, value, labels)` to another backend, and `render_prometheus` exports the text format.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.enabled = True
+        self._histograms = {}
+        self._counters = {}
+        self._hooks = []
+        self._lock = threading.Lock()
+
+    def add_hook(self, hook):
+        self._hooks.append(hook)
+
+    def remove_hook(self, hook):
+        self._hooks.remove(hook)
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((k, "" if v is None else str(v)) for k, v in labels.items()))
+
+    def observe(self, name, seconds, **labels):
+        if not self.enabled:
+            return
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                # One count per bucket, then +Inf, sum and count
+                histogram = self._histograms[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            histogram[bisect.bisect_left(self.buckets, seconds)] += 1
+            histogram[-2] += seconds
+            histogram[-1] += 1
+        for hook in self._hooks:
+            hook("timer", name, seconds, labels)
+
+    def count(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+        for hook in self._hooks:
+            hook("counter", name, value, labels)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def stage(self, stage, operation=None, endpoint=None):
+        """ Time one stage of an operation, e.g. `with metrics.stage("sign", "mint", api_endpoint):`. """
+        return self.timer(STAGE_SECONDS, stage=stage, operation=operation, endpoint=endpoint)
+
+    def snapshot(self):
+        """ Counters and histogram totals as plain dicts, keyed by (name, labels). """
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "timers": {key: {"count": h[-1], "sum": h[-2]} for key, h in self._histograms.items()},
+            }
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def render_prometheus(self):
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, list(h)) for key, h in self._histograms.items())
+        lines = []
+        seen = set()
+
+        def header(name, kind):
+            if name not in seen:
+                seen.add(name)
+                if name in _HELP:
+                    lines.append(f"# HELP {name} {_HELP[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            header(name, "counter")
+            lines.append(f"{name}{_labels(labels)} {value}")
+        for (name, labels), histogram in histograms:
+            header(name, "histogram")
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), histogram):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(labels + (('le', str(bound)),))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {histogram[-2]}")
+            lines.append(f"{name}_count{_labels(labels)} {histogram[-1]}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in labels)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + "}"
+
+
+metrics = Metrics()
+
+
+def serve_prometheus(port, host="", registry=metrics):
+    """ Serve `registry` in the Prometheus text format on http://host:port/metrics from a daemon thread. """
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="prometheus-exporter", daemon=True).start()
+    return server
@@ -0,0 +1,137 @@
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from cachetools import LRUCache
+from nacl import signing
+from solana.keypair import Keypair
+from solana.publickey import PublicKey
+from solana.transaction import SigPubkeyPair
+
+KEYPAIR_CACHE_SIZE = 1024
+
+
+class CachedKeypair(Keypair):
+    """
+    Keypair that expands its seed once. `Keypair` rebuilds the ed25519 signing key on every `sign` and
+    every `public_key` access, which is most of the cost of signing a transaction.
+    """
+
+    def __init__(self, keypair=None):
+        super().__init__(keypair)
+        self._signing_key = signing.SigningKey(self.seed)
+        self._public_key = PublicKey(self._signing_key.verify_key)
+
+    def sign(self, msg):
+        return self._signing_key.sign(msg)
+
+    @property
+    def public_key(self):
+        return self._public_key
+
+    def __eq__(self, other):
+        return isinstance(other, Keypair) and self.seed == other.seed
+
+
+class KeypairCache():
+    """
+    Bounded LRU of `CachedKeypair`s keyed by the SHA-256 of their seed. `get` accepts a seed as bytes or a list
+    of ints, or a `Keypair`.
+
+    Entries never expire and their seeds are not zeroed, so it is meant for long-lived service keypairs only. User
+    keys are expanded per call with `expand`, and the decrypted seeds behind them are only kept by `CachingFernet`.
+    """
+
+    def __init__(self, maxsize=KEYPAIR_CACHE_SIZE):
+        self._keypairs = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, seed):
+        if isinstance(seed, Keypair):
+            seed = seed.seed
+        seed = bytes(seed)
+        return hashlib.sha256(seed).digest(), seed
+
+    def get(self, seed):
+        key, seed = self._key(seed)
+        with self._lock:
+            keypair = self._keypairs.get(key)
+            if keypair is not None:
+                self.hits += 1
+                return keypair
+            self.misses += 1
+        # Expand outside of the lock, a concurrent miss for the same seed builds an identical keypair
+        keypair = CachedKeypair.from_seed(seed)
+        with self._lock:
+            self._keypairs[key] = keypair
+        return keypair
+
+    def evict(self, seed):
+        key, _ = self._key(seed)
+        with self._lock:
+            self._keypairs.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._keypairs.clear()
+
+    def __len__(self):
+        return len(self._keypairs)
+
+
+keypair_cache = KeypairCache()
+
+
+def expand(signer):
+    """ `CachedKeypair` for a seed (bytes or a list of ints) or a `Keypair`, built afresh unless it already is one. """
+    if isinstance(signer, CachedKeypair):
+        return signer
+    if isinstance(signer, Keypair):
+        signer = signer.seed
+    return CachedKeypair.from_seed(bytes(signer))
+
+
+def unique_signers(signers):
+    """ Drop duplicate signers, keeping the first occurrence so the fee payer stays first, and return expanded keypairs. """
+    seen = set()
+    unique = []
+    for signer in signers:
+        keypair = expand(signer)
+        if keypair.seed not in seen:
+            seen.add(keypair.seed)
+            unique.append(keypair)
+    return unique
+
+
+def _sign_message(seeds, message):
+    # Runs in a worker, seeds are not cached there either
+    return [signing.SigningKey(seed).sign(message).signature for seed in seeds]
+
+
+def sign_many(batch, recent_blockhash, max_workers=None, processes=False, executor=None, chunksize=64):
+    """
+    Sign a batch of prepared `(tx, signers)` pairs with `recent_blockhash`. Messages are compiled on the calling thread
+    and signed on a thread pool (or a process pool with `processes=True`), or on `executor` if one is given.
+    Returns the signed transactions, ready for `client.send_raw_transaction(tx.serialize())`.
+    """
+    txs = []
+    seeds = []
+    messages = []
+    for tx, signers in batch:
+        signers = unique_signers(signers)
+        tx.recent_blockhash = recent_blockhash
+        tx.signatures = [SigPubkeyPair(pubkey=signer.public_key) for signer in signers]
+        txs.append(tx)
+        seeds.append([signer.seed for signer in signers])
+        messages.append(tx.serialize_message())
+    if executor is None:
+        pool = ProcessPoolExecutor if processes else ThreadPoolExecutor
+        with pool(max_workers=max_workers) as executor:
+            signatures = list(executor.map(_sign_message, seeds, messages, chunksize=chunksize))
+    else:
+        signatures = list(executor.map(_sign_message, seeds, messages, chunksize=chunksize))
+    for tx, tx_signatures in zip(txs, signatures):
+        for pair, signature in zip(tx.signatures, tx_signatures):
+            pair.signature = signature
+    return txs
@@ -0,0 +1,231 @@
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+import base58
+import requests
+from cachetools import TTLCache
+from solana.rpc.core import RPCException
+from solana.rpc.types import TxOpts
+from utils.blockhash_provider import FINALIZED_LAG_SLOTS, MAX_BLOCKHASH_AGE_SLOTS, SLOT_TIME
+from utils.confirmation_tracker import MAX_SIGNATURES_PER_REQUEST
+from utils.metrics import metrics, REBROADCASTS
+
+logger = logging.getLogger(__name__)
+
+REBROADCAST_INTERVAL = 2.0
+BACKOFF_BASE = 0.25
+BACKOFF_CAP = 4.0
+# How long a freshly fetched finalized blockhash stays valid
+BLOCKHASH_VALIDITY = (MAX_BLOCKHASH_AGE_SLOTS - FINALIZED_LAG_SLOTS) * SLOT_TIME
+SENT_SIGNATURES_SIZE = 65536
+# Slots to wait for a blockhash newer than one already used
+MAX_BLOCKHASH_WAITS = 25
+
+TRANSIENT = "transient"
+EXPIRED = "expired"
+PERMANENT = "permanent"
+
+# JSON-RPC errors that will not go away by sending the same transaction again
+PERMANENT_RPC_ERRORS = {
+    -32002,  # transaction simulation failed, e.g. insufficient funds
+    -32003,  # signature verification failure
+    -32015,  # unsupported transaction version
+    -32600,  # invalid request
+    -32601,  # method not found
+    -32602,  # invalid params
+}
+
+
+class BlockhashExpired(Exception):
+    """ The blockhash of a transaction expired before the transaction landed, so it can safely be signed again. """
+
+
+class ConfirmationTimeout(Exception):
+    """
+    The transaction did not confirm within `max_timeout`. It may still land, so signing it again could apply it
+    twice: callers have to check the chain instead of retrying.
+    """
+
+    def __init__(self, signature, result):
+        super().__init__(f"Transaction {signature} did not confirm in time")
+        self.signature = signature
+        self.result = result
+
+
+class TransactionFailed(Exception):
+    """ The transaction landed but one of its instructions failed, so it would fail again the same way. """
+
+    def __init__(self, signature, err):
+        super().__init__(f"Transaction {signature} failed: {err}")
+        self.signature = signature
+        self.err = err
+
+
+def classify_error(error):
+    """
+    TRANSIENT for errors worth retrying after a backoff (rate limits, unhealthy nodes, network errors), EXPIRED when
+    the transaction must be signed again with a fresh blockhash, PERMANENT when retrying cannot help.
+    """
+    if isinstance(error, BlockhashExpired):
+        return EXPIRED
+    if isinstance(error, (TransactionFailed, ConfirmationTimeout)):
+        return PERMANENT
+    if isinstance(error, RPCException):
+        details = error.args[0] if error.args else None
+        if not isinstance(details, dict):
+            return TRANSIENT
+        text = str(details).lower()
+        if "blockhash not found" in text or "blockhashnotfound" in text:
+            return EXPIRED
+        return PERMANENT if details.get("code") in PERMANENT_RPC_ERRORS else TRANSIENT
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        status = error.response.status_code
+        return TRANSIENT if status == 429 or status >= 500 else PERMANENT
+    return TRANSIENT
+
+
+class SentSignatures():
+    """
+    Signatures sent in the last `ttl` seconds, the longest a blockhash stays valid. Two byte-identical transactions
+    signed with the same blockhash (say two equal topups of one wallet) share their signature, and the cluster
+    silently drops the second one, so `execute` signs it again with a newer blockhash instead.
+    """
+
+    def __init__(self, maxsize=SENT_SIGNATURES_SIZE, ttl=MAX_BLOCKHASH_AGE_SLOTS * SLOT_TIME):
+        self._signatures = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+
+    def claim(self, signature):
+        """ False if `signature` was already claimed, True after claiming it. """
+        with self._lock:
+            if signature in self._signatures:
+                return False
+            self._signatures[signature] = True
+            return True
+
+    def clear(self):
+        with self._lock:
+            self._signatures.clear()
+
+
+def backoff(attempt, base=BACKOFF_BASE, cap=BACKOFF_CAP):
+    """ Jittered exponential backoff: between half and all of min(cap, base * 2 ** attempt) seconds. """
+    delay = min(cap, base * 2 ** attempt)
+    return random.uniform(delay / 2, delay)
+
+
+def unproven_expiry(error):
+    """
+    Whether `error` only claims that the blockhash expired. A node says "blockhash not found" about blockhashes it has
+    not seen yet as well, while `BlockhashExpired` is only raised once the expiry was checked.
+    """
+    return classify_error(error) == EXPIRED and not isinstance(error, BlockhashExpired)
+
+
+def next_step(error, attempt, max_retries, expiry_proven=None):
+    """
+    What `execute` does after `error` on attempt `attempt`, as `(kind, delay)`: PERMANENT raises, EXPIRED signs again
+    with a fresh blockhash and TRANSIENT sends the same transaction again after `delay` seconds. For an
+    `unproven_expiry`, pass whether the transaction provably has not landed and its blockhash expired, otherwise
+    it is sent again like after a transient error.
+    """
+    kind = classify_error(error)
+    if kind == EXPIRED and expiry_proven is False:
+        kind = TRANSIENT
+    delay = backoff(attempt) if kind == TRANSIENT and attempt + 1 < max_retries else 0
+    return kind, delay
+
+
+def signature_of(tx):
+    return base58.b58encode(tx.signatures[0].signature).decode("ascii")
+
+
+def send_raw(client, raw):
+    return client.send_raw_transaction(raw, opts=TxOpts(skip_preflight=True))
+
+
+class Rebroadcaster():
+    """
+    Background re-sender for transactions submitted without waiting for confirmation. Every `interval` seconds it
+    checks the signature statuses of its transactions in one request per client, sends the ones that have not
+    landed again, and drops each transaction once it lands or its blockhash expires.
+    """
+
+    def __init__(self, interval=REBROADCAST_INTERVAL):
+        self.interval = interval
+        self._heap = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def add(self, client, raw, signature, expires_at, operation=None, endpoint=None):
+        with self._condition:
+            heapq.heappush(self._heap, (time.monotonic() + self.interval, next(self._counter), client, raw, signature, expires_at, operation, endpoint))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="rebroadcaster", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def pending(self):
+        with self._condition:
+            return len(self._heap)
+
+    def clear(self):
+        with self._condition:
+            self._heap.clear()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._heap or self._heap[0][0] > time.monotonic():
+                    self._condition.wait(timeout=self._heap[0][0] - time.monotonic() if self._heap else None)
+                now = time.monotonic()
+                due = []
+                while self._heap and self._heap[0][0] <= now:
+                    due.append(heapq.heappop(self._heap))
+            by_client = {}
+            for item in due:
+                by_client.setdefault(id(item[2]), []).append(item)
+            for items in by_client.values():
+                try:
+                    self._rebroadcast(items)
+                except Exception as e:
+                    logger.warning("Failed to rebroadcast: %s", e)
+
+    def _statuses(self, client, signatures):
+        statuses = []
+        for i in range(0, len(signatures), MAX_SIGNATURES_PER_REQUEST):
+            resp = client.get_signature_statuses(signatures[i:i+MAX_SIGNATURES_PER_REQUEST])
+            if 'error' in resp:
+                raise RPCException(resp['error'])
+            statuses.extend(resp["result"]["value"])
+        return statuses
+
+    def _rebroadcast(self, items):
+        client = items[0][2]
+        try:
+            statuses = self._statuses(client, [item[4] for item in items])
+        except Exception as e:
+            # Without statuses every transaction is still pending
+            logger.debug("Failed to fetch signature statuses: %s", e)
+            statuses = [None] * len(items)
+        for item, status in zip(items, statuses):
+            _, _, _, raw, signature, expires_at, operation, endpoint = item
+            if status is not None or time.monotonic() >= expires_at:
+                continue
+            try:
+                send_raw(client, raw)
+                metrics.count(REBROADCASTS, operation=operation, endpoint=endpoint)
+            except Exception as e:
+                if classify_error(e) == PERMANENT:
+                    logger.warning("Dropping %s: %s", signature, e)
+                    continue
+            with self._condition:
+                heapq.heappush(self._heap, (time.monotonic() + self.interval, next(self._counter), *item[2:]))
+
+
+rebroadcaster = Rebroadcaster()
+sent_signatures = SentSignatures()
@@ -0,0 +1,246 @@
+import asyncio
+import itertools
+import json
+import logging
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from urllib.parse import urlparse
+import base58
+import websockets
+
+logger = logging.getLogger(__name__)
+
+RECONNECT_INTERVAL = 1.0
+
+
+def websocket_endpoint(api_endpoint):
+    """ Websocket URL of an HTTP RPC endpoint: same host, ws(s) scheme and, when a port is given, port + 1. """
+    url = urlparse(api_endpoint)
+    scheme = "wss" if url.scheme == "https" else "ws"
+    netloc = url.netloc
+    if url.port is not None:
+        netloc = f"{url.hostname}:{url.port + 1}"
+    return url._replace(scheme=scheme, netloc=netloc).geturl()
+
+
+def _forward(source, dest):
+    """ Copy the outcome of `source` into `dest` unless `dest` has already been resolved or cancelled. """
+    if source.cancelled():
+        dest.cancel()
+    elif dest.set_running_or_notify_cancel():
+        dest.set_result(source.result())
+
+
+class WebsocketConfirmationTracker():
+    """
+    Confirms signatures with `signatureSubscribe` notifications, multiplexed over one persistent websocket.
+    Has the same `track`/`wait` interface as `ConfirmationTracker`, so `execute` can use either.
+
+    Waits with `finalized=False` subscribe at the "confirmed" commitment, since notifications do not carry a
+    confirmation count. While the socket is down, pending and new signatures are handed to `fallback`
+    (usually a polling `ConfirmationTracker`) and the connection is retried every `reconnect_interval` seconds.
+    Cancelled waiters are dropped, and a signature nobody waits for any more is unsubscribed. Closing the tracker
+    also closes its fallback.
+    """
+
+    def __init__(self, ws_endpoint, fallback=None, reconnect_interval=RECONNECT_INTERVAL):
+        self.ws_endpoint = ws_endpoint
+        self.fallback = fallback
+        self.reconnect_interval = reconnect_interval
+        self.notifications = 0
+        self.fallbacks = 0
+        # Everything below is only touched from the event loop thread
+        self._pending = {}
+        self._requests = {}
+        self._subscriptions = {}
+        self._request_ids = itertools.count(1)
+        self._ws = None
+        self._disconnected = False
+        self._closed = False
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="websocket-tracker", daemon=True)
+        self._thread.start()
+        self._run_task = None
+        asyncio.run_coroutine_threadsafe(self._run(), self._loop)
+
+    def track(self, signature, target=20, finalized=True, callback=None):
+        if isinstance(signature, bytes):
+            signature = base58.b58encode(signature).decode("ascii")
+        future = Future()
+        if callback is not None:
+            future.add_done_callback(lambda f: f.cancelled() or f.exception() or callback(signature, f.result()))
+        self._loop.call_soon_threadsafe(self._track, signature, (future, target, finalized))
+        return future
+
+    def wait(self, signature, max_timeout=60, target=20, finalized=True):
+        future = self.track(signature, target=target, finalized=finalized)
+        try:
+            return future.result(timeout=max_timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            return None
+
+    def connected(self):
+        return self._ws is not None
+
+    def pending(self):
+        return sum(len(waiters) for waiters in list(self._pending.values()))
+
+    def close(self):
+        if self._closed:
+            return
+        asyncio.run_coroutine_threadsafe(self._close(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    async def _close(self):
+        self._closed = True
+        if self._run_task is not None:
+            self._run_task.cancel()
+            try:
+                await self._run_task
+            except asyncio.CancelledError:
+                pass
+        for waiters in self._pending.values():
+            for future, _, _ in waiters:
+                future.cancel()
+        self._pending.clear()
+        if self.fallback is not None:
+            self.fallback.close()
+
+    def _track(self, signature, waiter):
+        if self._closed:
+            waiter[0].cancel()
+            return
+        if self._disconnected and self.fallback is not None:
+            self._fall_back(signature, waiter)
+            return
+        commitment = "finalized" if waiter[2] else "confirmed"
+        key = (signature, commitment)
+        is_new = key not in self._pending
+        self._pending.setdefault(key, []).append(waiter)
+        waiter[0].add_done_callback(lambda f: f.cancelled() and self._cancelled(key, f))
+        if is_new and self._ws is not None:
+            self._loop.create_task(self._subscribe(key))
+
+    def _cancelled(self, key, future):
+        # Called from whichever thread cancelled the future
+        if self._closed:
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._discard, key, future)
+        except RuntimeError:
+            # The loop was closed in the meantime
+            pass
+
+    def _discard(self, key, future):
+        waiters = self._pending.get(key)
+        if waiters is None:
+            return
+        waiters[:] = [waiter for waiter in waiters if waiter[0] is not future]
+        if waiters:
+            return
+        del self._pending[key]
+        for subscription, subscribed in list(self._subscriptions.items()):
+            if subscribed == key:
+                del self._subscriptions[subscription]
+                self._loop.create_task(self._unsubscribe(subscription))
+
+    def _fall_back(self, signature, waiter):
+        future, target, finalized = waiter
+        if future.done():
+            return
+        self.fallbacks += 1
+        polled = self.fallback.track(signature, target=target, finalized=finalized)
+        polled.add_done_callback(lambda f: _forward(f, future))
+        future.add_done_callback(lambda f: f.cancelled() and polled.cancel())
+
+    async def _subscribe(self, key):
+        request_id = next(self._request_ids)
+        self._requests[request_id] = key
+        signature, commitment = key
+        try:
+            await self._ws.send(json.dumps({
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "method": "signatureSubscribe",
+                "params": [signature, {"commitment": commitment}],
+            }))
+        except Exception:
+            # The reader notices the closed socket and hands the signature to the fallback
+            pass
+
+    async def _unsubscribe(self, subscription):
+        if self._ws is None:
+            return
+        try:
+            await self._ws.send(json.dumps({
+                "jsonrpc": "2.0",
+                "id": next(self._request_ids),
+                "method": "signatureUnsubscribe",
+                "params": [subscription],
+            }))
+        except Exception:
+            # Subscriptions die with the socket anyway
+            pass
+
+    def _handle(self, message):
+        if message.get("method") == "signatureNotification":
+            params = message["params"]
+            key = self._subscriptions.pop(params["subscription"], None)
+            if key is None:
+                return
+            self.notifications += 1
+            status = {
+                "slot": params["result"]["context"]["slot"],
+                "confirmations": None if key[1] == "finalized" else 0,
+                "err": params["result"]["value"]["err"],
+                "confirmationStatus": key[1],
+            }
+            for future, _, _ in self._pending.pop(key, []):
+                if future.set_running_or_notify_cancel():
+                    future.set_result(status)
+        elif "id" in message:
+            key = self._requests.pop(message["id"], None)
+            if key is None:
+                return
+            if "result" in message:
+                if key in self._pending:
+                    self._subscriptions[message["result"]] = key
+                else:
+                    # Every waiter was cancelled while the subscription was on its way
+                    self._loop.create_task(self._unsubscribe(message["result"]))
+            else:
+                logger.warning("Failed to subscribe to %s: %s", key[0], message.get("error"))
+                for waiter in self._pending.pop(key, []):
+                    if self.fallback is not None:
+                        self._fall_back(key[0], waiter)
+                    else:
+                        waiter[0].cancel()
+
+    async def _run(self):
+        self._run_task = asyncio.current_task()
+        while not self._closed:
+            try:
+                async with websockets.connect(self.ws_endpoint) as ws:
+                    self._ws = ws
+                    self._disconnected = False
+                    for key in list(self._pending):
+                        await self._subscribe(key)
+                    async for raw in ws:
+                        self._handle(json.loads(raw))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Websocket %s dropped: %s", self.ws_endpoint, e)
+            self._ws = None
+            self._disconnected = True
+            self._requests.clear()
+            self._subscriptions.clear()
+            if self.fallback is not None:
+                pending, self._pending = self._pending, {}
+                for (signature, _), waiters in pending.items():
+                    for waiter in waiters:
+                        self._fall_back(signature, waiter)
+            await asyncio.sleep(self.reconnect_interval)